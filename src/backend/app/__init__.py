@@ -1,57 +1,79 @@
-import os
-import secrets
 from flask import Flask,request, jsonify
-import traceback
 
-from app.models.user import User
+from . import models  # registra todos los modelos en db.metadata
+from .config import load_config
 from .extensions import db
-from .routes.register_routes import register_routes  
-from datetime import timedelta
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity,JWTManager
-from functools import wraps
-from dotenv import load_dotenv
+from .utils.mappers.serializers import FastJSONProvider
+from .utils.db_routing import configure_read_replicas, setup_replica_health
+from .utils.entity_cache import setup_entity_cache
+from .utils.load_shedding import setup_load_shedding
+from .utils.ratelimit import setup_rate_limiting
+from .utils.request_logging import setup_logging
+from .utils.session_options import setup_session_options
+from .utils.tenancy import setup_tenancy
+from flask_jwt_extended import verify_jwt_in_request, JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 import logging
 
+logger = logging.getLogger(__name__)
+
 EXCLUDED_ROUTES = [
     '/api/auth/login',
     '/api/auth/register',
     '/api/auth/refresh'
 ]
 
+# Rutas que aceptan el token en la query string (?jwt=), p. ej. EventSource
+QUERY_TOKEN_ROUTES = [
+    '/api/events'
+]
+
 def create_app():
-    load_dotenv()
+    # Las rutas y los comandos se importan al crear la app: quien solo
+    # necesita los modelos o db (migraciones, scripts) no carga las vistas
+    from .commands import register_commands
+    from .routes.register_routes import register_routes
+    from .services.events_service import get_events_backend
+
     app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    # Configuración JWT
-    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
-    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(
-        minutes=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES_MINUTES', 15))
-    )
-    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(
-        days=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES_DAYS', 7))
-    )
+    app.json = FastJSONProvider(app)
+    app.config.update(load_config())
     jwt = JWTManager(app)
+    # Detrás de un proxy remote_addr sería el del proxy y todas las tablets
+    # compartirían el límite de peticiones de las rutas sin token
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    # Orden de los before_request: log, descarte de carga, modo de transacción,
+    # JWT, centro y límite por usuario
+    setup_logging(app)
+    setup_load_shedding(app)
+    setup_session_options(app)
     app.before_request(jwt_interceptor)
-    handler = logging.StreamHandler()
-    handler.setLevel(logging.DEBUG)
-    app.logger.addHandler(handler)
+    setup_tenancy(app)
+    setup_rate_limiting(app)
+    configure_read_replicas(app)
     db.init_app(app)
+    setup_replica_health(app, db)
+    setup_entity_cache(app, [models.User, models.Patient])
+    # Se crea al arrancar: un EVENTS_BACKEND incompleto falla aquí y no en la primera petición
+    get_events_backend(app)
     register_routes(app) 
+    register_commands(app)
     return app
 
 
 
 def jwt_interceptor():
-    token = request.headers.get("Authorization", "").replace("Bearer ", "")
-    print("Token recibido:", token)
     if request.method == "OPTIONS":
         return 
     if request.path in EXCLUDED_ROUTES or request.path.startswith('/static'):
         return
     try:
-        verify_jwt_in_request()
+        if request.path in QUERY_TOKEN_ROUTES:
+            verify_jwt_in_request(locations=['headers', 'query_string'])
+        else:
+            verify_jwt_in_request()
     except Exception as e:
-        logging.error("Error en jwt_interceptor: %s", e)
-        logging.error(traceback.format_exc())
+        # El 401 ya queda en el log de peticiones; el motivo, solo en DEBUG
+        logger.debug("Token rechazado en %s: %s", request.path, e)
         return jsonify({"msg": "Token inválido o faltante", "error": str(e)}), 401
\ No newline at end of file
@@ -0,0 +1,445 @@
+"""
+Modo ASGI de la API
+
+Los endpoints de lectura más usados se sirven de forma asíncrona con el
+engine async de SQLAlchemy; el resto de rutas se delegan a la app Flask.
+Se elige al desplegar:
+
+    uvicorn app.asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+o con SERVER_MODE=asgi python run.py
+"""
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Match, Mount, Route
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from app.services.events_service import astream_events, get_events_backend
+from app.services.medicine_service import (
+    medicines_state_statement, medicines_statement, patient_medicines_statement,
+    search_medicines_statement, serialize_patient_medicine_rows
+)
+from app.services.patients_service import (
+    carer_patients_statement, patients_state_statement, patients_statement,
+    unassigned_patients_statement
+)
+from app.utils import load_shedding, ratelimit
+from app.utils.conditional import (
+    ResourceState, check_not_modified, compute_etag, validator_headers
+)
+from app.utils.mappers.serializers import medicine_serializer, patient_serializer
+from app.utils.tenancy import (
+    NO_TENANT_ID, TENANT_CLAIM, TenantSession, tenant_scope, user_tenant_statement
+)
+
+TRUE_VALUES = ['true', '1', 'yes', 'on']
+
+# Mismos orígenes que Flask-Cors en run.py; en modo ASGI las rutas asíncronas
+# no pasan por Flask, así que CORS se aplica como middleware de Starlette
+CORS_ORIGINS = ['http://localhost:8080']
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(url=None):
+    """
+    URL del engine async: ASYNC_DATABASE_URL o DATABASE_URL con el driver
+    async equivalente (asyncpg para Postgres, aiosqlite para SQLite)
+    """
+    url = url or os.getenv('ASYNC_DATABASE_URL') or os.getenv('DATABASE_URL')
+    scheme, sep, rest = url.partition('://')
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def create_asgi_app(flask_app=None, database_url=None, engine_options=None):
+    """
+    Crea la app ASGI
+
+    Args:
+        flask_app: App Flask a la que se delegan las rutas no asíncronas
+        database_url: URL de la base de datos (por defecto desde el entorno)
+        engine_options: Opciones extra para create_async_engine
+    """
+    flask_app = flask_app or create_app()
+    engine = create_async_engine(async_database_url(database_url), **(engine_options or {}))
+    # TenantSession filtra por el centro del token, como la sesión de Flask
+    Session = async_sessionmaker(engine, expire_on_commit=False, sync_session_class=TenantSession)
+
+    def json_response(payload, status_code=200):
+        return Response(flask_app.json.dumps(payload), status_code=status_code,
+                        media_type='application/json')
+
+    def authenticated(handler):
+        """Equivalente asíncrono de @jwt_required()"""
+        async def decorated(request):
+            token = request.headers.get('Authorization', '').replace('Bearer ', '')
+            try:
+                with flask_app.app_context():
+                    claims = decode_token(token)
+            except Exception as e:
+                return json_response({'msg': 'Token inválido o faltante', 'error': str(e)}, 401)
+            try:
+                with tenant_scope(await token_tenant_id(claims)):
+                    return await handler(request)
+            except ValueError as e:
+                return json_response({'error': str(e)}, 400)
+            except Exception as e:
+                flask_app.logger.error(f"Error en {request.url.path}: {str(e)}")
+                return json_response({'error': 'Error interno del servidor'}, 500)
+        return decorated
+
+    async def token_tenant_id(claims):
+        if TENANT_CLAIM in claims:
+            return claims[TENANT_CLAIM]
+        # Tokens emitidos antes de la partición: el centro del usuario
+        async with Session() as session:
+            tenant_id = await session.scalar(user_tenant_statement(int(claims['sub'])))
+        return NO_TENANT_ID if tenant_id is None else tenant_id
+
+    def conditional(state_statement):
+        """Equivalente asíncrono de @conditional (app.utils.conditional)"""
+        def decorator(handler):
+            async def decorated(request):
+                async with Session() as session:
+                    row = (await session.execute(state_statement())).one()
+                state = ResourceState.from_row(row)
+                etag = compute_etag(request.url.path, request.query_params.multi_items(), state)
+                headers = validator_headers(etag, state.last_modified)
+                if check_not_modified(request.headers.get('if-none-match'),
+                                      request.headers.get('if-modified-since'),
+                                      etag, state.last_modified):
+                    return Response(status_code=304, headers=headers)
+                response = await handler(request)
+                if response.status_code == 200:
+                    response.headers.update(headers)
+                return response
+            return decorated
+        return decorator
+
+    async def fetch_all(stmt):
+        async with Session() as session:
+            return (await session.execute(stmt)).all()
+
+    async def fetch_count(stmt):
+        async with Session() as session:
+            return await session.scalar(
+                select(func.count()).select_from(stmt.order_by(None).subquery())
+            )
+
+    @authenticated
+    @conditional(patients_state_statement)
+    async def list_patients(request):
+        """GET /api/patients"""
+        page = _int_arg(request, 'page')
+        per_page = _int_arg(request, 'per_page')
+        serializer = patient_serializer.project(request.query_params.get('fields'))
+        stmt = patients_statement(serializer)
+
+        if not page and not per_page:
+            patients = serializer.from_rows(await fetch_all(stmt))
+            return json_response({'patients': patients, 'total': len(patients)})
+
+        page = page or 1
+        per_page = per_page or 10
+
+        if page < 1 or per_page < 1 or per_page > 100:
+            return json_response({'error': 'Parámetros de paginación inválidos'}, 400)
+
+        total = await fetch_count(stmt)
+        rows = await fetch_all(stmt.limit(per_page).offset((page - 1) * per_page))
+        pages = math.ceil(total / per_page) if total else 0
+        return json_response({
+            'patients': serializer.from_rows(rows),
+            'pagination': {
+                'page': page,
+                'pages': pages,
+                'per_page': per_page,
+                'total': total,
+                'has_next': page < pages,
+                'has_prev': page > 1
+            }
+        })
+
+    @authenticated
+    @conditional(patients_state_statement)
+    async def list_unassigned_patients(request):
+        """GET /api/patients/unassigned"""
+        serializer = patient_serializer.project(request.query_params.get('fields'))
+        patients = serializer.from_rows(await fetch_all(unassigned_patients_statement(serializer)))
+        return json_response({'patients': patients, 'total': len(patients)})
+
+    @authenticated
+    @conditional(patients_state_statement)
+    async def get_carer_patients(request):
+        """GET /api/patients/carer/<id>/patients"""
+        carer_id = request.path_params['carer_id']
+        rows = await fetch_all(carer_patients_statement(carer_id, patient_serializer))
+        return json_response(patient_serializer.from_rows(rows))
+
+    @authenticated
+    @conditional(patients_state_statement)
+    async def get_carer_patients_route(request):
+        """GET /api/carers/<id>/patients"""
+        carer_id = request.path_params['carer_id']
+        patients = patient_serializer.from_rows(
+            await fetch_all(carer_patients_statement(carer_id, patient_serializer))
+        )
+        return json_response({
+            'carer_id': carer_id,
+            'patients': patients,
+            'total_patients': len(patients)
+        })
+
+    @authenticated
+    @conditional(medicines_state_statement)
+    async def get_medicines(request):
+        """GET /api/medicines"""
+        page = _int_arg(request, 'page') or 1
+        per_page = _int_arg(request, 'per_page') or 10
+        active_only = request.query_params.get('active_only', 'false').lower() in TRUE_VALUES
+        get_all = request.query_params.get('get_all', 'false').lower() in TRUE_VALUES
+        serializer = medicine_serializer.project(request.query_params.get('fields'))
+        stmt = medicines_statement(serializer, active_only)
+
+        if get_all:
+            medicines = serializer.from_rows(await fetch_all(stmt))
+            total = len(medicines)
+            return json_response({
+                'medicines': medicines,
+                'pagination': {
+                    'page': page,
+                    'pages': total,
+                    'per_page': total,
+                    'total': total
+                }
+            })
+
+        total = await fetch_count(stmt)
+        rows = await fetch_all(stmt.limit(per_page).offset((page - 1) * per_page))
+        return json_response({
+            'medicines': serializer.from_rows(rows),
+            'pagination': {
+                'page': page,
+                'pages': (total + per_page - 1) // per_page,
+                'per_page': per_page,
+                'total': total
+            }
+        })
+
+    @authenticated
+    @conditional(medicines_state_statement)
+    async def search_medicines(request):
+        """GET /api/medicines/search?q=paracetamol&active_only=true"""
+        query = request.query_params.get('q', '')
+        active_only = request.query_params.get('active_only', 'true').lower() == 'true'
+        serializer = medicine_serializer.project(request.query_params.get('fields'))
+        stmt = search_medicines_statement(serializer, query, active_only).limit(20)
+        medicines = serializer.from_rows(await fetch_all(stmt))
+        return json_response({'medicines': medicines, 'count': len(medicines)})
+
+    @authenticated
+    async def get_patient_medicines(request):
+        """GET /api/medicines/patients/<patient_id>/medicines"""
+        stmt = patient_medicines_statement(request.path_params['patient_id'], medicine_serializer)
+        return json_response({
+            'medicines': serialize_patient_medicine_rows(await fetch_all(stmt), medicine_serializer)
+        })
+
+    async def events(request):
+        """GET /api/events - Canal SSE sin ocupar un hilo por conexión"""
+        token = request.query_params.get('jwt') or \
+            request.headers.get('Authorization', '').replace('Bearer ', '')
+        try:
+            with flask_app.app_context():
+                claims = decode_token(token)
+        except Exception as e:
+            return json_response({'msg': 'Token inválido o faltante', 'error': str(e)}, 401)
+
+        user_id = None if claims.get('is_admin', False) else int(claims['sub'])
+        subscription = get_events_backend(flask_app).subscribe(
+            user_id, await token_tenant_id(claims), asynchronous=True)
+        return StreamingResponse(
+            astream_events(subscription),
+            media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    routes = [
+        Route('/api/events', events),
+        Route('/api/patients', list_patients),
+        Route('/api/patients/unassigned', list_unassigned_patients),
+        Route('/api/patients/carer/{carer_id:int}/patients', get_carer_patients),
+        Route('/api/carers/{carer_id:int}/patients', get_carer_patients_route),
+        Route('/api/medicines', get_medicines),
+        Route('/api/medicines/search', search_medicines),
+        Route('/api/medicines/patients/{patient_id:int}/medicines', get_patient_medicines),
+    ]
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+
+    asgi_app = Starlette(
+        routes=[Mount('/', app=AdmissionControl(ReadRouter(routes, WSGIMiddleware(flask_app)), flask_app))],
+        middleware=[Middleware(
+            CORSMiddleware,
+            allow_origins=CORS_ORIGINS,
+            allow_credentials=True,
+            allow_methods=['*'],
+            allow_headers=['*']
+        )],
+        lifespan=lifespan
+    )
+    asgi_app.state.engine = engine
+    return asgi_app
+
+
+class ReadRouter:
+    """
+    Sirve de forma asíncrona los GET que coinciden con alguna ruta y delega
+    todo lo demás (otros métodos y rutas) en la app WSGI
+    """
+
+    def __init__(self, routes, fallback):
+        self.routes = routes
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for route in self.routes:
+                match, child_scope = route.matches(scope)
+                if match == Match.FULL:
+                    scope.update(child_scope)
+                    await route.handle(scope, receive, send)
+                    return
+        await self.fallback(scope, receive, send)
+
+
+class AdmissionControl:
+    """
+    Descarte de carga y límite de peticiones de la app Flask, aplicados a
+    todo lo que entra por ASGI: las rutas asíncronas no pasan por los
+    before_request de Flask. Usa el mismo LoadShedder y RateLimiter; las
+    peticiones que siguen hacia Flask llevan la marca en el scope y allí no
+    se vuelven a comprobar
+    """
+
+    def __init__(self, app, flask_app):
+        self.app = app
+        self.flask_app = flask_app
+        self.shedder = flask_app.extensions.get('load_shedder')
+        self.limiter = flask_app.extensions.get('rate_limiter')
+        self.url_adapter = flask_app.url_map.bind('localhost')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'OPTIONS':
+            await self.app(scope, receive, send)
+            return
+        if self.shedder is None:
+            await self.admit(scope, receive, send)
+            return
+
+        # En curso hasta que empieza la respuesta: un stream SSE abierto no
+        # ocupa un hilo ni una conexión y no debe contar como carga
+        scope[load_shedding.COUNTED_KEY] = True
+        inflight = self.shedder.enter()
+        counted = True
+
+        def leave():
+            nonlocal counted
+            if counted:
+                counted = False
+                self.shedder.leave()
+
+        async def send_and_leave(message):
+            if message['type'] == 'http.response.start':
+                leave()
+            await send(message)
+
+        try:
+            queue_wait = load_shedding.parse_request_start(
+                Headers(scope=scope).get(load_shedding.REQUEST_START_HEADER), time.time())
+            if self.shedder.reason(inflight, queue_wait) is not None:
+                await self.reject(scope, receive, send_and_leave, 503,
+                                  load_shedding.OVERLOADED_MESSAGE, self.shedder.retry_after)
+                return
+            await self.admit(scope, receive, send_and_leave)
+        finally:
+            leave()
+
+    async def admit(self, scope, receive, send):
+        if self.limiter is not None:
+            endpoint = self.endpoint(scope)
+            if endpoint is not None:
+                scope[ratelimit.CHECKED_KEY] = True
+                retry_after = self.limiter.consume(self.identity(scope), endpoint, time.time())
+                if retry_after > 0:
+                    await self.reject(scope, receive, send, 429, ratelimit.RATE_LIMITED_MESSAGE, retry_after)
+                    return
+        await self.app(scope, receive, send)
+
+    def endpoint(self, scope):
+        """Endpoint de Flask de la ruta: las asíncronas comparten presupuesto con él"""
+        try:
+            return self.url_adapter.match(scope['path'], method=scope['method'])[0]
+        except HTTPException:
+            return None
+
+    def identity(self, scope):
+        """Equivalente a ratelimit.request_identity()"""
+        token = Headers(scope=scope).get('authorization', '').replace('Bearer ', '') or \
+            QueryParams(scope['query_string']).get('jwt')
+        if token:
+            try:
+                with self.flask_app.app_context():
+                    return f"user:{decode_token(token)['sub']}"
+            except Exception:
+                pass
+        client = scope.get('client')
+        addr = ratelimit.forwarded_addr(Headers(scope=scope).get('x-forwarded-for'),
+                                        self.flask_app.config['PROXY_FIX_X_FOR'],
+                                        client[0] if client else None)
+        return f"ip:{addr}"
+
+    async def reject(self, scope, receive, send, status_code, message, retry_after):
+        response = Response(
+            self.flask_app.json.dumps({'error': message}),
+            status_code=status_code,
+            media_type='application/json',
+            headers={'Retry-After': str(math.ceil(retry_after))}
+        )
+        await response(scope, receive, send)
+
+
+def _int_arg(request, name):
+    """Equivalente a request.args.get(name, type=int)"""
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def __getattr__(name):
+    """Crea `app` al primer acceso (uvicorn app.asgi:app)"""
+    if name == 'app':
+        globals()['app'] = create_asgi_app()
+        return globals()['app']
+    raise AttributeError(name)
@@ -0,0 +1,78 @@
+import click
+
+from app import migrations
+from app.services.facility_service import create_facility, get_facilities, move_user_to_facility
+from app.services.interaction_service import FIXTURE_PATH, load_interaction_rules
+
+
+@click.command('load-interactions')
+@click.argument('path', required=False, default=FIXTURE_PATH)
+def load_interactions_command(path):
+    """Carga las reglas de interacciones desde un CSV (por defecto el fixture)"""
+    try:
+        count = load_interaction_rules(path)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Cargadas {count} reglas de interacciones desde {path}")
+
+
+@click.group('db')
+def db_group():
+    """Migraciones del esquema"""
+
+
+@db_group.command('upgrade')
+@click.option('--target', help='Versión hasta la que migrar (por defecto todas)')
+def upgrade_command(target):
+    """Aplica las migraciones pendientes"""
+    applied = migrations.upgrade(target)
+    click.echo(f"Aplicadas: {', '.join(applied)}" if applied else "El esquema está al día")
+
+
+@db_group.command('status')
+def status_command():
+    """Muestra las migraciones aplicadas y pendientes"""
+    for version, description, applied in migrations.get_status():
+        click.echo(f"[{'x' if applied else ' '}] {version}  {description}")
+
+
+@click.group('facilities')
+def facilities_group():
+    """Centros (tenants)"""
+
+
+@facilities_group.command('list')
+def list_facilities_command():
+    """Lista los centros"""
+    for facility in get_facilities():
+        click.echo(f"{facility.id:>4}  {facility.name}")
+
+
+@facilities_group.command('create')
+@click.argument('name')
+def create_facility_command(name):
+    """Da de alta un centro"""
+    try:
+        facility = create_facility(name)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Centro {facility.id} creado: {facility.name}")
+
+
+@facilities_group.command('move-user')
+@click.argument('username')
+@click.argument('facility_id', type=int)
+def move_user_command(username, facility_id):
+    """Cambia de centro a un usuario sin pacientes asignados"""
+    try:
+        user = move_user_to_facility(username, facility_id)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{user.username} pasa al centro {facility_id}")
+
+
+def register_commands(app):
+    """Registra los comandos de `flask` de la app"""
+    app.cli.add_command(load_interactions_command)
+    app.cli.add_command(db_group)
+    app.cli.add_command(facilities_group)
@@ -1,9 +1,83 @@
 import os
+from datetime import timedelta
+
 from dotenv import load_dotenv
 
-load_dotenv()  # Solo necesario si corres fuera de Docker
+# Solo necesario si corres fuera de Docker. Se lee una única vez por
+# proceso, al importar este módulo
+load_dotenv()
+
+
+TRUE_VALUES = ['true', '1', 'yes', 'on']
+
+
+def parse_mapping(value):
+    """
+    Pares 'clave=valor' separados por comas, p. ej. LOG_ROUTE_LEVELS=
+    '/api/sync/version=WARNING,medicine_bp.get_medicines=DEBUG'
+    """
+    mapping = {}
+    for item in (value or '').split(','):
+        key, sep, item_value = item.strip().rpartition('=')
+        if sep and key:
+            mapping[key.strip()] = item_value.strip()
+    return mapping
+
+def parse_list(value):
+    """Valores separados por comas, sin los vacíos"""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+def env_flag(name, default):
+    return os.getenv(name, default).lower() in TRUE_VALUES
+
 
-class Config:
-    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
-    SECRET_KEY = os.getenv("SECRET_KEY")
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
+def load_config():
+    """Configuración de la app a partir de las variables de entorno"""
+    return {
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Réplicas de lectura (app/utils/db_routing.py)
+        'DATABASE_READ_URLS': parse_list(os.getenv('DATABASE_READ_URLS')),
+        'DATABASE_READ_STICKY_SECONDS': float(os.getenv('DATABASE_READ_STICKY_SECONDS', 5)),
+        'DATABASE_READ_EJECT_SECONDS': float(os.getenv('DATABASE_READ_EJECT_SECONDS', 30)),
+        # Opciones de la sesión (app/utils/session_options.py)
+        'SQLALCHEMY_EXPIRE_ON_COMMIT': env_flag('SQLALCHEMY_EXPIRE_ON_COMMIT', 'false'),
+        'DB_READ_ONLY_GET': env_flag('DB_READ_ONLY_GET', 'true'),
+        'SECRET_KEY': os.getenv('SECRET_KEY'),
+        # Configuración JWT
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY'),
+        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(
+            minutes=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES_MINUTES', 15))
+        ),
+        'JWT_REFRESH_TOKEN_EXPIRES': timedelta(
+            days=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES_DAYS', 7))
+        ),
+        # Caché de usuarios y pacientes por ID (app/utils/entity_cache.py)
+        'ENTITY_CACHE_ENABLED': env_flag('ENTITY_CACHE_ENABLED', 'true'),
+        'ENTITY_CACHE_SIZE': int(os.getenv('ENTITY_CACHE_SIZE', 10000)),
+        'ENTITY_CACHE_TTL': float(os.getenv('ENTITY_CACHE_TTL', 5)),
+        'ENTITY_CACHE_BACKEND': os.getenv('ENTITY_CACHE_BACKEND'),
+        'ENTITY_CACHE_SHARED_TTL': float(os.getenv('ENTITY_CACHE_SHARED_TTL', 60)),
+        'DASHBOARD_MAX_WORKERS': int(os.getenv('DASHBOARD_MAX_WORKERS', 8)),
+        'EVENTS_BACKEND': os.getenv('EVENTS_BACKEND'),
+        # Logging (app/utils/request_logging.py)
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO').upper(),
+        'LOG_FORMAT': os.getenv('LOG_FORMAT', 'json'),
+        'LOG_SAMPLE_RATE': float(os.getenv('LOG_SAMPLE_RATE', 1.0)),
+        'LOG_ROUTE_LEVELS': parse_mapping(os.getenv('LOG_ROUTE_LEVELS')),
+        'LOG_QUEUE_SIZE': int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+        # Límite de peticiones por usuario y ruta (app/utils/ratelimit.py)
+        'RATE_LIMIT_ENABLED': env_flag('RATE_LIMIT_ENABLED', 'true'),
+        'RATE_LIMIT_DEFAULT': os.getenv('RATE_LIMIT_DEFAULT', '120/60'),
+        'RATE_LIMIT_BUDGETS': parse_mapping(os.getenv('RATE_LIMIT_BUDGETS')),
+        'RATE_LIMIT_STORE': os.getenv('RATE_LIMIT_STORE'),
+        # Proxies de confianza delante de la app: la IP del cliente (clave del
+        # límite en las rutas sin token) sale de X-Forwarded-For. 0: REMOTE_ADDR
+        'PROXY_FIX_X_FOR': int(os.getenv('PROXY_FIX_X_FOR', 0)),
+        # Descarte de carga (app/utils/load_shedding.py); 0 desactiva cada señal
+        'LOAD_SHED_ENABLED': env_flag('LOAD_SHED_ENABLED', 'true'),
+        'LOAD_SHED_QUEUE_WAIT_MS': float(os.getenv('LOAD_SHED_QUEUE_WAIT_MS', 1000)),
+        'LOAD_SHED_MAX_INFLIGHT': int(os.getenv('LOAD_SHED_MAX_INFLIGHT', 64)),
+        'LOAD_SHED_POOL_WAIT_MS': float(os.getenv('LOAD_SHED_POOL_WAIT_MS', 250)),
+        'LOAD_SHED_RETRY_AFTER': int(os.getenv('LOAD_SHED_RETRY_AFTER', 2)),
+    }
@@ -1,5 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 
-db = SQLAlchemy()
+from app.utils.db_routing import RoutingSession
+
+# RoutingSession envía las lecturas @read_only a las réplicas (DATABASE_READ_URLS)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
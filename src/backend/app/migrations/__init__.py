@@ -0,0 +1,83 @@
+"""
+Migraciones del esquema
+
+Cada migración es un módulo vNNNN_descripcion.py de este paquete con una
+función upgrade(conn) y un docstring que la describe. Se aplican en orden
+de versión, cada una en su propia transacción junto con su fila en
+schema_migrations. Solo hay upgrade: un error se corrige con otra migración.
+
+    flask db upgrade            # aplica las pendientes
+    flask db status             # aplicadas y pendientes
+"""
+import importlib
+import logging
+import pkgutil
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import insert, select, text
+
+from app.extensions import db
+from app.models.schema_migration import schema_migrations
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock de Postgres que serializa varios procesos migrando a la vez
+MIGRATION_LOCK_KEY = 7_301_039
+
+
+class Migration(NamedTuple):
+    version: str
+    description: str
+    module: object
+
+
+def discover_migrations() -> List[Migration]:
+    """Migraciones del paquete, ordenadas por versión"""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        if not info.name.startswith('v'):
+            continue
+        module = importlib.import_module(f'{__name__}.{info.name}')
+        lines = (module.__doc__ or '').strip().splitlines()
+        migrations.append(Migration(info.name.split('_', 1)[0], lines[0] if lines else '', module))
+    return sorted(migrations, key=lambda migration: migration.version)
+
+
+def applied_versions(conn) -> set:
+    schema_migrations.create(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def get_status():
+    """Lista de (versión, descripción, aplicada)"""
+    with db.engine.begin() as conn:
+        applied = applied_versions(conn)
+    return [
+        (migration.version, migration.description, migration.version in applied)
+        for migration in discover_migrations()
+    ]
+
+
+def upgrade(target: Optional[str] = None) -> List[str]:
+    """
+    Aplica las migraciones pendientes hasta target (incluida; por defecto
+    todas). Devuelve las versiones aplicadas
+    """
+    applied_now = []
+    for migration in discover_migrations():
+        if target is not None and migration.version > target:
+            break
+        with db.engine.begin() as conn:
+            if conn.dialect.name == 'postgresql':
+                conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+            # Se comprueba dentro del lock: otro proceso pudo aplicarla mientras tanto
+            if migration.version in applied_versions(conn):
+                continue
+            logger.info(f"Aplicando migración {migration.version}: {migration.description}")
+            migration.module.upgrade(conn)
+            conn.execute(insert(schema_migrations).values(
+                version=migration.version, applied_at=datetime.utcnow()
+            ))
+        applied_now.append(migration.version)
+    return applied_now
@@ -0,0 +1,71 @@
+"""
+Operaciones para escribir migraciones. Todas son idempotentes: comprueban
+el esquema antes de cambiarlo, así una base de datos creada con
+db.create_all() o a medio migrar llega al mismo resultado
+"""
+from typing import Iterable, Sequence
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from app.extensions import db
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(col['name'] == column for col in inspect(conn).get_columns(table))
+
+def create_tables(conn: Connection, tables: Iterable[str]):
+    """
+    Crea las tablas que falten según los modelos actuales, con sus índices
+    y eventos after_create (p. ej. la fila inicial de sync_version)
+    """
+    db.metadata.create_all(conn, tables=[db.metadata.tables[name] for name in tables], checkfirst=True)
+
+def add_column(conn: Connection, table: str, column: str):
+    """
+    Añade una columna con el tipo declarado en el modelo, si no existe.
+    Se añade como NULL: los valores por defecto los pone el ORM y, para
+    las filas existentes, la propia migración
+    """
+    if has_column(conn, table, column):
+        return False
+    column_type = db.metadata.tables[table].c[column].type.compile(dialect=conn.dialect)
+    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+    return True
+
+def create_index(conn: Connection, name: str, table: str, columns: Sequence[str], unique: bool = False):
+    """
+    Crea un índice si no existe. En Postgres bloquea las escrituras en la
+    tabla mientras se construye: en tablas grandes conviene migrar en una
+    ventana de poco tráfico
+    """
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+        f"ON {table} ({', '.join(columns)})"
+    ))
+
+def drop_index(conn: Connection, name: str):
+    """Borra un índice si existe (p. ej. uno sustituido por otro compuesto)"""
+    conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+def set_primary_key(conn: Connection, table: str, columns: Sequence[str]):
+    """
+    Cambia la clave primaria de una tabla a la del modelo, si no lo es ya.
+    SQLite no permite alterarla: la tabla se reconstruye con el modelo
+    actual y se copian las filas. Devuelve si hubo cambio
+    """
+    current = inspect(conn).get_pk_constraint(table)
+    if list(current['constrained_columns']) == list(columns):
+        return False
+    if conn.dialect.name == 'sqlite':
+        for index in inspect(conn).get_indexes(table):
+            drop_index(conn, index['name'])
+        names = ', '.join(column['name'] for column in inspect(conn).get_columns(table))
+        conn.execute(text(f'ALTER TABLE {table} RENAME TO {table}_old'))
+        create_tables(conn, [table])
+        conn.execute(text(f'INSERT INTO {table} ({names}) SELECT {names} FROM {table}_old'))
+        conn.execute(text(f'DROP TABLE {table}_old'))
+    else:
+        conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {current['name']}"))
+        conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY ({', '.join(columns)})"))
+    return True
@@ -0,0 +1,8 @@
+"""Tablas originales: usuarios, pacientes, medicinas y sus relaciones"""
+from app.migrations.operations import create_tables
+
+
+def upgrade(conn):
+    # facilities va primero: las tablas se crean con el modelo actual, que
+    # ya tiene tenant_id con su clave foránea
+    create_tables(conn, ['facilities', 'users', 'patients', 'medicines', 'patient_medicines', 'user_patient_assignments'])
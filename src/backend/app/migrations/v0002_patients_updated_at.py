@@ -0,0 +1,11 @@
+"""patients.updated_at para los GET condicionales; las filas existentes toman created_at"""
+from sqlalchemy import text
+
+from app.migrations.operations import add_column
+
+
+def upgrade(conn):
+    if add_column(conn, 'patients', 'updated_at'):
+        conn.execute(text(
+            'UPDATE patients SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL'
+        ))
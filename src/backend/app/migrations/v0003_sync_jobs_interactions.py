@@ -0,0 +1,13 @@
+"""Change log de /api/sync, cola de trabajos y reglas de interacciones"""
+from sqlalchemy import text
+
+from app.migrations.operations import create_tables, has_column
+
+
+def upgrade(conn):
+    create_tables(conn, ['sync_version', 'change_log', 'jobs', 'drug_interactions'])
+    # Si sync_version ya existía sin su fila (p. ej. creada a mano), se añade
+    # aquí. Con el modelo actual la tabla tiene una fila por centro (v0007)
+    if has_column(conn, 'sync_version', 'id') and \
+            conn.execute(text('SELECT COUNT(*) FROM sync_version')).scalar() == 0:
+        conn.execute(text('INSERT INTO sync_version (id, version) VALUES (1, 0)'))
@@ -0,0 +1,28 @@
+"""
+Índices derivados de los filtros, joins y agregados de las rutas
+
+- patients.created_at: listados de pacientes sin asignar y búsqueda (ORDER BY created_at)
+- patients.updated_at, medicines.updated_at, user_patient_assignments.assigned_at:
+  MAX() del estado de los GET condicionales, en cada petición
+- medicines.is_active: listados, búsqueda y estadísticas de medicinas activas
+- patient_medicines.medicine_id: quién toma una medicina (eventos, borrado),
+  la PK (patient_id, medicine_id) solo sirve para buscar por paciente
+- user_patient_assignments.patient_id: cuidadores de un paciente y pacientes
+  sin asignar, la PK (user_id, patient_id) solo sirve para buscar por cuidador
+"""
+from app.migrations.operations import create_index
+
+INDEXES = [
+    ('ix_patients_created_at', 'patients', ['created_at']),
+    ('ix_patients_updated_at', 'patients', ['updated_at']),
+    ('ix_medicines_updated_at', 'medicines', ['updated_at']),
+    ('ix_medicines_is_active', 'medicines', ['is_active']),
+    ('ix_patient_medicines_medicine_id', 'patient_medicines', ['medicine_id']),
+    ('ix_user_patient_assignments_patient_id', 'user_patient_assignments', ['patient_id']),
+    ('ix_user_patient_assignments_assigned_at', 'user_patient_assignments', ['assigned_at']),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
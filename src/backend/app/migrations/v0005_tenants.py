@@ -0,0 +1,41 @@
+"""
+Centros (tenants): tabla facilities y tenant_id en usuarios, pacientes,
+medicinas, trabajos y change log. Las filas existentes pasan al centro por
+defecto. Los índices de los filtros y ordenaciones pasan a empezar por
+tenant_id y sustituyen a los de una sola columna de v0004
+"""
+from sqlalchemy import text
+
+from app.migrations.operations import add_column, create_index, create_tables, drop_index
+from app.utils.tenancy import DEFAULT_TENANT_ID
+
+TENANT_TABLES = ['users', 'patients', 'medicines', 'jobs', 'change_log']
+
+INDEXES = [
+    ('ix_users_tenant_id', 'users', ['tenant_id']),
+    ('ix_patients_tenant_created_at', 'patients', ['tenant_id', 'created_at']),
+    ('ix_patients_tenant_updated_at', 'patients', ['tenant_id', 'updated_at']),
+    ('ix_medicines_tenant_name', 'medicines', ['tenant_id', 'name']),
+    ('ix_medicines_tenant_is_active', 'medicines', ['tenant_id', 'is_active']),
+    ('ix_medicines_tenant_updated_at', 'medicines', ['tenant_id', 'updated_at']),
+    ('ix_change_log_tenant_version', 'change_log', ['tenant_id', 'version']),
+]
+
+REPLACED_INDEXES = [
+    'ix_patients_created_at',
+    'ix_patients_updated_at',
+    'ix_medicines_name',
+    'ix_medicines_is_active',
+    'ix_medicines_updated_at',
+]
+
+
+def upgrade(conn):
+    create_tables(conn, ['facilities'])
+    for table in TENANT_TABLES:
+        if add_column(conn, table, 'tenant_id'):
+            conn.execute(text(f'UPDATE {table} SET tenant_id = {DEFAULT_TENANT_ID} WHERE tenant_id IS NULL'))
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
+    for name in REPLACED_INDEXES:
+        drop_index(conn, name)
@@ -0,0 +1,26 @@
+"""
+username y email de los usuarios existentes en minúsculas
+
+El login ya no distingue mayúsculas y las busca así. Si dos cuentas solo se
+diferencian en mayúsculas la migración falla sin cambiar nada: hay que
+renombrar una de ellas antes de volver a lanzarla
+"""
+from sqlalchemy import text
+
+LOGIN_COLUMNS = ['username', 'email']
+
+
+def upgrade(conn):
+    for column in LOGIN_COLUMNS:
+        collisions = conn.execute(text(
+            f'SELECT lower(trim({column})) FROM users '
+            f'GROUP BY lower(trim({column})) HAVING count(*) > 1'
+        )).scalars().all()
+        if collisions:
+            raise RuntimeError(
+                f"{column} repetidos al pasar a minúsculas: {', '.join(collisions[:20])}"
+            )
+    for column in LOGIN_COLUMNS:
+        conn.execute(text(
+            f'UPDATE users SET {column} = lower(trim({column})) WHERE {column} <> lower(trim({column}))'
+        ))
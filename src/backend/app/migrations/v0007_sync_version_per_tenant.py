@@ -0,0 +1,23 @@
+"""
+Contador de versiones del change log por centro
+
+sync_version pasa de una fila global a una por centro y la clave primaria
+del change log pasa a ser (tenant_id, version). Todos los centros empiezan
+en la versión global que había: los clientes conservan su since y solo
+reciben los cambios de su centro
+"""
+from sqlalchemy import text
+
+from app.migrations.operations import create_tables, drop_index, has_column, set_primary_key
+
+
+def upgrade(conn):
+    if has_column(conn, 'sync_version', 'id'):
+        version = conn.execute(text('SELECT MAX(version) FROM sync_version')).scalar() or 0
+        conn.execute(text('DROP TABLE sync_version'))
+        # La fila de cada centro la añade el evento after_create de la tabla
+        create_tables(conn, ['sync_version'])
+        conn.execute(text('UPDATE sync_version SET version = :version'), {'version': version})
+    set_primary_key(conn, 'change_log', ['tenant_id', 'version'])
+    # La clave primaria ya cubre las búsquedas por (tenant_id, version)
+    drop_index(conn, 'ix_change_log_tenant_version')
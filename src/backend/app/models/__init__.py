@@ -1,13 +1,22 @@
 from app.extensions import db
 
 # Importa todos los modelos aquí para que queden registrados
+from .facility import Facility
 from .user import User
 from .patients import Patient
 from .medicine import Medicine
+from .change_log import ChangeLog
+from .job import Job
+from .drug_interaction import DrugInteraction
+from .schema_migration import schema_migrations
 
 # Opcional: exporta en __all__ para importaciones limpias
 __all__ = [
+    "Facility",
     "User",
     "Patient",
-    "Medicine"
+    "Medicine",
+    "ChangeLog",
+    "Job",
+    "DrugInteraction"
 ]
\ No newline at end of file
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from sqlalchemy import DDL, event
+from app.extensions import db
+from app.models.facility import TenantMixin
+
+# Contador de versiones del change log, una fila por centro: cada centro
+# tiene su propia secuencia y las escrituras de un centro no esperan a las
+# de otro. Se incrementa con UPDATE ... RETURNING, así el bloqueo de la fila
+# hasta el commit hace que las versiones de un centro se confirmen en orden
+# y un cliente nunca salte una versión
+sync_version = db.Table(
+    'sync_version',
+    db.Column('tenant_id', db.Integer, db.ForeignKey('facilities.id'), primary_key=True, autoincrement=False),
+    db.Column('version', db.BigInteger, nullable=False, default=0)
+)
+
+event.listen(
+    sync_version,
+    'after_create',
+    DDL("INSERT INTO sync_version (tenant_id, version) SELECT id, 0 FROM facilities")
+)
+
+
+class ChangeLog(TenantMixin, db.Model):
+    __tablename__ = "change_log"
+
+    UPSERT = 'u'
+    DELETE = 'd'
+
+    # Versión dentro del centro: la clave primaria es (tenant_id, version)
+    version = db.Column(db.BigInteger, nullable=False, autoincrement=False)
+    entity = db.Column(db.String(40), nullable=False)
+    entity_key = db.Column(db.String(64), nullable=False)
+    op = db.Column(db.String(1), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint('tenant_id', 'version'),
+        db.Index('ix_change_log_entity_key', 'entity', 'entity_key'),
+    )
+
+    def __repr__(self):
+        return f'<ChangeLog {self.version} {self.op} {self.entity}:{self.entity_key}>'
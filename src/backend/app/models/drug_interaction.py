@@ -0,0 +1,23 @@
+from app.extensions import db
+
+
+class DrugInteraction(db.Model):
+    """
+    Regla de interacción o duplicidad terapéutica entre dos medicinas,
+    identificadas por su nombre normalizado (medicine_a < medicine_b)
+    """
+    __tablename__ = "drug_interactions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    medicine_a = db.Column(db.String(100), nullable=False)
+    medicine_b = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(30), nullable=False, default='interaction')
+    severity = db.Column(db.String(20), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('medicine_a', 'medicine_b', 'kind', name='uq_drug_interactions_pair_kind'),
+    )
+
+    def __repr__(self):
+        return f'<DrugInteraction {self.medicine_a} - {self.medicine_b} ({self.severity})>'
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import declared_attr
+
+from app.extensions import db
+from app.utils.tenancy import DEFAULT_TENANT_ID, default_tenant_id
+
+
+class Facility(db.Model):
+    """Centro (residencia) con sus propios usuarios, pacientes y medicinas"""
+    __tablename__ = "facilities"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<Facility {self.id} {self.name}>'
+
+
+# Centro por defecto, al que pertenecen los datos anteriores a la partición
+event.listen(
+    Facility.__table__,
+    'after_create',
+    DDL(f"INSERT INTO facilities (id, name) VALUES ({DEFAULT_TENANT_ID}, 'Centro principal')")
+)
+event.listen(
+    Facility.__table__,
+    'after_create',
+    DDL("SELECT setval(pg_get_serial_sequence('facilities', 'id'), MAX(id)) FROM facilities")
+    .execute_if(dialect='postgresql')
+)
+
+
+class TenantMixin:
+    """
+    Filas de un centro: las consultas del ORM se filtran por el centro en
+    curso (app/utils/tenancy.py) y las filas nuevas lo toman por defecto
+    """
+
+    @declared_attr
+    def tenant_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('facilities.id'), nullable=False, default=default_tenant_id)
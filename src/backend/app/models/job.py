@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from app.extensions import db
+from app.models.facility import TenantMixin
+
+
+class Job(TenantMixin, db.Model):
+    __tablename__ = "jobs"
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default=QUEUED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+        db.Index('ix_jobs_created_by', 'created_by'),
+    )
+
+    def to_dict(self, include_result=True):
+        data = {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.locked_at.isoformat() if self.locked_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'error': self.error
+        }
+        
+        if include_result:
+            data['result'] = self.result
+        
+        return data
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.type} {self.status}>'
@@ -1,11 +1,12 @@
 from app.extensions import db
+from app.models.facility import TenantMixin
 from datetime import datetime
 
-class Medicine(db.Model):
+class Medicine(TenantMixin, db.Model):
     __tablename__ = "medicines"
     
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
     dosage = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text, nullable=True)
     instructions = db.Column(db.Text, nullable=True)
@@ -19,6 +20,13 @@ class Medicine(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+
+    # Todas las consultas filtran por centro: los índices empiezan por tenant_id
+    __table_args__ = (
+        db.Index('ix_medicines_tenant_name', 'tenant_id', 'name'),
+        db.Index('ix_medicines_tenant_is_active', 'tenant_id', 'is_active'),
+        db.Index('ix_medicines_tenant_updated_at', 'tenant_id', 'updated_at'),
+    )
     
     def to_dict(self, include_sensitive=False):
         data = {
@@ -1,7 +1,8 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Table, Text, func
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Table, Text, func
 from app.extensions import db
+from app.models.facility import TenantMixin
 
 patient_medicines = Table(
     'patient_medicines',
@@ -10,10 +11,12 @@ patient_medicines = Table(
     Column('medicine_id', Integer, ForeignKey('medicines.id'), primary_key=True),
     Column('dose_per_take', String(50), default='1'),
     Column('notes', Text, default=''),
-    Column('created_at', DateTime, default=func.current_timestamp())
+    Column('created_at', DateTime, default=func.current_timestamp()),
+    # La PK (patient_id, medicine_id) no sirve para buscar por medicina
+    Index('ix_patient_medicines_medicine_id', 'medicine_id')
 )
 
-class Patient(db.Model):
+class Patient(TenantMixin, db.Model):
     __tablename__ = "patients"
 
     id = db.Column(db.Integer, primary_key=True)
@@ -22,12 +25,19 @@ class Patient(db.Model):
     phone = db.Column(db.String(25), nullable=False)
     instructions = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     quit = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Todas las consultas filtran por centro: los índices empiezan por tenant_id
+    __table_args__ = (
+        db.Index('ix_patients_tenant_created_at', 'tenant_id', 'created_at'),
+        db.Index('ix_patients_tenant_updated_at', 'tenant_id', 'updated_at'),
+    )
     
     @classmethod
     def from_patient(cls, patient, exclude_fields=None):
         if exclude_fields is None:
-            exclude_fields = ['id', 'created_at']
+            exclude_fields = ['id', 'created_at', 'updated_at']
         
         data = {}
         for column in cls.__table__.columns.keys():
@@ -45,9 +55,11 @@ class Patient(db.Model):
             "instructions": self.instructions,
             "quit": self.quit,
             "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
         
         if include_sensitive:
+            medicines = self.medicines.all()
             data['medicines'] = [
                 {
                     'id': m.id,
@@ -55,8 +67,8 @@ class Patient(db.Model):
                     'dosage': m.dosage,
                     'frequency_hours': m.frequency_hours,
                     'is_active': m.is_active
-                } for m in self.medicines.all()
+                } for m in medicines
             ]
-            data['medicine_count'] = self.medicines.count()
+            data['medicine_count'] = len(medicines)
         
         return data
@@ -0,0 +1,10 @@
+from datetime import datetime
+
+from app.extensions import db
+
+# Migraciones aplicadas (app.migrations): una fila por versión
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.String(64), primary_key=True),
+    db.Column('applied_at', db.DateTime, nullable=False, default=datetime.utcnow)
+)
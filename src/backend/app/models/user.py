@@ -2,18 +2,23 @@ from datetime import datetime, timedelta
 import os
 
 from app.extensions import db
+from app.models.facility import TenantMixin
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token
 import jwt
 
-class User(db.Model):
+class User(TenantMixin, db.Model):
     __tablename__ = "users"
     
     user_patient_assignment = db.Table('user_patient_assignments',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
     db.Column('patient_id', db.Integer, db.ForeignKey('patients.id'), primary_key=True),
     db.Column('assigned_at', db.DateTime, default=datetime.utcnow),
-    db.Column('role', db.String(50), default='assigned')
+    db.Column('role', db.String(50), default='assigned'),
+    # La PK (user_id, patient_id) no sirve para buscar por paciente
+    db.Index('ix_user_patient_assignments_patient_id', 'patient_id'),
+    db.Index('ix_user_patient_assignments_assigned_at', 'assigned_at')
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -36,6 +41,15 @@ class User(db.Model):
                              backref=db.backref('assigned_users', lazy='dynamic'),
                              lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('ix_users_tenant_id', 'tenant_id'),
+    )
+
+    @validates('username', 'email')
+    def normalize_login(self, key, value):
+        """username y email se guardan en minúsculas: el login no las distingue"""
+        return value.strip().lower() if value else value
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
@@ -52,7 +66,8 @@ class User(db.Model):
         identity_str = str(self.id)  
         additional_claims = {
             'username': self.username,
-            'is_admin': self.is_admin
+            'is_admin': self.is_admin,
+            'tenant_id': self.tenant_id
         }
         return create_access_token(identity=identity_str, additional_claims=additional_claims)
     @staticmethod
@@ -77,9 +92,9 @@ class User(db.Model):
         db.session.commit()
         
         
-    def is_in_working_hours(self):
-        """Verifica si el usuario está en horario laboral actual"""
-        now = datetime.utcnow()
+    def is_in_working_hours(self, at=None):
+        """Verifica si el usuario está en horario laboral actual (o en el momento at)"""
+        now = at or datetime.utcnow()
         current_time = now.time()
         current_day = now.strftime('%a').lower()
                 
@@ -113,7 +128,8 @@ class User(db.Model):
         }
         
         if include_sensitive:
-            data['patient_count'] = self.patients.count()
+            patients = self.patients.all()
+            data['patient_count'] = len(patients)
             data['patients'] = [
                 {
                     'id': p.id,
@@ -121,7 +137,7 @@ class User(db.Model):
                     'last_name': p.surname,
                     'full_name': f"{p.name or ''} {p.surname or ''}".strip() or str(p.id)
                 }
-                for p in self.patients.all()
+                for p in patients
             ]
         
         return data
@@ -1,11 +1,12 @@
 from functools import wraps
 import logging
 from flask import Blueprint, request, jsonify
-from app.models.user import *
-from app.services.auth_service import register_user,login_user
-from app.services.user_service import get_user_by_id
+from app.services.auth_service import register_user,login_user, update_profile as update_profile_service
+from app.services.user_service import get_user_by_id, user_state
+from app.utils.conditional import conditional
+from app.utils.ratelimit import rate_limit
 from app.extensions import db
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity, create_access_token, jwt_required
 
 logger = logging.getLogger(__name__)
 
@@ -31,26 +32,31 @@ def token_required(f):
     return decorated
 
 def admin_required(f):
-    """Decorador para rutas que requieren permisos de admin"""
+    """
+    Decorador para rutas que requieren permisos de admin. La vista recibe
+    el usuario actual como primer argumento
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         try:
             verify_jwt_in_request()
-            current_user = get_jwt_identity()
-            if not current_user.get('is_admin', False):
-                return jsonify({'error': 'Permisos de administrador requeridos'}), 403
-            
-            request.current_user = current_user
-            
         except Exception as e:
             return jsonify({"msg": "Token inválido o faltante", "error": str(e)}), 401
-        
-        return f(*args, **kwargs)
+
+        # El claim evita cargar el usuario cuando el token ya no es de admin
+        if not get_jwt().get('is_admin', False):
+            return jsonify({'error': 'Permisos de administrador requeridos'}), 403
+        current_user = get_user_by_id(int(get_jwt_identity()))
+        if current_user is None or not current_user.is_admin:
+            return jsonify({'error': 'Permisos de administrador requeridos'}), 403
+
+        request.current_user = current_user
+        return f(current_user, *args, **kwargs)
     
     return decorated
 
-
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('10/60')
 def register():
     try:
         data = request.json
@@ -86,12 +92,11 @@ def register():
         }), 201
 
     except Exception as e:
-        import traceback
-        logger.error(f"Error en registro: {str(e)}")
-        print(f"TRACEBACK COMPLETO:\n{traceback.format_exc()}")
+        logger.exception(f"Error en registro: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('10/60')
 def login():
     try:
         data = request.json
@@ -117,6 +122,7 @@ def login():
 
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
+@conditional(lambda: user_state(int(get_jwt_identity())))
 def get_current_user():
     current_user_identity = get_jwt_identity()
     user = get_user_by_id(current_user_identity);
@@ -135,7 +141,7 @@ def update_profile():
         for field in forbidden_fields:
             data.pop(field, None)
 
-        user, message = update_profile_service(current_user_identity['user_id'], data)
+        user, message = update_profile_service(int(current_user_identity), data)
         if not user:
             return jsonify({'error': message}), 400
 
@@ -150,6 +156,7 @@ def update_profile():
 
 
 @auth_bp.route('/change-password', methods=['POST'])
+@rate_limit('5/60')
 @jwt_required()
 def change_password():
     try:
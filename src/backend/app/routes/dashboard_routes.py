@@ -0,0 +1,31 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from app.services.dashboard_service import get_ward_dashboard
+from app.utils.ratelimit import rate_limit
+import logging
+
+logger = logging.getLogger(__name__)
+
+dashboard_bp = Blueprint('dashboard_bp', __name__, url_prefix='/api/dashboard')
+
+
+@dashboard_bp.route('', methods=['GET'])
+@rate_limit('30/60')
+@jwt_required()
+def get_dashboard():
+    """
+    GET /api/dashboard - Panel de planta en una sola petición:
+    usuario actual, sus pacientes, pacientes sin asignar y medicinas
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        return jsonify(get_ward_dashboard(current_user_id))
+        
+    except Exception as e:
+        logger.error(f"Error al obtener el panel: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+@dashboard_bp.errorhandler(500)
+def internal_error(error):
+    return jsonify({'error': 'Error interno del servidor'}), 500
@@ -0,0 +1,40 @@
+from flask import Blueprint, Response, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from app.services.events_service import get_events_backend, stream_events
+from app.utils.tenancy import current_tenant_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+events_bp = Blueprint('events_bp', __name__, url_prefix='/api/events')
+
+# EventSource no permite cabeceras: el token también se acepta en ?jwt=
+TOKEN_LOCATIONS = ['headers', 'query_string']
+
+
+def subscriber_id():
+    """Usuario de la suscripción; los admins (None) reciben todos los eventos de su centro"""
+    if get_jwt().get('is_admin', False):
+        return None
+    return int(get_jwt_identity())
+
+
+@events_bp.route('', methods=['GET'])
+@jwt_required(locations=TOKEN_LOCATIONS)
+def get_events():
+    """
+    GET /api/events - Canal SSE con los cambios de asignaciones y medicación
+    de los pacientes del usuario. Tras reconectar, el cliente recupera lo
+    perdido con /api/sync
+    """
+    try:
+        subscription = get_events_backend().subscribe(subscriber_id(), current_tenant_id())
+    except Exception as e:
+        logger.error(f"Error al abrir el canal de eventos: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+    
+    return Response(
+        stream_events(subscription),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
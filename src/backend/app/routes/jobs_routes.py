@@ -0,0 +1,103 @@
+from flask import Blueprint, request, jsonify, url_for
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from app.models.job import Job
+from app.services.jobs_service import (
+    ADMIN_JOB_TYPES, DEFAULT_MAX_ATTEMPTS, enqueue_job, get_job, get_jobs, retry_job
+)
+from app.utils.ratelimit import rate_limit
+import logging
+
+logger = logging.getLogger(__name__)
+
+jobs_bp = Blueprint('jobs_bp', __name__, url_prefix='/api/jobs')
+
+JOB_STATUSES = [Job.QUEUED, Job.RUNNING, Job.SUCCEEDED, Job.FAILED]
+
+
+def _can_access(job):
+    """Cada usuario ve sus trabajos; los admins, todos"""
+    return get_jwt().get('is_admin', False) or job.created_by == int(get_jwt_identity())
+
+
+@jobs_bp.route('', methods=['POST'])
+@rate_limit('10/60')
+@jwt_required()
+def create_job():
+    """
+    POST /api/jobs - Encolar un trabajo en segundo plano
+    Body: {"type": "patients_export" | "patients_import" | "patients_reassign" |
+                   "patients_auto_assign" | "users_import" (solo admin),
+           "payload": {...}, "max_attempts": 3}
+    """
+    try:
+        data = request.get_json() or {}
+        if data.get('type') in ADMIN_JOB_TYPES and not get_jwt().get('is_admin', False):
+            return jsonify({'error': 'Prohibido - permisos insuficientes'}), 403
+        job = enqueue_job(
+            data.get('type'),
+            data.get('payload'),
+            user_id=int(get_jwt_identity()),
+            max_attempts=data.get('max_attempts', DEFAULT_MAX_ATTEMPTS)
+        )
+        
+        response = jsonify({'job': job.to_dict(include_result=False)})
+        response.headers['Location'] = url_for('jobs_bp.get_job_route', job_id=job.id)
+        return response, 202
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error al encolar trabajo: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@jobs_bp.route('', methods=['GET'])
+@jwt_required()
+def list_jobs():
+    """GET /api/jobs?status=queued - Últimos trabajos del usuario (admin: todos)"""
+    try:
+        status = request.args.get('status')
+        if status and status not in JOB_STATUSES:
+            return jsonify({'error': f"Estado inválido: {status}"}), 400
+        
+        user_id = None if get_jwt().get('is_admin', False) else int(get_jwt_identity())
+        jobs = get_jobs(user_id, status)
+        return jsonify({
+            'jobs': [job.to_dict(include_result=False) for job in jobs],
+            'total': len(jobs)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error al obtener trabajos: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job_route(job_id):
+    """GET /api/jobs/<id> - Estado y resultado de un trabajo"""
+    try:
+        job = get_job(job_id)
+        if not job or not _can_access(job):
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        return jsonify({'job': job.to_dict()})
+        
+    except Exception as e:
+        logger.error(f"Error al obtener trabajo {job_id}: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@jobs_bp.route('/<int:job_id>/retry', methods=['POST'])
+@jwt_required()
+def retry_job_route(job_id):
+    """POST /api/jobs/<id>/retry - Volver a encolar un trabajo fallido"""
+    try:
+        job = get_job(job_id)
+        if not job or not _can_access(job):
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        
+        job = retry_job(job)
+        return jsonify({'job': job.to_dict(include_result=False)}), 202
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error al reintentar trabajo {job_id}: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
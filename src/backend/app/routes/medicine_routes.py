@@ -3,7 +3,24 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.patients import Patient, patient_medicines
 from app.models.medicine import Medicine, db
-from app.services.medicine_service import *
+from app.models.change_log import ChangeLog
+from app.services.medicine_service import (
+    create_medicine as create_medicine_service, update_medicine as update_medicine_service,
+    delete_medicine_links, get_all_medicines, medicine_state, medicines_state,
+    patient_medicines_statement, search_medicines_statement, serialize_patient_medicine_rows
+)
+from app.services.events_service import (
+    MEDICINE_DISABLED, MEDICINE_ENABLED, PATIENT_MEDICINE_ASSIGNED, PATIENT_MEDICINE_REMOVED,
+    publish_medicine_event, publish_patient_event
+)
+from app.services.interaction_service import (
+    check_medicine_ids, check_patients, get_assignment_context, get_interaction_index, has_blocking
+)
+from app.services.patients_service import patient_exists
+from app.services.sync_service import record_change, record_changes
+from app.utils.conditional import conditional
+from app.utils.mappers.serializers import medicine_serializer
+from app.utils.ratelimit import rate_limit
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,7 +30,9 @@ medicine_bp = Blueprint('medicine_bp', __name__, url_prefix='/api/medicines')
 
 
 @medicine_bp.route('', methods=['GET'])
+@rate_limit('30/60')
 @jwt_required()
+@conditional(lambda: medicines_state())
 def get_medicines():
     """GET /api/medicines - Lista todas las medicinas"""
     try:
@@ -23,15 +42,15 @@ def get_medicines():
         get_all_str = request.args.get('get_all', 'false').lower()
         active_only = active_only_str in ['true', '1', 'yes', 'on']
         get_all = get_all_str in ['true', '1', 'yes', 'on']
-        print(f"🔍 URL: {request.url}")
-        print(f"🔍 active_only_str='{active_only_str}' -> active_only={active_only}")
+        fields = request.args.get('fields')
+        serializer = medicine_serializer.project(fields)
         
-        medicines = get_all_medicines(active_only)
+        medicines = get_all_medicines(active_only, serializer.load_fields if fields else None)
         medicines = sorted(medicines, key=lambda m: m.id)
         total = len(medicines)
         if(get_all):
             return jsonify({
-            'medicines': [m.to_dict() for m in medicines],
+            'medicines': serializer.many(medicines),
             'pagination': {
                 'page': page,
                 'pages': total,
@@ -45,7 +64,7 @@ def get_medicines():
         paginated_items = medicines[start:end]
         
         return jsonify({
-            'medicines': [m.to_dict() for m in paginated_items],
+            'medicines': serializer.many(paginated_items),
             'pagination': {
                 'page': page,
                 'pages': (total + per_page - 1) // per_page,
@@ -53,12 +72,15 @@ def get_medicines():
                 'total': total
             }
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error al obtener medicinas: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 @medicine_bp.route('/<int:medicine_id>', methods=['GET'])
 @jwt_required()
+@conditional(medicine_state)
 def get_medicine(medicine_id):
     """GET /api/medicines/:id - Obtener medicina por ID"""
     medicine = Medicine.query.get_or_404(medicine_id)
@@ -69,10 +91,8 @@ def get_medicine(medicine_id):
 def create_medicine():
     """POST /api/medicines - Crear nueva medicina"""
     try:
-        data = request.get_json()
-        medicine = Medicine(**data)
-        db.session.add(medicine)
-        db.session.commit()
+        data = request.get_json() or {}
+        medicine = create_medicine_service(data)
         return jsonify(medicine.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -83,14 +103,10 @@ def create_medicine():
 @jwt_required()
 def update_medicine(medicine_id):
     """PUT /api/medicines/:id - Actualizar medicina"""
-    medicine = Medicine.query.get_or_404(medicine_id)
-    data = request.get_json()
-    
-    for key, value in data.items():
-        setattr(medicine, key, value)
-    
-    medicine.updated_at = db.func.now()
-    db.session.commit()
+    data = request.get_json() or {}
+    medicine = update_medicine_service(medicine_id, data)
+    if medicine is None:
+        return jsonify({'error': 'Medicina no encontrada'}), 404
     return jsonify(medicine.to_dict())
 
 @medicine_bp.route('enable/<int:medicine_id>', methods=['PUT'])
@@ -99,7 +115,9 @@ def enable_medicine(medicine_id):
     """PUT /api/medicines/:id - Actualizar medicina"""
     medicine = Medicine.query.get_or_404(medicine_id)    
     medicine.is_active = True
+    record_change('medicines', medicine.id)
     db.session.commit()
+    publish_medicine_event(MEDICINE_ENABLED, medicine.id)
     return jsonify(medicine.to_dict())
 
 @medicine_bp.route('disable/<int:medicine_id>', methods=['PUT'])
@@ -108,7 +126,9 @@ def disable_medicine(medicine_id):
     """PUT /api/medicines/:id - Actualizar medicina"""
     medicine = Medicine.query.get_or_404(medicine_id)    
     medicine.is_active = False
+    record_change('medicines', medicine.id)
     db.session.commit()
+    publish_medicine_event(MEDICINE_DISABLED, medicine.id)
     return jsonify(medicine.to_dict())
 
 @medicine_bp.route('/<int:medicine_id>', methods=['DELETE'])
@@ -116,6 +136,8 @@ def disable_medicine(medicine_id):
 def delete_medicine(medicine_id):
     """DELETE /api/medicines/:id - Eliminar medicina"""
     medicine = Medicine.query.get_or_404(medicine_id)
+    delete_medicine_links(medicine.id)
+    record_change('medicines', medicine.id, ChangeLog.DELETE)
     db.session.delete(medicine)
     db.session.commit()
     return jsonify({'message': 'Medicina eliminada'})
@@ -125,21 +147,8 @@ def delete_medicine(medicine_id):
 @jwt_required()
 def get_patient_medicines(patient_id):
     """GET /api/medicines/patients/:patient_id/medicines"""        
-    medicines = db.session.query(
-        Medicine, 
-        patient_medicines.c.dose_per_take, 
-        patient_medicines.c.notes
-    ).join(
-        patient_medicines,
-        (patient_medicines.c.medicine_id == Medicine.id) & 
-        (patient_medicines.c.patient_id == patient_id)
-    ).filter(Medicine.is_active == True).all()        
-    result = []
-    for medicine_row, dose_per_take, notes in medicines:
-        medicine_data = medicine_row.to_dict()
-        medicine_data['dose_per_take'] = dose_per_take or '1'
-        medicine_data['notes'] = notes or ''
-        result.append(medicine_data)
+    stmt = patient_medicines_statement(patient_id, medicine_serializer)
+    result = serialize_patient_medicine_rows(db.session.execute(stmt), medicine_serializer)
     
     return jsonify({
         'medicines': result
@@ -151,11 +160,22 @@ def assign_medicine_to_patient(patient_id, medicine_id):
     data = request.get_json() or {}
     dose_per_take = data.get('dose_per_take', '1')
     notes = data.get('notes', '')
-        
-    existing = db.session.query(patient_medicines).filter_by(
-        patient_id=patient_id, 
-        medicine_id=medicine_id
-    ).first()
+
+    # patient_medicines no se filtra por centro: el paciente sí
+    if not patient_exists(patient_id):
+        return jsonify({'error': 'Paciente no encontrado'}), 404
+    medicine, existing, current = get_assignment_context(patient_id, medicine_id)
+    if medicine is None:
+        return jsonify({'error': 'Medicina no encontrada'}), 404
+
+    # Solo una asignación nueva puede introducir interacciones; las graves
+    # bloquean salvo que el profesional las confirme con override
+    conflicts = [] if existing else get_interaction_index().check(medicine, current)
+    if has_blocking(conflicts) and not data.get('override'):
+        return jsonify({
+            'error': 'La medicina tiene interacciones graves con el tratamiento actual',
+            'conflicts': conflicts
+        }), 409
     
     if existing:        
         stmt = (
@@ -174,19 +194,31 @@ def assign_medicine_to_patient(patient_id, medicine_id):
         )
         db.session.execute(stmt)
     
+    record_change('patient_medicines', (patient_id, medicine_id))
     db.session.commit()
+    if conflicts:
+        logger.warning(f"Medicina {medicine_id} asignada al paciente {patient_id} con {len(conflicts)} interacciones")
+    publish_patient_event(PATIENT_MEDICINE_ASSIGNED, patient_id, {
+        'medicine_id': medicine_id,
+        'dose_per_take': dose_per_take,
+        'notes': notes
+    })
     
     return jsonify({
         'message': 'Medicina asignada/actualizada correctamente',
         'medicine_id': medicine_id,
         'dose_per_take': dose_per_take,
-        'notes': notes
+        'notes': notes,
+        'conflicts': conflicts
     }), 201
 
 @medicine_bp.route('/patients/<int:patient_id>/medicines/<int:medicine_id>', methods=['DELETE'])
 @jwt_required()
 def remove_medicine_from_patient(patient_id, medicine_id):
     """DELETE /api/medicines/patients/:patient_id/medicines/:medicine_id - Quitar medicina"""
+    # patient_medicines no se filtra por centro: el paciente sí
+    if not patient_exists(patient_id):
+        return jsonify({'error': 'Paciente no encontrado'}), 404
         
     stmt = patient_medicines.delete().where(
         patient_medicines.c.patient_id == patient_id,
@@ -194,7 +226,11 @@ def remove_medicine_from_patient(patient_id, medicine_id):
     )
     
     result = db.session.execute(stmt)
+    if result.rowcount > 0:
+        record_change('patient_medicines', (patient_id, medicine_id), ChangeLog.DELETE)
     db.session.commit()
+    if result.rowcount > 0:
+        publish_patient_event(PATIENT_MEDICINE_REMOVED, patient_id, {'medicine_ids': [medicine_id]})
         
     if result.rowcount == 0:
         return jsonify({'error': 'Asignación no encontrada'}), 404
@@ -210,36 +246,76 @@ def bulk_remove_medicines(patient_id):
     
     if not medicine_ids:
         return jsonify({'error': 'No se enviaron IDs'}), 400
+    if not patient_exists(patient_id):
+        return jsonify({'error': 'Paciente no encontrado'}), 404
     
     stmt = patient_medicines.delete().where(
         patient_medicines.c.patient_id == patient_id,
         patient_medicines.c.medicine_id.in_(medicine_ids)
-    )
+    ).returning(patient_medicines.c.medicine_id)
     
-    result = db.session.execute(stmt)
+    removed_ids = db.session.execute(stmt).scalars().all()
+    record_changes('patient_medicines', [(patient_id, medicine_id) for medicine_id in removed_ids], ChangeLog.DELETE)
     db.session.commit()
+    if removed_ids:
+        publish_patient_event(PATIENT_MEDICINE_REMOVED, patient_id, {'medicine_ids': removed_ids})
     
     return jsonify({
-        'message': f'Eliminados {result.rowcount} medicamentos'
+        'message': f'Eliminados {len(removed_ids)} medicamentos'
     }), 200
     
+@medicine_bp.route('/interactions/check', methods=['POST'])
+@rate_limit('30/60')
+@jwt_required()
+def check_interactions():
+    """
+    POST /api/medicines/interactions/check - Revisión de interacciones
+
+    Body: {"medicine_ids": [...]} comprueba una lista de medicinas; si no,
+    revisa las medicinas actuales de los pacientes (todos los activos, o
+    filtrados con "patient_ids" y/o "carer_id")
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        for name in ('medicine_ids', 'patient_ids'):
+            ids = data.get(name)
+            if ids is not None and (
+                not isinstance(ids, list) or
+                any(not isinstance(item, int) or isinstance(item, bool) for item in ids)
+            ):
+                return jsonify({'error': f'{name} debe ser una lista de enteros'}), 400
+        carer_id = data.get('carer_id')
+        if carer_id is not None and (not isinstance(carer_id, int) or isinstance(carer_id, bool)):
+            return jsonify({'error': 'carer_id debe ser un entero'}), 400
+
+        if data.get('medicine_ids') is not None:
+            conflicts = check_medicine_ids(data['medicine_ids'])
+            return jsonify({'conflicts': conflicts, 'blocking': has_blocking(conflicts)}), 200
+        return jsonify(check_patients(data.get('patient_ids'), carer_id)), 200
+    except Exception as e:
+        logger.error(f"Error al comprobar interacciones: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
 @medicine_bp.route('/search', methods=['GET'])
 @jwt_required()
+@conditional(lambda: medicines_state())
 def search_medicines():
     """GET /api/medicines/search?q=paracetamol&active_only=true"""
     query = request.args.get('q', '')
     active_only = request.args.get('active_only', 'true').lower() == 'true'
-    
-    medicines = Medicine.query.filter(
-        Medicine.name.ilike(f'%{query}%')
-    )
-    
-    if active_only:
-        medicines = medicines.filter(Medicine.is_active == True)
-    
+    fields = request.args.get('fields')
+    try:
+        serializer = medicine_serializer.project(fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Como el modo ASGI: solo las columnas del serializador, sin cargar modelos
+    stmt = search_medicines_statement(serializer, query, active_only).limit(20)
+    results = serializer.from_rows(db.session.execute(stmt))
     return jsonify({
-        'medicines': [m.to_dict() for m in medicines.limit(20).all()],
-        'count': medicines.count()
+        'medicines': results,
+        'count': len(results)
     })
 
 
@@ -2,7 +2,17 @@ from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from sqlalchemy import null
-from app.services.patients_service import *
+from app.services.patients_service import (
+    assign_patient_to_user, bulk_soft_delete_patients, bulk_update_patients,
+    bulk_update_patients_individually, create_patient, delete_patient, get_all_patients,
+    get_patient_by_id, get_patient_users, get_patients_by_carer_id, get_patients_paginated,
+    get_unassigned_patients, get_user_patients, patient_state, patients_state,
+    remove_patient_from_user, update_patient
+)
+from app.services.assignment_service import auto_assign_patients
+from app.utils.conditional import conditional
+from app.utils.mappers.serializers import patient_serializer, user_serializer
+from app.utils.ratelimit import rate_limit
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,16 +22,20 @@ patient_bp = Blueprint('patient_bp', __name__, url_prefix='/api/patients')
 
 @patient_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional(lambda: patients_state())
 def list_patients():
     """GET /api/patients - Obtener todos los pacientes (con paginación opcional)"""
     try:        
         page = request.args.get('page', type=int)
         per_page = request.args.get('per_page', type=int)
+        fields = request.args.get('fields')
+        serializer = patient_serializer.project(fields)
+        load_fields = serializer.load_fields if fields else None
                 
         if not page and not per_page:
-            patients = get_all_patients()
+            patients = get_all_patients(load_fields)
             return jsonify({
-                'patients': [p.to_dict() for p in patients],
+                'patients': serializer.many(patients),
                 'total': len(patients)
             })
                 
@@ -31,10 +45,10 @@ def list_patients():
         if page < 1 or per_page < 1 or per_page > 100:
             return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
         
-        paginated_patients = get_patients_paginated(page, per_page)
+        paginated_patients = get_patients_paginated(page, per_page, load_fields)
         
         return jsonify({
-            'patients': [p.to_dict() for p in paginated_patients.items],
+            'patients': serializer.many(paginated_patients.items),
             'pagination': {
                 'page': paginated_patients.page,
                 'pages': paginated_patients.pages,
@@ -45,24 +59,29 @@ def list_patients():
             }
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error al obtener pacientes: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
     
 @patient_bp.route('/unassigned', methods=['GET'])
+@rate_limit('30/60')
 @jwt_required()
+@conditional(lambda **_: patients_state())
 def list_unassigned_patients():
     """Pacientes SIN usuarios asignados (usando backref)"""
     try:
-
-        patients = Patient.query.filter(
-            ~Patient.assigned_users.any()
-        ).order_by(Patient.created_at.desc()).all()
+        fields = request.args.get('fields')
+        serializer = patient_serializer.project(fields)
+        patients = get_unassigned_patients(serializer.load_fields if fields else None)
 
         return jsonify({
-            'patients': [p.to_dict() for p in patients],
+            'patients': serializer.many(patients),
             'total': len(patients)
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -89,6 +108,7 @@ def add_patient():
 
 @patient_bp.route('/<int:patient_id>', methods=['GET'])
 @jwt_required()
+@conditional(patient_state)
 def get_patient(patient_id):
     """GET /api/patients/<id> - Obtener un paciente por ID"""
     try:
@@ -103,11 +123,12 @@ def get_patient(patient_id):
     
 @patient_bp.route('/carer/<int:carer_id>/patients', methods=['GET'])
 @jwt_required()
+@conditional(lambda **_: patients_state())
 def get_carer_patients(carer_id):
     """GET /carer/<int:carer_id>/patients - Obtener pacientes por ID del cuidador"""
     try:
         patients = get_patients_by_carer_id(carer_id)
-        return jsonify([p.to_dict() for p in patients])
+        return jsonify(patient_serializer.many(patients))
     except Exception as e:
         logger.error(f"Error al obtener a los pacientes por el cuidador {carer_id}: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -118,7 +139,8 @@ def get_carer_patients(carer_id):
 def update_patient_route(patient_id):
     """PUT /api/patients/<id> - Actualizar un paciente"""
     try:
-        if not patient_exists(patient_id):
+        patient = get_patient_by_id(patient_id)
+        if not patient:
             return jsonify({'error': 'Paciente no encontrado'}), 404
         
         data = request.json
@@ -126,7 +148,7 @@ def update_patient_route(patient_id):
         if not data:
             return jsonify({'error': 'No se proporcionaron datos para actualizar'}), 400
         
-        updated_patient = update_patient(patient_id, data)
+        updated_patient = update_patient(patient, data)
         
         if not updated_patient:
             return jsonify({'error': 'Error al actualizar el paciente'}), 500
@@ -140,15 +162,73 @@ def update_patient_route(patient_id):
         logger.error(f"Error al actualizar paciente {patient_id}: {str(e)}")
         return jsonify({'error': 'Error al actualizar el paciente'}), 500
 
+@patient_bp.route('', methods=['PATCH'])
+@rate_limit('10/60')
+@jwt_required()
+def bulk_update_patients_route():
+    """
+    PATCH /api/patients - Actualizar muchos pacientes en una transacción
+
+    Acepta {"ids": [...], "changes": {...}} para aplicar los mismos cambios
+    a todos, o {"patients": [{"id": ..., ...}, ...]} para cambios por paciente
+    """
+    try:
+        data = request.json
+        
+        if not data:
+            return jsonify({'error': 'No se proporcionaron datos para actualizar'}), 400
+        
+        if 'patients' in data:
+            results = bulk_update_patients_individually(data['patients'])
+        else:
+            results = bulk_update_patients(data.get('ids'), data.get('changes'))
+        
+        updated = sum(1 for r in results if r['status'] == 'updated')
+        return jsonify({
+            'message': f'{updated} pacientes actualizados',
+            'updated': updated,
+            'results': results
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en la actualización masiva de pacientes: {str(e)}")
+        return jsonify({'error': 'Error al actualizar los pacientes'}), 500
+
+@patient_bp.route('/bulk-delete', methods=['POST'])
+@rate_limit('10/60')
+@jwt_required()
+def bulk_delete_patients_route():
+    """POST /api/patients/bulk-delete - Dar de baja (quit) a muchos pacientes"""
+    try:
+        data = request.json or {}
+        
+        results = bulk_soft_delete_patients(data.get('ids'))
+        
+        deleted = sum(1 for r in results if r['status'] == 'deleted')
+        return jsonify({
+            'message': f'{deleted} pacientes dados de baja',
+            'deleted': deleted,
+            'results': results
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en la baja masiva de pacientes: {str(e)}")
+        return jsonify({'error': 'Error al dar de baja a los pacientes'}), 500
+
 @patient_bp.route('/<int:patient_id>', methods=['DELETE'])
 @jwt_required()
 def delete_patient_route(patient_id):
     """DELETE /api/patients/<id> - Eliminar un paciente"""
     try:
-        if not patient_exists(patient_id):
+        patient = get_patient_by_id(patient_id)
+        if not patient:
             return jsonify({'error': 'Paciente no encontrado'}), 404
         
-        success = delete_patient(patient_id)
+        success = delete_patient(patient)
         
         if success:
             return jsonify({'message': 'Paciente eliminado exitosamente'})
@@ -165,7 +245,8 @@ def delete_patient_route(patient_id):
 def assign_patient_to_user_route(patient_id):
     """POST /api/patients/<id>/assign - Asignar paciente a usuario"""
     try:
-        if not patient_exists(patient_id):
+        patient = get_patient_by_id(patient_id)
+        if not patient:
             return jsonify({'error': 'Paciente no encontrado'}), 404
         
         data = request.json
@@ -174,7 +255,7 @@ def assign_patient_to_user_route(patient_id):
         if not user_id:
             return jsonify({'error': 'user_id es requerido'}), 400
         
-        success = assign_patient_to_user(user_id, patient_id)
+        success = assign_patient_to_user(user_id, patient)
         
         if success:
             return jsonify({'message': 'Paciente asignado exitosamente'})
@@ -190,11 +271,12 @@ def assign_patient_to_user_route(patient_id):
 def remove_patient_assignment_route(patient_id):
     """DELETE /api/patients/<id>/assign"""
     try:
-        if not patient_exists(patient_id):
+        patient = get_patient_by_id(patient_id)
+        if not patient:
             return jsonify({'error': 'Paciente no encontrado'}), 404
         current_user_id = int(get_jwt_identity())
         
-        success = remove_patient_from_user(current_user_id, patient_id)
+        success = remove_patient_from_user(current_user_id, patient)
         
         if success:
             return jsonify({'message': 'Asignación removida'}), 200
@@ -205,19 +287,54 @@ def remove_patient_assignment_route(patient_id):
         logger.error(f"Error: {str(e)}")
         return jsonify({'error': 'Error interno'}), 500
     
+@patient_bp.route('/auto-assign', methods=['POST'])
+@rate_limit('5/60')
+@jwt_required()
+def auto_assign_patients_route():
+    """
+    POST /api/patients/auto-assign - Repartir los pacientes sin asignar
+    entre los cuidadores disponibles equilibrando la carga
+
+    Body (todo opcional): {"patient_ids": [...], "carer_ids": [...],
+    "max_per_carer": 20, "on_shift_only": true, "dry_run": false}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        result = auto_assign_patients(
+            patient_ids=data.get('patient_ids'),
+            carer_ids=data.get('carer_ids'),
+            max_per_carer=data.get('max_per_carer'),
+            on_shift_only=bool(data.get('on_shift_only', True)),
+            dry_run=bool(data.get('dry_run', False))
+        )
+        
+        return jsonify({
+            'message': f"{result['assigned']} pacientes asignados",
+            **result
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en la asignación automática: {str(e)}")
+        return jsonify({'error': 'Error al asignar los pacientes'}), 500
+    
 @patient_bp.route('/<int:patient_id>/users', methods=['GET'])
 @jwt_required()
+@conditional(lambda **_: patients_state())
 def get_patient_users_route(patient_id):
     """GET /api/patients/<id>/users - Obtener usuarios asignados al paciente"""
     try:
-        if not patient_exists(patient_id):
+        patient = get_patient_by_id(patient_id)
+        if not patient:
             return jsonify({'error': 'Paciente no encontrado'}), 404
         
-        users = get_patient_users(patient_id)
+        users = get_patient_users(patient)
         
         return jsonify({
             'patient_id': patient_id,
-            'assigned_users': [u.to_dict() for u in users],
+            'assigned_users': user_serializer.many(users),
             'total_users': len(users)
         })
         
@@ -230,6 +347,7 @@ user_patients_bp = Blueprint('user_patients_bp', __name__, url_prefix='/api/user
 
 @user_patients_bp.route('/<int:user_id>/patients', methods=['GET'])
 @jwt_required()
+@conditional(lambda **_: patients_state())
 def get_user_patients_route(user_id):
     """GET /api/users/<id>/patients - Obtener pacientes asignados al usuario"""
     try:
@@ -240,7 +358,7 @@ def get_user_patients_route(user_id):
         
         return jsonify({
             'user_id': user_id,
-            'patients': [p.to_dict() for p in patients],
+            'patients': patient_serializer.many(patients),
             'total_patients': len(patients)
         })
         
@@ -252,6 +370,7 @@ carer_bp = Blueprint('carer_bp', __name__, url_prefix='/api/carers')
 
 @carer_bp.route('/<int:carer_id>/patients', methods=['GET'])
 @jwt_required()
+@conditional(lambda **_: patients_state())
 def get_carer_patients_route(carer_id):
     """GET /api/carers/<id>/patients - Obtener pacientes del cuidador"""
     try:        
@@ -262,7 +381,7 @@ def get_carer_patients_route(carer_id):
         
         return jsonify({
             'carer_id': carer_id,
-            'patients': [p.to_dict() for p in patients],
+            'patients': patient_serializer.many(patients),
             'total_patients': len(patients)
         })
         
@@ -1,10 +1,24 @@
 from .user_routes import user_bp
 from .auth_routes import auth_bp
-from .patients_routes import patient_bp
+from .patients_routes import patient_bp, user_patients_bp, carer_bp
 from .medicine_routes import medicine_bp
+from .dashboard_routes import dashboard_bp
+from .sync_routes import sync_bp
+from .events_routes import events_bp
+from .jobs_routes import jobs_bp
+from .stats_routes import stats_bp
+from app.utils.session_options import snapshot_transactions
 
 def register_routes(app):
     app.register_blueprint(user_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(patient_bp)
+    app.register_blueprint(user_patients_bp)
+    app.register_blueprint(carer_bp)
     app.register_blueprint(medicine_bp)
+    app.register_blueprint(dashboard_bp)
+    # /api/sync (cambios y snapshot): varias consultas que deben ver los mismos datos
+    app.register_blueprint(snapshot_transactions(sync_bp))
+    app.register_blueprint(events_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(stats_bp)
@@ -0,0 +1,23 @@
+from flask import Blueprint, jsonify
+from app.services.stats_service import get_runtime_stats
+from .auth_routes import admin_required
+import logging
+
+logger = logging.getLogger(__name__)
+
+stats_bp = Blueprint('stats_bp', __name__, url_prefix='/api/stats')
+
+
+@stats_bp.route('', methods=['GET'])
+@admin_required
+def get_stats(current_user):
+    """
+    GET /api/stats - Estado en memoria del worker que responde (solo admin):
+    aciertos de la caché, peticiones en curso y descartadas, réplicas
+    expulsadas y suscripciones SSE
+    """
+    try:
+        return jsonify(get_runtime_stats())
+    except Exception as e:
+        logger.error(f"Error al obtener las estadísticas: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
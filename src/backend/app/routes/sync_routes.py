@@ -0,0 +1,77 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from app.services.sync_service import (
+    DEFAULT_SYNC_LIMIT, SyncVersionError, get_changes, get_current_version,
+    get_roster_snapshot, snapshot_state
+)
+from app.utils.compression import compressed_json
+from app.utils.conditional import conditional
+import logging
+
+logger = logging.getLogger(__name__)
+
+sync_bp = Blueprint('sync_bp', __name__, url_prefix='/api/sync')
+
+
+@sync_bp.route('', methods=['GET'])
+@jwt_required()
+def get_sync_changes():
+    """
+    GET /api/sync?since=<version>&limit=500 - Cambios desde una versión
+
+    Devuelve solo las filas cambiadas (pacientes, medicinas, medicinas de
+    pacientes y asignaciones) en formato compacto, con lápidas para los
+    borrados. El cliente guarda 'version' y la envía como since en la
+    siguiente petición; si has_more es true debe seguir pidiendo.
+    Para la carga inicial se pide /api/sync/snapshot y a partir de ahí se
+    sincroniza desde su versión.
+    """
+    try:
+        since = request.args.get('since', type=int)
+        limit = request.args.get('limit', DEFAULT_SYNC_LIMIT, type=int)
+        
+        if since is None:
+            return jsonify({'error': 'Se requiere el parámetro since'}), 400
+        
+        return jsonify(get_changes(since, limit))
+        
+    except SyncVersionError as e:
+        return jsonify({'error': str(e), 'version': get_current_version()}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error al obtener cambios: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+@sync_bp.route('/version', methods=['GET'])
+@jwt_required()
+def get_sync_version():
+    """GET /api/sync/version - Versión actual del change log"""
+    try:
+        return jsonify({'version': get_current_version()})
+        
+    except Exception as e:
+        logger.error(f"Error al obtener la versión de sincronización: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+@sync_bp.route('/snapshot', methods=['GET'])
+@jwt_required()
+@conditional(lambda: snapshot_state(int(get_jwt_identity())), compressed=True)
+def get_sync_snapshot():
+    """
+    GET /api/sync/snapshot - Foto inicial del cuidador autenticado
+
+    Sus pacientes asignados, sus tratamientos y las medicinas activas, en
+    columnas (listas de valores por campo) y con los textos repetidos
+    (nombre y dosis de las medicinas...) como índices a un diccionario.
+    Va comprimida con zstd o gzip según Accept-Encoding. 'version' es el
+    since de la primera petición a /api/sync.
+    """
+    try:
+        return compressed_json(get_roster_snapshot(int(get_jwt_identity())))
+        
+    except Exception as e:
+        logger.error(f"Error al obtener la foto de sincronización: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from app.services.user_service import *
+from app.services.auth_service import DuplicateUserError, provision_users
+from app.services.user_service import (
+    get_all_users, get_user_by_id, get_users_paginated, user_state, users_state
+)
+from app.utils.conditional import conditional
+from app.utils.mappers.serializers import user_serializer
+from app.utils.ratelimit import rate_limit
 from .auth_routes import admin_required
 import logging
 
@@ -10,18 +16,29 @@ user_bp = Blueprint('user_bp', __name__, url_prefix='/api/users')
 
 #Consigue una lista de usuarios
 @user_bp.route('/', methods=['GET'])
+@rate_limit('30/60')
 @admin_required
 @jwt_required()
+@conditional(lambda: users_state())
 def list_users(current_user):
     """GET /api/users - Listar todos los usuarios (solo admin)"""
     try:
         page = request.args.get('page', type=int)
         per_page = request.args.get('per_page', type=int)
+        fields = request.args.get('fields')
+        
+        if fields:
+            serializer = user_serializer.project(fields)
+            load_fields = serializer.load_fields
+            to_dict = serializer.to_dict
+        else:
+            load_fields = None
+            to_dict = lambda u: u.to_dict(include_sensitive=True)
         
         if not page and not per_page:
-            users = get_all_users()
+            users = get_all_users(load_fields)
             return jsonify({
-                'users': [u.to_dict(include_sensitive=True) for u in users],
+                'users': [to_dict(u) for u in users],
                 'total': len(users)
             })
         
@@ -31,10 +48,10 @@ def list_users(current_user):
         if page < 1 or per_page < 1 or per_page > 100:
             return jsonify({'error': 'Parámetros de paginación inválidos'}), 400
         
-        paginated_users = get_users_paginated(page, per_page)
+        paginated_users = get_users_paginated(page, per_page, load_fields)
         
         return jsonify({
-            'users': [u.to_dict(include_sensitive=True) for u in paginated_users.items],
+            'users': [to_dict(u) for u in paginated_users.items],
             'pagination': {
                 'page': paginated_users.page,
                 'pages': paginated_users.pages,
@@ -45,6 +62,8 @@ def list_users(current_user):
             }
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error al obtener usuarios: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -52,6 +71,7 @@ def list_users(current_user):
 @user_bp.route('/<int:user_id>', methods=['GET'])
 @admin_required
 @jwt_required()
+@conditional(user_state)
 def get_user(current_user, user_id):
     """GET /api/users/<id> - Obtener usuario por ID (solo admin)"""
     try:
@@ -66,6 +86,30 @@ def get_user(current_user, user_id):
         logger.error(f"Error al obtener usuario {user_id}: {str(e)}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
+@user_bp.route('/bulk', methods=['POST'])
+@rate_limit('5/60')
+@admin_required
+@jwt_required()
+def provision_users_route(current_user):
+    """
+    POST /api/users/bulk - Alta de la plantilla de un centro (solo admin)
+    Body: {"users": [{"username", "email", "password", "first_name", "last_name", "is_admin"}, ...]}
+    Todo o nada; los usuarios quedan en el centro del admin. Para listas
+    grandes, el trabajo 'users_import' hace lo mismo en segundo plano
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        user_ids = provision_users(data.get('users'))
+        return jsonify({'created': len(user_ids), 'user_ids': user_ids}), 201
+        
+    except DuplicateUserError as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error en el alta masiva de usuarios: {str(e)}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
 @user_bp.route('/<int:user_id>/activate', methods=['POST'])
 @admin_required
 @jwt_required()
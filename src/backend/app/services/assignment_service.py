@@ -0,0 +1,154 @@
+import heapq
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import exists, func, select
+
+from app.extensions import db
+from app.models.patients import Patient
+from app.models.user import User
+from app.services.events_service import PATIENTS_ASSIGNED, publish_event
+from app.services.sync_service import record_changes
+
+
+def get_eligible_carers(at: Optional[datetime] = None, on_shift_only: bool = True,
+                        carer_ids: Optional[List[int]] = None) -> List[int]:
+    """
+    IDs de los cuidadores que pueden recibir pacientes: activos, disponibles,
+    no administradores y, si on_shift_only, en su horario laboral en el
+    momento at (por defecto ahora)
+    """
+    stmt = select(
+        User.id, User.work_days, User.work_start_time, User.work_end_time, User.is_available
+    ).where(User.is_active.is_(True), User.is_available.is_(True), User.is_admin.is_(False))
+    if carer_ids is not None:
+        stmt = stmt.where(User.id.in_(carer_ids))
+
+    rows = db.session.execute(stmt.order_by(User.id)).all()
+    if on_shift_only:
+        at = at or datetime.utcnow()
+        rows = [row for row in rows if row.work_days and User.is_in_working_hours(row, at)]
+    return [row.id for row in rows]
+
+def get_carer_loads(carer_ids: List[int]) -> Dict[int, int]:
+    """Número de pacientes asignados a cada cuidador, con una sola consulta"""
+    if not carer_ids:
+        return {}
+    assignments = User.user_patient_assignment
+    loads = dict.fromkeys(carer_ids, 0)
+    loads.update(db.session.execute(
+        select(assignments.c.user_id, func.count())
+        .where(assignments.c.user_id.in_(carer_ids))
+        .group_by(assignments.c.user_id)
+    ).all())
+    return loads
+
+def get_assignable_patient_ids(patient_ids: Optional[List[int]] = None) -> List[int]:
+    """
+    IDs de los pacientes activos (quit=False) sin ningún cuidador, los más
+    antiguos primero
+    """
+    assignments = User.user_patient_assignment
+    stmt = select(Patient.id).where(
+        Patient.quit.is_(False),
+        ~exists().where(assignments.c.patient_id == Patient.id)
+    )
+    if patient_ids is not None:
+        stmt = stmt.where(Patient.id.in_(patient_ids))
+    return list(db.session.execute(stmt.order_by(Patient.created_at, Patient.id)).scalars())
+
+
+def plan_assignments(patient_ids: List[int], loads: Dict[int, int],
+                     max_per_carer: Optional[int] = None) -> Dict[int, List[int]]:
+    """
+    Reparto equilibrado greedy: cada paciente va al cuidador con menos carga
+    (montículo de (carga, id), desempate por ID). O(P log C)
+
+    Args:
+        patient_ids: Pacientes a repartir, en orden de prioridad
+        loads: Carga actual de cada cuidador elegible
+        max_per_carer: Carga máxima por cuidador (None = sin límite)
+
+    Returns:
+        Dict cuidador -> pacientes asignados (los que no caben quedan fuera)
+    """
+    heap = [
+        (load, carer_id) for carer_id, load in loads.items()
+        if max_per_carer is None or load < max_per_carer
+    ]
+    heapq.heapify(heap)
+    plan: Dict[int, List[int]] = {}
+
+    for patient_id in patient_ids:
+        if not heap:
+            break
+        load, carer_id = heap[0]
+        plan.setdefault(carer_id, []).append(patient_id)
+        load += 1
+        if max_per_carer is None or load < max_per_carer:
+            heapq.heapreplace(heap, (load, carer_id))
+        else:
+            heapq.heappop(heap)
+    return plan
+
+
+def auto_assign_patients(patient_ids: Optional[List[int]] = None, carer_ids: Optional[List[int]] = None,
+                         max_per_carer: Optional[int] = None, on_shift_only: bool = True,
+                         dry_run: bool = False, at: Optional[datetime] = None):
+    """
+    Asigna los pacientes sin cuidador a los cuidadores elegibles
+    equilibrando la carga, con un único INSERT masivo en
+    user_patient_assignments
+
+    Args:
+        patient_ids: Limitar a estos pacientes (por defecto, todos los sin asignar)
+        carer_ids: Limitar a estos cuidadores (por defecto, todos los elegibles)
+        max_per_carer: Carga máxima por cuidador
+        on_shift_only: Solo cuidadores en horario laboral
+        dry_run: Calcular el reparto sin guardarlo
+        at: Momento para comprobar el horario (por defecto ahora)
+
+    Raises:
+        ValueError: Si los parámetros no son válidos
+    """
+    if max_per_carer is not None and (not isinstance(max_per_carer, int) or max_per_carer < 1):
+        raise ValueError("max_per_carer debe ser un entero positivo")
+    for name, ids in (('patient_ids', patient_ids), ('carer_ids', carer_ids)):
+        if ids is not None and (
+            not isinstance(ids, list) or
+            any(not isinstance(item, int) or isinstance(item, bool) for item in ids)
+        ):
+            raise ValueError(f"{name} debe ser una lista de enteros")
+
+    carers = get_eligible_carers(at, on_shift_only, carer_ids)
+    loads = get_carer_loads(carers)
+    pending = get_assignable_patient_ids(patient_ids)
+    plan = plan_assignments(pending, loads, max_per_carer)
+    rows = [
+        {'user_id': carer_id, 'patient_id': patient_id}
+        for carer_id, assigned in plan.items() for patient_id in assigned
+    ]
+
+    if rows and not dry_run:
+        try:
+            db.session.execute(User.user_patient_assignment.insert(), rows)
+            record_changes('user_patient_assignments',
+                           [(row['user_id'], row['patient_id']) for row in rows])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        for carer_id, assigned in plan.items():
+            publish_event(PATIENTS_ASSIGNED, {'user_id': carer_id, 'patient_ids': assigned}, [carer_id])
+
+    return {
+        'assigned': len(rows),
+        'remaining': len(pending) - len(rows),
+        'carers': len(carers),
+        'dry_run': dry_run,
+        'assignments': {str(carer_id): assigned for carer_id, assigned in plan.items()},
+        'loads': {
+            str(carer_id): load + len(plan.get(carer_id, ()))
+            for carer_id, load in loads.items()
+        }
+    }
@@ -1,8 +1,37 @@
 from app.models.user import User, db
+from app.services.user_service import get_user_by_login
+from app.utils.db_errors import unique_violation
 from flask import current_app
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
 import re
 from datetime import datetime, timedelta
 
+MAX_PROVISION_USERS = 1000
+
+# Columna única -> mensaje cuando ya existe
+DUPLICATE_MESSAGES = {
+    'username': "El nombre de usuario ya existe",
+    'email': "El email ya está registrado",
+}
+
+
+class DuplicateUserError(ValueError):
+    """Nombre de usuario o email ya registrados o repetidos en la petición"""
+
+
+def duplicate_user_message(error):
+    """
+    Mensaje para un IntegrityError de un índice único de users, o None si
+    el error es de otra restricción
+    """
+    columns = unique_violation(error, User.__table__) or set()
+    for column, message in DUPLICATE_MESSAGES.items():
+        if column in columns:
+            return message
+    return None
+
+
 @staticmethod
 def register_user(username, email, password, first_name, last_name):
     """Registrar nuevo usuario"""
@@ -16,13 +45,6 @@ def register_user(username, email, password, first_name, last_name):
         if not validate_password(password):
             return None, "La contraseña debe tener al menos 8 caracteres, una mayúscula, una minúscula y un número"
         
-        
-        if User.query.filter_by(username=username).first():
-            return None, "El nombre de usuario ya existe"
-        
-        if User.query.filter_by(email=email).first():
-            return None, "El email ya está registrado"
-        
         user = User(
         username=username,
         first_name=first_name,
@@ -32,8 +54,17 @@ def register_user(username, email, password, first_name, last_name):
         )
         user.set_password(password)
         
+        # Sin SELECT previo: los índices únicos deciden, también entre
+        # registros simultáneos, y el choque se traduce aquí
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            message = duplicate_user_message(e)
+            if message is None:
+                raise
+            return None, message
         
         return user, "Usuario registrado exitosamente"
         
@@ -46,10 +77,7 @@ def register_user(username, email, password, first_name, last_name):
 def login_user(identifier, password):
     """Login de usuario (por username o email)"""
     try:
-        user = User.query.filter(
-            (User.username == identifier.lower()) | 
-            (User.email == identifier.lower())
-        ).first()
+        user = get_user_by_login(identifier)
         
         if not user:
             return None, None, "Usuario no encontrado"
@@ -108,9 +136,6 @@ def update_profile(user_id, data):
             if not validate_email(data['email']):
                 return None, "Email inválido"
             
-            if User.query.filter_by(email=data['email']).first():
-                return None, "El email ya está registrado"
-            
             user.email = data['email'].lower().strip()
         
         
@@ -121,7 +146,14 @@ def update_profile(user_id, data):
             user.last_name = data['last_name'].strip() if data['last_name'] else None
         
         user.updated_at = datetime.utcnow()
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            message = duplicate_user_message(e)
+            if message is None:
+                raise
+            return None, message
         
         return user, "Perfil actualizado exitosamente"
         
@@ -130,6 +162,96 @@ def update_profile(user_id, data):
         current_app.logger.error(f"Error al actualizar perfil: {str(e)}")
         return None, "Error interno del servidor"
 
+def _repeated(rows, field):
+    seen, repeated = set(), []
+    for row in rows:
+        if row[field] in seen:
+            repeated.append(row[field])
+        seen.add(row[field])
+    return repeated
+
+@staticmethod
+def provision_users(users_data):
+    """
+    Alta de muchos usuarios en una sola transacción (POST /api/users/bulk y
+    trabajo 'users_import'). Valida todas las filas, busca los ya
+    registrados con una consulta e inserta todos juntos; si algo falla no
+    se crea ninguno. Devuelve los IDs creados
+
+    Raises:
+        ValueError: Si alguna fila no es válida
+        DuplicateUserError: Si algún usuario o email ya existe o se repite
+    """
+    if not isinstance(users_data, list) or not users_data:
+        raise ValueError("Se requiere una lista de usuarios")
+    if len(users_data) > MAX_PROVISION_USERS:
+        raise ValueError(f"Como máximo {MAX_PROVISION_USERS} usuarios por petición")
+
+    errors = []
+    rows = []
+    for index, item in enumerate(users_data):
+        if not isinstance(item, dict):
+            errors.append(f"fila {index}: formato inválido")
+            continue
+        row = {
+            'username': (item.get('username') or '').strip().lower(),
+            'email': (item.get('email') or '').lower().strip(),
+            'password': item.get('password'),
+            'first_name': item.get('first_name') or None,
+            'last_name': item.get('last_name') or None,
+            'is_admin': bool(item.get('is_admin', False)),
+        }
+        if not validate_username(row['username']):
+            errors.append(f"fila {index}: nombre de usuario inválido")
+        if not validate_email(row['email']):
+            errors.append(f"fila {index}: email inválido")
+        if not validate_password(row['password']):
+            errors.append(f"fila {index}: contraseña inválida")
+        rows.append(row)
+    if errors:
+        raise ValueError(f"Filas inválidas: {'; '.join(errors[:20])}")
+
+    repeated = _repeated(rows, 'username') + _repeated(rows, 'email')
+    if repeated:
+        raise DuplicateUserError(f"Repetidos en la petición: {', '.join(repeated[:20])}")
+
+    # Sobre la tabla y no el modelo: la unicidad es global, no por centro
+    users = User.__table__
+    existing = db.session.execute(
+        select(users.c.username, users.c.email).where(or_(
+            users.c.username.in_([row['username'] for row in rows]),
+            users.c.email.in_([row['email'] for row in rows])
+        ))
+    ).all()
+    if existing:
+        taken = {value for pair in existing for value in pair}
+        conflicts = [value for row in rows for value in (row['username'], row['email']) if value in taken]
+        raise DuplicateUserError(f"Ya registrados: {', '.join(conflicts[:20])}")
+
+    new_users = []
+    for row in rows:
+        password = row.pop('password')
+        user = User(**row, is_active=True)
+        user.set_password(password)
+        new_users.append(user)
+    try:
+        # En PostgreSQL el flush agrupa las filas en INSERT por lotes (insertmanyvalues)
+        db.session.add_all(new_users)
+        db.session.flush()
+        user_ids = [user.id for user in new_users]
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        # Otra transacción registró el mismo usuario entre la consulta y el INSERT
+        message = duplicate_user_message(e)
+        if message is None:
+            raise
+        raise DuplicateUserError(message)
+    except Exception:
+        db.session.rollback()
+        raise
+    return user_ids
+
 @staticmethod
 def validate_username(username):
     """Validar nombre de usuario"""
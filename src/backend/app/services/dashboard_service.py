@@ -0,0 +1,112 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app
+
+from app.extensions import db
+from app.services.medicine_service import medicines_statement
+from app.services.patients_service import carer_patients_statement, unassigned_patients_statement
+from app.services.user_service import get_user_by_id
+from app.utils.db_routing import read_only
+from app.utils.mappers.serializers import medicine_serializer, patient_serializer
+
+# Timeout por sección en segundos; se puede sobrescribir con
+# app.config['DASHBOARD_SECTION_TIMEOUTS']
+DEFAULT_SECTION_TIMEOUTS = {
+    'user': 2.0,
+    'patients': 3.0,
+    'unassigned_patients': 3.0,
+    'medicines': 3.0,
+}
+
+_executor_lock = threading.Lock()
+
+
+def _user_section(user_id):
+    user = get_user_by_id(user_id)
+    return user.to_dict(include_sensitive=True) if user else None
+
+def _patients_section(user_id):
+    stmt = carer_patients_statement(user_id, patient_serializer)
+    return patient_serializer.from_rows(db.session.execute(stmt))
+
+def _unassigned_patients_section(user_id):
+    stmt = unassigned_patients_statement(patient_serializer)
+    return patient_serializer.from_rows(db.session.execute(stmt))
+
+def _medicines_section(user_id):
+    stmt = medicines_statement(medicine_serializer)
+    return medicine_serializer.from_rows(db.session.execute(stmt))
+
+SECTIONS = {
+    'user': _user_section,
+    'patients': _patients_section,
+    'unassigned_patients': _unassigned_patients_section,
+    'medicines': _medicines_section,
+}
+
+
+def _get_executor(app):
+    """
+    Pool de hilos acotado (DASHBOARD_MAX_WORKERS), uno por app
+    """
+    executor = app.extensions.get('dashboard_executor')
+    if executor is None:
+        with _executor_lock:
+            executor = app.extensions.get('dashboard_executor')
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=app.config.get('DASHBOARD_MAX_WORKERS', 8),
+                    thread_name_prefix='dashboard'
+                )
+                app.extensions['dashboard_executor'] = executor
+    return executor
+
+def _run_section(app, section, user_id):
+    """
+    Ejecuta una sección en su propio contexto de aplicación,
+    y por tanto con su propia sesión de base de datos
+    """
+    with app.app_context():
+        return SECTIONS[section](user_id)
+
+
+@read_only
+def get_ward_dashboard(user_id: int):
+    """
+    Obtiene todas las secciones del panel de planta en paralelo.
+
+    Cada sección tiene su propio timeout; si una falla o no llega a tiempo
+    su valor es None y el error se informa en 'errors'
+    """
+    app = current_app._get_current_object()
+    timeouts = {**DEFAULT_SECTION_TIMEOUTS, **app.config.get('DASHBOARD_SECTION_TIMEOUTS', {})}
+    executor = _get_executor(app)
+
+    start = time.monotonic()
+    # Cada sección hereda el contexto (y con él la réplica de lectura elegida)
+    futures = {
+        section: executor.submit(contextvars.copy_context().run, _run_section, app, section, user_id)
+        for section in SECTIONS
+    }
+
+    result = {}
+    errors = {}
+    for section, future in futures.items():
+        remaining = max(0.0, start + timeouts[section] - time.monotonic())
+        try:
+            result[section] = future.result(timeout=remaining)
+        except TimeoutError:
+            future.cancel()
+            result[section] = None
+            errors[section] = 'timeout'
+        except Exception as e:
+            current_app.logger.error(f"Error en la sección {section} del panel: {str(e)}")
+            result[section] = None
+            errors[section] = 'error'
+
+    result['errors'] = errors
+    result['partial'] = bool(errors)
+    return result
@@ -0,0 +1,120 @@
+from app.models.patients import db, patient_medicines
+from app.models.user import User
+from app.utils.pubsub import Event, load_backend
+from app.utils.tenancy import current_tenant_id
+from flask import current_app
+from sqlalchemy import select
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+SSE_HEARTBEAT_SECONDS = 15
+
+PATIENT_ASSIGNED = 'patient_assigned'
+PATIENTS_ASSIGNED = 'patients_assigned'
+PATIENT_UNASSIGNED = 'patient_unassigned'
+PATIENTS_REASSIGNED = 'patients_reassigned'
+PATIENT_MEDICINE_ASSIGNED = 'patient_medicine_assigned'
+PATIENT_MEDICINE_REMOVED = 'patient_medicine_removed'
+MEDICINE_ENABLED = 'medicine_enabled'
+MEDICINE_DISABLED = 'medicine_disabled'
+
+
+def get_events_backend(app=None):
+    """
+    Backend de pub/sub de la app, creado una vez por proceso según
+    EVENTS_BACKEND ('paquete.modulo:Clase', por defecto en proceso)
+    """
+    app = app or current_app._get_current_object()
+    backend = app.extensions.get('events_backend')
+    if backend is None:
+        backend = load_backend(app.config.get('EVENTS_BACKEND'))
+        app.extensions['events_backend'] = backend
+    return backend
+
+
+def carers_of_patients(patient_ids):
+    """IDs de los cuidadores asignados a alguno de los pacientes"""
+    assignments = User.user_patient_assignment
+    return set(db.session.execute(
+        select(assignments.c.user_id).where(assignments.c.patient_id.in_(list(patient_ids)))
+    ).scalars())
+
+def carers_of_medicine(medicine_id):
+    """IDs de los cuidadores con algún paciente que toma la medicina"""
+    assignments = User.user_patient_assignment
+    return set(db.session.execute(
+        select(assignments.c.user_id).distinct()
+        .join(patient_medicines, patient_medicines.c.patient_id == assignments.c.patient_id)
+        .where(patient_medicines.c.medicine_id == medicine_id)
+    ).scalars())
+
+
+def publish_event(event_type, data, audience):
+    """
+    Publica un evento en el centro en curso. Se llama después del commit; un
+    fallo al publicar se registra pero no afecta a la petición
+
+    Args:
+        event_type: Tipo de evento
+        data: Datos del evento
+        audience: IDs de usuario destinatarios, o función sin argumentos que
+            los devuelve (se evalúa aquí para que sus fallos tampoco propaguen)
+    """
+    try:
+        user_ids = audience() if callable(audience) else audience
+        backend = get_events_backend()
+        backend.publish(Event(backend.next_id(), event_type, data, frozenset(user_ids),
+                              current_tenant_id()))
+    except Exception as e:
+        logger.error(f"Error al publicar el evento {event_type}: {str(e)}")
+
+def publish_patient_event(event_type, patient_id, data):
+    """Publica un evento de un paciente para sus cuidadores"""
+    publish_event(event_type, {'patient_id': patient_id, **data},
+                  lambda: carers_of_patients([patient_id]))
+
+def publish_medicine_event(event_type, medicine_id):
+    """Publica un evento del catálogo para los cuidadores de quien toma la medicina"""
+    publish_event(event_type, {'medicine_id': medicine_id},
+                  lambda: carers_of_medicine(medicine_id))
+
+
+def format_sse(event):
+    """Serializa un evento en formato text/event-stream"""
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+
+def format_resync():
+    """Aviso al cliente de que se perdieron eventos: debe usar /api/sync"""
+    return "event: resync\ndata: {}\n\n"
+
+def stream_events(subscription, heartbeat=SSE_HEARTBEAT_SECONDS):
+    """
+    Generador del stream SSE para una suscripción. Envía un comentario cada
+    heartbeat segundos para mantener viva la conexión a través del proxy
+    y cierra la suscripción cuando el cliente se desconecta
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            event = subscription.get(timeout=heartbeat)
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield format_resync()
+            yield format_sse(event) if event is not None else ": keepalive\n\n"
+    finally:
+        subscription.close()
+
+async def astream_events(subscription, heartbeat=SSE_HEARTBEAT_SECONDS):
+    """Versión asíncrona de stream_events para el modo ASGI"""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield format_resync()
+            yield format_sse(event) if event is not None else ": keepalive\n\n"
+    finally:
+        subscription.close()
@@ -0,0 +1,52 @@
+from typing import List
+
+from sqlalchemy import exists, insert, select
+
+from app.extensions import db
+from app.models.change_log import sync_version
+from app.models.facility import Facility
+from app.models.user import User
+
+
+def get_facilities() -> List[Facility]:
+    """Todos los centros, por ID"""
+    return list(db.session.execute(select(Facility).order_by(Facility.id)).scalars())
+
+def create_facility(name: str) -> Facility:
+    """
+    Da de alta un centro con su contador de versiones del change log
+
+    Raises:
+        ValueError: Si el nombre está vacío o ya existe
+    """
+    name = (name or '').strip()
+    if not name:
+        raise ValueError("El nombre del centro es obligatorio")
+    if db.session.execute(select(exists().where(Facility.name == name))).scalar():
+        raise ValueError(f"Ya existe un centro llamado '{name}'")
+    facility = Facility(name=name)
+    db.session.add(facility)
+    db.session.flush()
+    db.session.execute(insert(sync_version).values(tenant_id=facility.id, version=0))
+    db.session.commit()
+    return facility
+
+def move_user_to_facility(username: str, facility_id: int) -> User:
+    """
+    Cambia de centro a un usuario sin pacientes asignados. Sus tokens
+    siguen con el centro anterior hasta que caduquen
+
+    Raises:
+        ValueError: Si el usuario o el centro no existen, o si tiene pacientes
+    """
+    user = db.session.execute(select(User).where(User.username == username.lower())).scalar()
+    if user is None:
+        raise ValueError(f"Usuario no encontrado: {username}")
+    if db.session.get(Facility, facility_id) is None:
+        raise ValueError(f"Centro no encontrado: {facility_id}")
+    assignments = User.user_patient_assignment
+    if db.session.execute(select(exists().where(assignments.c.user_id == user.id))).scalar():
+        raise ValueError("El usuario tiene pacientes asignados en su centro actual")
+    user.tenant_id = facility_id
+    db.session.commit()
+    return user
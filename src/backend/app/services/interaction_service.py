@@ -0,0 +1,263 @@
+import csv
+import logging
+import os
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import delete, insert, literal, select, union_all
+
+from app.extensions import db
+from app.models.drug_interaction import DrugInteraction
+from app.models.medicine import Medicine
+from app.models.patients import Patient, patient_medicines
+from app.models.user import User
+from app.utils.db_routing import read_only
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'drug_interactions.csv'
+)
+
+KINDS = ('interaction', 'duplicate_therapy')
+SEVERITIES = ('minor', 'moderate', 'major')
+# Las reglas de esta gravedad impiden la asignación salvo que se fuerce (override)
+BLOCKING_SEVERITIES = frozenset({'major'})
+
+
+@lru_cache(maxsize=8192)
+def normalize_name(name: str) -> str:
+    """
+    Nombre de medicina comparable: minúsculas, sin tildes ni espacios
+    sobrantes. Se memoriza porque el catálogo repite siempre los mismos nombres
+    """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return ' '.join(
+        ''.join(char for char in decomposed if not unicodedata.combining(char)).lower().split()
+    )
+
+
+class Rule(NamedTuple):
+    """Regla compilada entre dos nombres normalizados (a < b)"""
+    medicine_a: str
+    medicine_b: str
+    kind: str
+    severity: str
+    description: Optional[str]
+
+
+class InteractionIndex:
+    """
+    Índice de adyacencia en memoria: para cada nombre normalizado, el
+    conjunto (frozenset) de nombres con los que tiene alguna regla. Comprobar
+    una medicina contra las k que ya toma un paciente es O(k), sin consultas
+    """
+
+    def __init__(self, rules: Iterable[Rule]):
+        adjacency = defaultdict(set)
+        self._rules: Dict[Tuple[str, str], List[Rule]] = defaultdict(list)
+        for rule in rules:
+            adjacency[rule.medicine_a].add(rule.medicine_b)
+            adjacency[rule.medicine_b].add(rule.medicine_a)
+            self._rules[(rule.medicine_a, rule.medicine_b)].append(rule)
+        self._adjacency = {name: frozenset(others) for name, others in adjacency.items()}
+        self._rules = dict(self._rules)
+
+    def __len__(self):
+        return sum(len(rules) for rules in self._rules.values())
+
+    def _pair_conflicts(self, first, second):
+        """Conflictos entre dos medicinas dadas como (id, nombre)"""
+        name_a, name_b = normalize_name(first[1]), normalize_name(second[1])
+        if name_b not in self._adjacency.get(name_a, ()):
+            return []
+        return [
+            {
+                'medicine_ids': [first[0], second[0]],
+                'medicines': [first[1], second[1]],
+                'kind': rule.kind,
+                'severity': rule.severity,
+                'description': rule.description
+            }
+            for rule in self._rules[min(name_a, name_b), max(name_a, name_b)]
+        ]
+
+    def check(self, medicine: Tuple[int, str], current: Iterable[Tuple[int, str]]) -> List[dict]:
+        """
+        Conflictos de una medicina nueva con las que ya toma el paciente
+
+        Args:
+            medicine: (id, nombre) de la medicina a asignar
+            current: (id, nombre) de las medicinas actuales
+        """
+        neighbors = self._adjacency.get(normalize_name(medicine[1]))
+        if not neighbors:
+            return []
+        conflicts = []
+        for other in current:
+            if normalize_name(other[1]) in neighbors:
+                conflicts.extend(self._pair_conflicts(medicine, other))
+        return conflicts
+
+    def check_set(self, medicines: List[Tuple[int, str]]) -> List[dict]:
+        """Conflictos entre todas las parejas de un conjunto de medicinas"""
+        indexed = [medicine for medicine in medicines if normalize_name(medicine[1]) in self._adjacency]
+        conflicts = []
+        for first, second in combinations(indexed, 2):
+            conflicts.extend(self._pair_conflicts(first, second))
+        return conflicts
+
+
+def has_blocking(conflicts: List[dict]) -> bool:
+    return any(conflict['severity'] in BLOCKING_SEVERITIES for conflict in conflicts)
+
+
+def read_rules_csv(path: str) -> List[Rule]:
+    """
+    Lee las reglas de un CSV (medicine_a, medicine_b, kind, severity,
+    description) y las normaliza; las parejas repetidas se quedan con la última
+
+    Raises:
+        ValueError: Si alguna fila no es válida
+    """
+    rules = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            name_a = normalize_name(row.get('medicine_a'))
+            name_b = normalize_name(row.get('medicine_b'))
+            kind = (row.get('kind') or 'interaction').strip()
+            severity = (row.get('severity') or '').strip()
+            if not name_a or not name_b or name_a == name_b:
+                raise ValueError(f"Línea {line}: se requieren dos medicinas distintas")
+            if kind not in KINDS:
+                raise ValueError(f"Línea {line}: tipo no válido '{kind}'")
+            if severity not in SEVERITIES:
+                raise ValueError(f"Línea {line}: gravedad no válida '{severity}'")
+            name_a, name_b = min(name_a, name_b), max(name_a, name_b)
+            rules[(name_a, name_b, kind)] = Rule(
+                name_a, name_b, kind, severity, (row.get('description') or '').strip() or None
+            )
+    return list(rules.values())
+
+def load_interaction_rules(path: str = FIXTURE_PATH) -> int:
+    """
+    Sustituye las reglas guardadas por las del CSV en una sola transacción
+    y recompila el índice de este proceso. Devuelve cuántas reglas se cargaron.
+    Los demás procesos las ven al reiniciarse
+    """
+    rules = read_rules_csv(path)
+    try:
+        db.session.execute(delete(DrugInteraction))
+        if rules:
+            db.session.execute(insert(DrugInteraction), [rule._asdict() for rule in rules])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    reset_interaction_index()
+    return len(rules)
+
+
+def build_interaction_index() -> InteractionIndex:
+    """Compila las reglas guardadas en un índice en memoria"""
+    rows = db.session.execute(
+        select(DrugInteraction.medicine_a, DrugInteraction.medicine_b, DrugInteraction.kind,
+               DrugInteraction.severity, DrugInteraction.description)
+    ).all()
+    return InteractionIndex(Rule(*row) for row in rows)
+
+def get_interaction_index(app=None) -> InteractionIndex:
+    """Índice de la app, compilado una vez por proceso en el primer uso"""
+    app = app or current_app._get_current_object()
+    index = app.extensions.get('interaction_index')
+    if index is None:
+        index = build_interaction_index()
+        app.extensions['interaction_index'] = index
+        logger.info(f"Índice de interacciones compilado: {len(index)} reglas")
+    return index
+
+def reset_interaction_index(app=None):
+    """Descarta el índice para que se recompile en el siguiente uso"""
+    app = app or current_app._get_current_object()
+    app.extensions.pop('interaction_index', None)
+
+
+def get_assignment_context(patient_id: int, medicine_id: int):
+    """
+    En una sola consulta: la medicina a asignar, si el paciente ya la tiene
+    y las (id, nombre) de sus medicinas actuales
+
+    Returns:
+        (medicina (id, nombre) o None si no existe, ya_asignada, actuales)
+    """
+    # Dos búsquedas por índice (PK de medicines y prefijo de la PK de
+    # patient_medicines) en un único viaje a la base de datos
+    rows = db.session.execute(union_all(
+        select(Medicine.id, Medicine.name, literal(False).label('assigned'))
+        .where(Medicine.id == medicine_id),
+        select(Medicine.id, Medicine.name, literal(True).label('assigned'))
+        .join(patient_medicines, patient_medicines.c.medicine_id == Medicine.id)
+        .where(patient_medicines.c.patient_id == patient_id)
+    )).all()
+
+    medicine, assigned, current = None, False, []
+    for row in rows:
+        if row.id != medicine_id:
+            current.append((row.id, row.name))
+        elif row.assigned:
+            assigned = True
+        else:
+            medicine = (row.id, row.name)
+    return medicine, assigned, current
+
+def check_medicine_ids(medicine_ids: List[int]) -> List[dict]:
+    """Conflictos entre las parejas de una lista de medicinas"""
+    rows = db.session.execute(
+        select(Medicine.id, Medicine.name).where(Medicine.id.in_(medicine_ids)).order_by(Medicine.id)
+    ).all()
+    return get_interaction_index().check_set([tuple(row) for row in rows])
+
+@read_only
+def check_patients(patient_ids: Optional[List[int]] = None, carer_id: Optional[int] = None) -> dict:
+    """
+    Revisión de una planta completa: conflictos entre las medicinas actuales
+    de cada paciente, leyendo todas las asignaciones en una sola consulta
+
+    Args:
+        patient_ids: Limitar a estos pacientes
+        carer_id: Limitar a los pacientes de este cuidador
+        (sin filtros: todos los pacientes activos)
+
+    Returns:
+        {'checked': pacientes revisados, 'patients': [{'patient_id', 'conflicts'}]}
+        solo con los pacientes que tienen algún conflicto
+    """
+    stmt = (
+        select(patient_medicines.c.patient_id, Medicine.id, Medicine.name)
+        .join(Medicine, Medicine.id == patient_medicines.c.medicine_id)
+    )
+    if patient_ids is not None:
+        stmt = stmt.where(patient_medicines.c.patient_id.in_(patient_ids))
+    else:
+        stmt = stmt.join(Patient, Patient.id == patient_medicines.c.patient_id).where(Patient.quit.is_(False))
+    if carer_id is not None:
+        assignments = User.user_patient_assignment
+        stmt = stmt.where(patient_medicines.c.patient_id.in_(
+            select(assignments.c.patient_id).where(assignments.c.user_id == carer_id)
+        ))
+
+    by_patient: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+    for row in db.session.execute(stmt.order_by(patient_medicines.c.patient_id, Medicine.id)):
+        by_patient[row.patient_id].append((row.id, row.name))
+
+    index = get_interaction_index()
+    patients = []
+    for patient_id, medicines in by_patient.items():
+        conflicts = index.check_set(medicines)
+        if conflicts:
+            patients.append({'patient_id': patient_id, 'conflicts': conflicts})
+    return {'checked': len(by_patient), 'patients': patients}
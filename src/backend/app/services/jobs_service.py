@@ -0,0 +1,226 @@
+import logging
+import random
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from app.extensions import db
+from app.models.job import Job
+from app.services.assignment_service import auto_assign_patients
+from app.services.auth_service import provision_users
+from app.services.patients_service import import_patients, patients_statement, reassign_patients
+from app.utils.db_routing import read_only
+from app.utils.tenancy import tenant_scope
+from app.utils.mappers.serializers import patient_serializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+MAX_ALLOWED_ATTEMPTS = 10
+
+# Reintentos: espera base * 2^(intento - 1), con tope y un ±20% de jitter.
+# Se pueden sobrescribir con app.config['JOB_RETRY_BASE_SECONDS'] / ['JOB_RETRY_MAX_SECONDS']
+DEFAULT_RETRY_BASE_SECONDS = 10
+DEFAULT_RETRY_MAX_SECONDS = 900
+
+# Un trabajo 'running' sin terminar pasado este tiempo se considera de un
+# worker caído y se vuelve a encolar (app.config['JOB_LOCK_TIMEOUT_SECONDS'])
+DEFAULT_LOCK_TIMEOUT_SECONDS = 1800
+
+
+def _export_patients(payload):
+    serializer = patient_serializer.project(payload.get('fields'))
+    rows = db.session.execute(patients_statement(serializer))
+    return {
+        'fields': list(serializer.fields),
+        'rows': [list(serializer.from_row(row).values()) for row in rows]
+    }
+
+def _import_patients(payload):
+    patient_ids = import_patients(payload.get('patients'))
+    return {'created': len(patient_ids), 'patient_ids': patient_ids}
+
+def _import_users(payload):
+    user_ids = provision_users(payload.get('users'))
+    return {'created': len(user_ids), 'user_ids': user_ids}
+
+def _reassign_patients(payload):
+    try:
+        from_user_id = int(payload['from_user_id'])
+        to_user_id = int(payload['to_user_id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Se requieren from_user_id y to_user_id")
+    return reassign_patients(from_user_id, to_user_id, payload.get('patient_ids'))
+
+def _auto_assign_patients(payload):
+    return auto_assign_patients(
+        patient_ids=payload.get('patient_ids'),
+        carer_ids=payload.get('carer_ids'),
+        max_per_carer=payload.get('max_per_carer'),
+        on_shift_only=bool(payload.get('on_shift_only', True))
+    )
+
+# Tipo de trabajo -> función(payload) que devuelve un resultado serializable.
+# Un ValueError es un error de datos: el trabajo falla sin reintentos
+JOB_HANDLERS = {
+    'patients_export': _export_patients,
+    'patients_import': _import_patients,
+    'patients_reassign': _reassign_patients,
+    'patients_auto_assign': _auto_assign_patients,
+    'users_import': _import_users,
+}
+
+# Tipos que solo pueden encolar los admins
+ADMIN_JOB_TYPES = {'users_import'}
+
+
+def enqueue_job(job_type, payload=None, user_id=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Encola un trabajo para el worker
+
+    Raises:
+        ValueError: Si el tipo no existe o los parámetros no son válidos
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de trabajo desconocido: {job_type}")
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        raise ValueError("payload debe ser un objeto")
+    if not isinstance(max_attempts, int) or not 1 <= max_attempts <= MAX_ALLOWED_ATTEMPTS:
+        raise ValueError(f"max_attempts debe estar entre 1 y {MAX_ALLOWED_ATTEMPTS}")
+
+    job = Job(type=job_type, payload=payload, created_by=user_id, max_attempts=max_attempts)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def get_job(job_id):
+    """Obtener trabajo por ID"""
+    return db.session.get(Job, job_id)
+
+@read_only
+def get_jobs(user_id=None, status=None, limit=50):
+    """Últimos trabajos, opcionalmente de un usuario y/o en un estado"""
+    query = Job.query
+    if user_id is not None:
+        query = query.filter_by(created_by=user_id)
+    if status:
+        query = query.filter_by(status=status)
+    return query.order_by(Job.id.desc()).limit(limit).all()
+
+def retry_job(job):
+    """
+    Vuelve a encolar un trabajo fallido con los intentos a cero
+
+    Raises:
+        ValueError: Si el trabajo no está fallido
+    """
+    if job.status != Job.FAILED:
+        raise ValueError("Solo se pueden reintentar trabajos fallidos")
+    job.status = Job.QUEUED
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.error = None
+    job.locked_at = None
+    job.finished_at = None
+    db.session.commit()
+    return job
+
+
+def claim_next_job(worker_id):
+    """
+    Reserva el siguiente trabajo pendiente. En Postgres usa
+    FOR UPDATE SKIP LOCKED para que varios workers no compitan por la misma
+    fila; el UPDATE condicionado al estado lo garantiza también en SQLite
+    """
+    now = datetime.utcnow()
+    job_id = db.session.execute(
+        select(Job.id)
+        .where(Job.status == Job.QUEUED, Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar()
+    if job_id is None:
+        db.session.rollback()
+        return None
+
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == Job.QUEUED)
+        .values(status=Job.RUNNING, attempts=Job.attempts + 1,
+                locked_by=worker_id, locked_at=now)
+    ).rowcount
+    db.session.commit()
+    return get_job(job_id) if claimed else None
+
+def _retry_delay(attempts):
+    config = current_app.config
+    base = config.get('JOB_RETRY_BASE_SECONDS', DEFAULT_RETRY_BASE_SECONDS)
+    cap = config.get('JOB_RETRY_MAX_SECONDS', DEFAULT_RETRY_MAX_SECONDS)
+    delay = min(base * 2 ** (attempts - 1), cap)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+def execute_job(job):
+    """
+    Ejecuta un trabajo reservado, en el centro de quien lo encoló, y guarda
+    el resultado. Si falla se reprograma con backoff exponencial hasta
+    agotar max_attempts
+    """
+    try:
+        with tenant_scope(job.tenant_id):
+            result = JOB_HANDLERS[job.type](job.payload or {})
+    except Exception as e:
+        db.session.rollback()
+        retryable = not isinstance(e, ValueError) and job.attempts < job.max_attempts
+        job.error = str(e)
+        if retryable:
+            job.status = Job.QUEUED
+            job.run_at = datetime.utcnow() + _retry_delay(job.attempts)
+            logger.warning(f"Trabajo {job.id} ({job.type}) falló, reintento {job.attempts}: {str(e)}")
+        else:
+            job.status = Job.FAILED
+            job.finished_at = datetime.utcnow()
+            logger.error(f"Trabajo {job.id} ({job.type}) fallido: {str(e)}")
+        job.locked_by = None
+        db.session.commit()
+        return job
+
+    job.status = Job.SUCCEEDED
+    job.result = result
+    job.error = None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+def run_next_job(worker_id):
+    """Reserva y ejecuta el siguiente trabajo; None si no hay ninguno pendiente"""
+    job = claim_next_job(worker_id)
+    if job is None:
+        return None
+    return execute_job(job)
+
+def requeue_stale_jobs():
+    """
+    Recupera los trabajos 'running' cuyo worker dejó de responder: se
+    vuelven a encolar o, si ya agotaron los intentos, se marcan fallidos.
+    Devuelve cuántos se recuperaron
+    """
+    timeout = current_app.config.get('JOB_LOCK_TIMEOUT_SECONDS', DEFAULT_LOCK_TIMEOUT_SECONDS)
+    now = datetime.utcnow()
+    stale = (Job.status == Job.RUNNING) & (Job.locked_at < now - timedelta(seconds=timeout))
+    db.session.execute(
+        update(Job)
+        .where(stale, Job.attempts >= Job.max_attempts)
+        .values(status=Job.FAILED, locked_by=None, finished_at=now,
+                error='El worker dejó de responder')
+    )
+    count = db.session.execute(
+        update(Job)
+        .where(stale)
+        .values(status=Job.QUEUED, locked_by=None, run_at=now)
+    ).rowcount
+    db.session.commit()
+    return count
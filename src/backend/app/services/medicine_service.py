@@ -1,12 +1,27 @@
-from app.models.patients import Patient, db
+from datetime import datetime
+
+from app.models.change_log import ChangeLog
+from app.models.patients import Patient, db, patient_medicines
 from app.models.medicine import Medicine, db
+from app.services.sync_service import record_change, record_link_deletes
+from app.utils.conditional import ResourceState
+from app.utils.db_routing import read_only
 from app.utils.mappers.generic_mapper import GenericMapper
-from sqlalchemy import or_, func
+from sqlalchemy import or_, func, select
+from sqlalchemy.orm import load_only
 
 
-def get_all_medicines(active_only):
-    """Obtener todas las medicinas (opcional solo activas)"""
+def _medicines_query(fields=None):
+    """Query base de medicinas; si se indican campos solo se cargan esas columnas"""
     query = Medicine.query
+    if fields:
+        query = query.options(load_only(*(getattr(Medicine, field) for field in fields)))
+    return query
+
+@read_only
+def get_all_medicines(active_only, fields=None):
+    """Obtener todas las medicinas (opcional solo activas)"""
+    query = _medicines_query(fields)
     if active_only:
         query = query.filter_by(is_active=active_only)
     return query.all()
@@ -15,6 +30,26 @@ def get_medicine_by_id(medicine_id):
     """Obtener medicina por ID"""
     return Medicine.query.get(medicine_id)
 
+def medicines_state_statement():
+    """Consulta agregada del estado del catálogo: número y última modificación"""
+    return select(func.count(Medicine.id), func.max(Medicine.updated_at))
+
+@read_only
+def medicines_state():
+    """Estado del catálogo para GET condicional"""
+    return ResourceState.from_row(db.session.execute(medicines_state_statement()).one())
+
+@read_only
+def medicine_state(medicine_id):
+    """Estado de una medicina para GET condicional; None si no existe"""
+    row = db.session.execute(
+        select(Medicine.updated_at).where(Medicine.id == medicine_id)
+    ).first()
+    if row is None:
+        return None
+    return ResourceState((medicine_id, row.updated_at), row.updated_at)
+
+@read_only
 def get_medicines_paginated(page: int = 1, per_page: int = 10):
     """Obtener medicinas paginadas"""
     return Medicine.query.paginate(
@@ -24,20 +59,23 @@ def get_medicines_paginated(page: int = 1, per_page: int = 10):
     )
 
 def create_medicine(medicine_data):
-    """Crear nueva medicina"""
-    medicine = Medicine(**medicine_data)
+    """Crear nueva medicina (id, fechas y centro no se toman de los datos)"""
+    medicine = GenericMapper.create_model(Medicine, medicine_data)
     db.session.add(medicine)
+    db.session.flush()
+    record_change('medicines', medicine.id)
     db.session.commit()
     return medicine
 
 def update_medicine(medicine_id, medicine_data):
-    """Actualizar medicina existente"""
+    """Actualizar medicina existente (id, fechas y centro no se toman de los datos)"""
     medicine = get_medicine_by_id(medicine_id)
     if not medicine:
         return None
     
     GenericMapper.update_model(medicine, medicine_data)
-    medicine.updated_at = func.now()
+    medicine.updated_at = datetime.utcnow()
+    record_change('medicines', medicine.id)
     db.session.commit()
     return medicine
 
@@ -45,11 +83,20 @@ def delete_medicine(medicine_id):
     """Eliminar medicina"""
     medicine = get_medicine_by_id(medicine_id)
     if medicine:
+        delete_medicine_links(medicine.id)
+        record_change('medicines', medicine.id, ChangeLog.DELETE)
         db.session.delete(medicine)
         db.session.commit()
         return True
     return False
 
+def delete_medicine_links(medicine_id):
+    """Quita la medicina de todos los pacientes antes de borrarla (sin commit)"""
+    record_link_deletes('patient_medicines', 'medicine_id', medicine_id)
+    db.session.execute(patient_medicines.delete().where(
+        patient_medicines.c.medicine_id == medicine_id
+    ))
+
 
 def assign_medicine_to_patient(patient_id, medicine_id, dose_per_take='1', notes=None):
     """Asignar medicina a paciente"""
@@ -88,15 +135,8 @@ def remove_medicine_from_patient(patient_id, medicine_id):
     return False
 
 
-def search_medicines(query, active_only=True):
-    """Buscar medicinas por nombre"""
-    base_query = Medicine.query.filter(Medicine.name.ilike(f'%{query}%'))
-    
-    if active_only:
-        base_query = base_query.filter_by(is_active=True)
-    
-    return base_query.limit(20).all()
-
+@read_only
+@read_only
 def get_medicines_by_frequency(frequency_hours=None, frequency_days=None):
     """Obtener medicinas por frecuencia"""
     query = Medicine.query
@@ -110,6 +150,7 @@ def get_medicines_by_frequency(frequency_hours=None, frequency_days=None):
     return query.all()
 
 
+@read_only
 def get_medicine_stats():
     """Estadísticas generales de medicinas"""
     total = db.session.query(func.count()).select_from(Medicine).scalar()
@@ -120,3 +161,42 @@ def get_medicine_stats():
         'active_medicines': active,
         'inactive_medicines': total - active
     }
+
+
+def medicines_statement(serializer, active_only=False):
+    """
+    SELECT de las columnas del serializador para las medicinas, ordenadas por ID.
+    Lo comparten las rutas síncronas y el modo ASGI (app.asgi)
+    """
+    stmt = serializer.select().order_by(Medicine.id)
+    if active_only:
+        stmt = stmt.where(Medicine.is_active == True)
+    return stmt
+
+def search_medicines_statement(serializer, query, active_only=True):
+    """SELECT de medicinas cuyo nombre contiene `query`"""
+    stmt = serializer.select().where(Medicine.name.ilike(f'%{query}%'))
+    if active_only:
+        stmt = stmt.where(Medicine.is_active == True)
+    return stmt
+
+def patient_medicines_statement(patient_id, serializer):
+    """SELECT de las medicinas activas de un paciente con su dosis y notas"""
+    return serializer.select(
+        patient_medicines.c.dose_per_take,
+        patient_medicines.c.notes
+    ).join(
+        patient_medicines,
+        (patient_medicines.c.medicine_id == Medicine.id) &
+        (patient_medicines.c.patient_id == patient_id)
+    ).where(Medicine.is_active == True)
+
+def serialize_patient_medicine_rows(rows, serializer):
+    """Serializa las filas de patient_medicines_statement"""
+    result = []
+    for row in rows:
+        medicine_data = serializer.from_row(row)
+        medicine_data['dose_per_take'] = row.dose_per_take or '1'
+        medicine_data['notes'] = row.notes or ''
+        result.append(medicine_data)
+    return result
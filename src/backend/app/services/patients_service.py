@@ -1,49 +1,117 @@
-from app.models.patients import Patient, db
+from app.models.change_log import ChangeLog
+from app.models.patients import Patient, db, patient_medicines
 from app.models.user import User, db
+from app.services.events_service import (
+    PATIENT_ASSIGNED, PATIENT_UNASSIGNED, PATIENTS_REASSIGNED, publish_event
+)
+from app.services.sync_service import record_change, record_changes, record_link_deletes
+from app.utils.conditional import ResourceState
+from app.utils.db_routing import read_only
+from app.utils.loaders import forget_entity, load_entity, resolve_entity
 from app.utils.mappers.generic_mapper import GenericMapper
-from typing import Any, Dict, List, Optional, Type, Union
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.orm import load_only
+from typing import Any, Dict, Iterable, List, Optional, Type, Union
 
+MAX_BULK_PATIENTS = 1000
 
-def get_all_patients():
+IMPORT_REQUIRED_FIELDS = ('name', 'surname', 'phone', 'instructions')
+
+
+def _patients_query(fields: Optional[List[str]] = None):
+    """
+    Query base de pacientes; si se indican campos solo se cargan esas columnas
+    """
+    query = Patient.query
+    if fields:
+        query = query.options(load_only(*(getattr(Patient, field) for field in fields)))
+    return query
+
+@read_only
+def get_all_patients(fields: Optional[List[str]] = None):
     """
     Obtiene todos los pacientes del sistema
     """
-    return Patient.query.all()
+    return _patients_query(fields).all()
 
 def get_patient_by_id(patient_id: int):
     """
-    Obtiene un paciente específico por su ID
+    Obtiene un paciente específico por su ID (una sola lectura por petición)
     """
-    return Patient.query.get(patient_id)
+    return load_entity(Patient, patient_id)
+
+def patients_state_statement():
+    """
+    Consulta agregada del estado de los pacientes: número y última
+    modificación de pacientes y de asignaciones, en un solo round-trip.
+    Las asignaciones se unen a Patient para que se filtren por centro
+    """
+    assignments = User.user_patient_assignment
+    return select(
+        select(func.count(Patient.id)).scalar_subquery(),
+        select(func.max(Patient.updated_at)).scalar_subquery(),
+        tenant_assignments(func.count()).scalar_subquery(),
+        tenant_assignments(func.max(assignments.c.assigned_at)).scalar_subquery(),
+    )
+
+def tenant_assignments(*columns):
+    """
+    SELECT sobre las asignaciones de los pacientes del centro en curso: la
+    tabla de relación no se filtra, Patient sí
+    """
+    assignments = User.user_patient_assignment
+    return select(*columns).select_from(assignments).join(Patient, Patient.id == assignments.c.patient_id)
+
+@read_only
+def patients_state() -> ResourceState:
+    """
+    Estado de la colección de pacientes para GET condicional
+    """
+    return ResourceState.from_row(db.session.execute(patients_state_statement()).one())
+
+@read_only
+def patient_state(patient_id: int) -> Optional[ResourceState]:
+    """
+    Estado de un paciente para GET condicional; None si no existe
+    """
+    row = db.session.execute(
+        select(Patient.updated_at).where(Patient.id == patient_id)
+    ).first()
+    if row is None:
+        return None
+    return ResourceState((patient_id, row.updated_at), row.updated_at)
 
 def patient_exists(patient_id: int):
     """
     Verifica si existe un paciente con el ID dado
     """
-    return Patient.query.get(patient_id) is not None
+    return load_entity(Patient, patient_id) is not None
 
 
-def get_patients_paginated(page: int = 1, per_page: int = 10):
+@read_only
+def get_patients_paginated(page: int = 1, per_page: int = 10, fields: Optional[List[str]] = None):
     """
     Obtiene pacientes paginados con metadatos de paginación
     """
-    return Patient.query.paginate(
+    return _patients_query(fields).paginate(
         page=page, 
         per_page=per_page, 
         error_out=False
     )
 
 
+@read_only
 def get_patients_by_carer_id(carer_id: int):
     """
     Obtiene TODOS los pacientes asignados a un cuidador específico (user_id)
     usando la relación many-to-many
     """
-    user = User.query.get(carer_id)
+    user = load_entity(User, carer_id)
     if not user:
         return []
     return user.patients.all()
 
+@read_only
 def get_user_patients(user_id: int):
     """
     Obtiene pacientes asignados a un usuario (alias de get_patients_by_carer_id)
@@ -51,39 +119,99 @@ def get_user_patients(user_id: int):
     return get_patients_by_carer_id(user_id)
 
 
-def assign_patient_to_user(user_id: int, patient_id: int):
+def patients_statement(serializer):
     """
-    Asigna un paciente a un usuario/cuidador
+    SELECT de las columnas del serializador para todos los pacientes.
+    Lo comparten las rutas síncronas y el modo ASGI (app.asgi)
+    """
+    return serializer.select().order_by(Patient.id)
+
+def _unassigned():
     """
-    user = User.query.get(user_id)
-    patient = Patient.query.get(patient_id)
+    Condición "sin cuidadores" sobre la tabla de asignaciones, sin pasar por
+    users: una asignación ya es del centro del paciente
+    """
+    assignments = User.user_patient_assignment
+    return ~exists().where(assignments.c.patient_id == Patient.id)
+
+def unassigned_patients_statement(serializer):
+    """
+    SELECT de los pacientes SIN usuarios asignados, más recientes primero
+    """
+    return serializer.select().where(_unassigned()).order_by(Patient.created_at.desc())
+
+def carer_patients_statement(carer_id: int, serializer):
+    """
+    SELECT de los pacientes asignados a un cuidador
+    """
+    assignments = User.user_patient_assignment
+    return serializer.select().join(
+        assignments, assignments.c.patient_id == Patient.id
+    ).where(assignments.c.user_id == carer_id).order_by(Patient.id)
+
+
+def _is_assigned(user_id: int, patient_id: int) -> bool:
+    """
+    Comprueba si existe la asignación sin cargar todos los pacientes del usuario
+    """
+    assignments = User.user_patient_assignment
+    return db.session.execute(
+        select(assignments.c.user_id).where(
+            assignments.c.user_id == user_id,
+            assignments.c.patient_id == patient_id
+        ).limit(1)
+    ).first() is not None
+
+def assign_patient_to_user(user_id: int, patient: Union[int, Patient]):
+    """
+    Asigna un paciente (instancia o ID) a un usuario/cuidador
+    """
+    user = load_entity(User, user_id)
+    patient = resolve_entity(Patient, patient)
     
     if user and patient:
     
-        if patient not in user.patients.all():
-            user.patients.append(patient)
+        if not _is_assigned(user.id, patient.id):
+            db.session.execute(User.user_patient_assignment.insert().values(
+                user_id=user.id,
+                patient_id=patient.id
+            ))
+            record_change('user_patient_assignments', (user.id, patient.id))
             db.session.commit()
+            publish_event(PATIENT_ASSIGNED, {'user_id': user.id, 'patient_id': patient.id}, [user.id])
             return True
     return False
 
-def remove_patient_from_user(user_id: int, patient_id: int):
+def remove_patient_from_user(user_id: int, patient: Union[int, Patient]):
     """
-    Remueve la asignación de un paciente de un usuario/cuidador
+    Remueve la asignación de un paciente (instancia o ID) de un usuario/cuidador
     """
-    user = User.query.get(user_id)
-    patient = Patient.query.get(patient_id)
+    patient_id = patient.id if isinstance(patient, Patient) else patient
+    assignments = User.user_patient_assignment
     
-    if user and patient and patient in user.patients.all():
-        user.patients.remove(patient)
-        db.session.commit()
-        return True
-    return False
+    result = db.session.execute(assignments.delete().where(
+        assignments.c.user_id == user_id,
+        assignments.c.patient_id == patient_id
+    ))
+    if result.rowcount > 0:
+        record_change('user_patient_assignments', (user_id, patient_id), ChangeLog.DELETE)
+    db.session.commit()
+    if result.rowcount > 0:
+        publish_event(PATIENT_UNASSIGNED, {'user_id': user_id, 'patient_id': patient_id}, [user_id])
+    return result.rowcount > 0
 
-def get_patient_users(patient_id: int):
+@read_only
+def get_unassigned_patients(fields: Optional[List[str]] = None):
     """
-    Obtiene todos los usuarios/cuidadores asignados a un paciente
+    Obtiene los pacientes SIN usuarios asignados, más recientes primero
+    """
+    return _patients_query(fields).filter(_unassigned()).order_by(Patient.created_at.desc()).all()
+
+def get_patient_users(patient: Union[int, Patient]):
     """
-    patient = Patient.query.get(patient_id)
+    Obtiene todos los usuarios/cuidadores asignados a un paciente (instancia o ID)
+    """
+    patient = resolve_entity(Patient, patient)
     return patient.assigned_users.all() if patient else []
 
 
@@ -93,28 +221,235 @@ def create_patient(patient: Patient):
     """
     new_patient = Patient.from_patient(patient)
     db.session.add(new_patient)
+    db.session.flush()
+    record_change('patients', new_patient.id)
     db.session.commit()
     return new_patient
 
-def update_patient(patient_id: int, patient_data: Union[Dict, Any]) -> Optional[Any]:
+def update_patient(patient: Union[int, Patient], patient_data: Union[Dict, Any]) -> Optional[Any]:
     """
-    Actualiza un paciente existente con los datos proporcionados
+    Actualiza un paciente existente (instancia o ID) con los datos proporcionados
     """
-    patient = Patient.query.get(patient_id)
+    patient = resolve_entity(Patient, patient)
     if not patient:
         return None
     
     GenericMapper.update_model(patient, patient_data)
+    record_change('patients', patient.id)
     db.session.commit()
     return patient
 
-def delete_patient(patient_id: int):
+def delete_patient(patient: Union[int, Patient]):
     """
-    Elimina un paciente y todas sus asignaciones relacionadas (CASCADE)
+    Elimina un paciente (instancia o ID) y todas sus asignaciones relacionadas (CASCADE)
     """
-    patient = Patient.query.get(patient_id)
+    patient = resolve_entity(Patient, patient)
     if patient:
+        patient_id = patient.id
+        record_link_deletes('user_patient_assignments', 'patient_id', patient_id)
+        record_link_deletes('patient_medicines', 'patient_id', patient_id)
+        db.session.execute(patient_medicines.delete().where(
+            patient_medicines.c.patient_id == patient_id
+        ))
+        record_change('patients', patient_id, ChangeLog.DELETE)
         db.session.delete(patient)
         db.session.commit()
+        forget_entity(Patient, patient_id)
         return True
     return False
+
+
+def _existing_patient_ids(patient_ids: List[int]):
+    """
+    Devuelve el conjunto de IDs que existen, con una sola consulta
+    """
+    if not patient_ids:
+        return set()
+    return set(db.session.execute(
+        select(Patient.id).where(Patient.id.in_(patient_ids))
+    ).scalars())
+
+def _bulk_report(patient_ids: List[int], found_ids: set, status: str):
+    """
+    Construye el informe por ID de una operación masiva
+    """
+    return [
+        {'id': patient_id, 'status': status if patient_id in found_ids else 'not_found'}
+        for patient_id in patient_ids
+    ]
+
+def _validate_bulk_ids(patient_ids: Iterable[Any]) -> List[int]:
+    """
+    Valida y deduplica (manteniendo el orden) una lista de IDs de pacientes
+    """
+    if not isinstance(patient_ids, list) or not patient_ids:
+        raise ValueError("Se requiere una lista de IDs de pacientes")
+    if any(not isinstance(patient_id, int) or isinstance(patient_id, bool) for patient_id in patient_ids):
+        raise ValueError("Los IDs de pacientes deben ser enteros")
+    patient_ids = list(dict.fromkeys(patient_ids))
+    if len(patient_ids) > MAX_BULK_PATIENTS:
+        raise ValueError(f"Máximo {MAX_BULK_PATIENTS} pacientes por operación")
+    return patient_ids
+
+def _validate_bulk_changes(changes: Dict) -> Dict:
+    """
+    Comprueba que los cambios solo tocan columnas asignables del paciente
+    """
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError("No se proporcionaron datos para actualizar")
+    invalid = sorted(set(changes) - GenericMapper.writable_columns(Patient))
+    if invalid:
+        raise ValueError(f"Campos no actualizables: {', '.join(invalid)}")
+    return changes
+
+
+def bulk_update_patients(patient_ids: List[int], changes: Dict):
+    """
+    Aplica los mismos cambios a muchos pacientes con un único
+    UPDATE ... WHERE id IN (...) en una sola transacción.
+    Devuelve un informe con el resultado por ID
+    """
+    patient_ids = _validate_bulk_ids(patient_ids)
+    changes = _validate_bulk_changes(changes)
+    try:
+        found_ids = _existing_patient_ids(patient_ids)
+        if found_ids:
+            db.session.execute(
+                update(Patient).where(Patient.id.in_(found_ids)).values(**changes)
+            )
+            record_changes('patients', sorted(found_ids))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return _bulk_report(patient_ids, found_ids, 'updated')
+
+def bulk_update_patients_individually(patients_data: List[Dict]):
+    """
+    Aplica cambios distintos a cada paciente ([{'id': 1, ...}, ...]) con un
+    UPDATE por clave primaria en modo executemany, en una sola transacción.
+    Devuelve un informe con el resultado por ID
+    """
+    if not isinstance(patients_data, list) or not all(isinstance(item, dict) for item in patients_data):
+        raise ValueError("Se requiere una lista de pacientes")
+    patient_ids = _validate_bulk_ids([item.get('id') for item in patients_data])
+    changes_by_id = {}
+    for item in patients_data:
+        changes = {key: value for key, value in item.items() if key != 'id'}
+        changes_by_id.setdefault(item['id'], {}).update(_validate_bulk_changes(changes))
+    try:
+        found_ids = _existing_patient_ids(patient_ids)
+        rows = [
+            {'id': patient_id, **changes_by_id[patient_id]}
+            for patient_id in patient_ids if patient_id in found_ids
+        ]
+        if rows:
+            db.session.execute(update(Patient), rows)
+            record_changes('patients', [row['id'] for row in rows])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return _bulk_report(patient_ids, found_ids, 'updated')
+
+def bulk_soft_delete_patients(patient_ids: List[int]):
+    """
+    Da de baja (quit=True) a muchos pacientes en una sola transacción,
+    sin borrar sus datos ni asignaciones
+    """
+    patient_ids = _validate_bulk_ids(patient_ids)
+    try:
+        found_ids = _existing_patient_ids(patient_ids)
+        if found_ids:
+            db.session.execute(
+                update(Patient).where(Patient.id.in_(found_ids)).values(quit=True)
+            )
+            record_changes('patients', sorted(found_ids))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return _bulk_report(patient_ids, found_ids, 'deleted')
+
+
+def import_patients(patients_data: List[Dict]) -> List[int]:
+    """
+    Crea muchos pacientes en una sola transacción (trabajo 'patients_import').
+    Valida todas las filas antes de escribir y devuelve los IDs creados
+    """
+    if not isinstance(patients_data, list) or not patients_data:
+        raise ValueError("Se requiere una lista de pacientes")
+    errors = []
+    for index, item in enumerate(patients_data):
+        if not isinstance(item, dict):
+            errors.append(f"fila {index}: formato inválido")
+            continue
+        missing = [field for field in IMPORT_REQUIRED_FIELDS if not item.get(field)]
+        if missing:
+            errors.append(f"fila {index}: faltan {', '.join(missing)}")
+    if errors:
+        raise ValueError(f"Filas inválidas: {'; '.join(errors[:20])}")
+
+    try:
+        patients = GenericMapper.create_many(
+            Patient, patients_data, exclude_fields=['id', 'created_at', 'updated_at', 'tenant_id']
+        )
+        db.session.add_all(patients)
+        db.session.flush()
+        patient_ids = [patient.id for patient in patients]
+        record_changes('patients', patient_ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return patient_ids
+
+def reassign_patients(from_user_id: int, to_user_id: int, patient_ids: Optional[List[int]] = None):
+    """
+    Pasa los pacientes de un cuidador a otro en una sola transacción
+    (trabajo 'patients_reassign'). Sin patient_ids se pasan todos
+    """
+    if from_user_id == to_user_id:
+        raise ValueError("El cuidador de origen y el de destino son el mismo")
+    if load_entity(User, from_user_id) is None or load_entity(User, to_user_id) is None:
+        raise ValueError("Usuario no encontrado")
+
+    assignments = User.user_patient_assignment
+    condition = assignments.c.user_id == from_user_id
+    if patient_ids is not None:
+        condition = condition & assignments.c.patient_id.in_(_validate_bulk_ids(patient_ids))
+
+    try:
+        moved_ids = db.session.execute(
+            select(assignments.c.patient_id).where(condition)
+        ).scalars().all()
+        new_ids = []
+        if moved_ids:
+            already_assigned = set(db.session.execute(
+                select(assignments.c.patient_id).where(
+                    assignments.c.user_id == to_user_id,
+                    assignments.c.patient_id.in_(moved_ids)
+                )
+            ).scalars())
+            new_ids = [patient_id for patient_id in moved_ids if patient_id not in already_assigned]
+            if new_ids:
+                db.session.execute(assignments.insert(), [
+                    {'user_id': to_user_id, 'patient_id': patient_id} for patient_id in new_ids
+                ])
+            db.session.execute(assignments.delete().where(condition))
+            record_changes('user_patient_assignments',
+                           [(from_user_id, patient_id) for patient_id in moved_ids], ChangeLog.DELETE)
+            record_changes('user_patient_assignments',
+                           [(to_user_id, patient_id) for patient_id in new_ids])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if moved_ids:
+        publish_event(PATIENTS_REASSIGNED, {
+            'from_user_id': from_user_id,
+            'to_user_id': to_user_id,
+            'patient_ids': moved_ids
+        }, [from_user_id, to_user_id])
+    return {'moved': len(moved_ids), 'patient_ids': moved_ids}
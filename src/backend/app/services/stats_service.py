@@ -0,0 +1,25 @@
+import os
+from typing import Any, Dict
+
+from flask import current_app
+
+from app.services.events_service import get_events_backend
+
+
+def get_runtime_stats() -> Dict[str, Any]:
+    """
+    Contadores en memoria del proceso que atiende la petición: caché de
+    entidades, descarte de carga, réplicas de lectura y suscripciones SSE.
+    Cada worker tiene los suyos (de ahí el pid); None si no está activo
+    """
+    extensions = current_app.extensions
+    cache = extensions.get('entity_cache')
+    shedder = extensions.get('load_shedder')
+    router = extensions.get('replica_router')
+    return {
+        'pid': os.getpid(),
+        'entity_cache': cache.stats() if cache is not None else None,
+        'load_shedding': shedder.stats() if shedder is not None else None,
+        'read_replicas': router.stats() if router is not None else None,
+        'event_subscribers': get_events_backend().subscriber_count(),
+    }
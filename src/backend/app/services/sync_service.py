@@ -0,0 +1,282 @@
+from app.models.change_log import ChangeLog, sync_version
+from app.models.medicine import Medicine
+from app.models.patients import Patient, db, patient_medicines
+from app.models.user import User
+from app.utils.conditional import ResourceState
+from app.utils.db_routing import read_only
+from app.utils.tenancy import default_tenant_id
+from sqlalchemy import func, insert, select, tuple_, update
+from typing import Any, Dict, Iterable, List, Tuple
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 5000
+
+# Versión del formato de /api/sync/snapshot: cambia si cambia su estructura
+SNAPSHOT_FORMAT = 1
+
+# Columnas de texto que se repiten mucho: en la foto van como índices a una
+# lista de valores distintos (codificación por diccionario)
+SNAPSHOT_DICTIONARY_COLUMNS = {
+    'medicines': ('name', 'dosage', 'description', 'instructions'),
+    'patient_medicines': ('dose_per_take', 'notes'),
+}
+
+# Entidades sincronizables: nombre -> (tabla, columnas de la clave)
+SYNC_ENTITIES = {
+    'patients': (Patient.__table__, ('id',)),
+    'medicines': (Medicine.__table__, ('id',)),
+    'patient_medicines': (patient_medicines, ('patient_id', 'medicine_id')),
+    'user_patient_assignments': (User.user_patient_assignment, ('user_id', 'patient_id')),
+}
+
+
+class SyncVersionError(ValueError):
+    """La versión del cliente no existe en el servidor (p. ej. BD restaurada)"""
+
+
+def _encode_key(key) -> str:
+    if isinstance(key, (tuple, list)):
+        return ':'.join(str(part) for part in key)
+    return str(key)
+
+def _decode_key(entity: str, entity_key: str):
+    parts = tuple(int(part) for part in entity_key.split(':'))
+    return parts if len(SYNC_ENTITIES[entity][1]) > 1 else parts[0]
+
+
+def record_changes(entity: str, keys: Iterable[Any], op: str = ChangeLog.UPSERT):
+    """
+    Registra cambios en el change log del centro en curso dentro de la
+    transacción actual. No hace commit: el llamador lo hace junto con el cambio
+
+    Args:
+        entity: Nombre de la entidad (clave de SYNC_ENTITIES)
+        keys: IDs, o tuplas para las tablas de relación
+        op: ChangeLog.UPSERT o ChangeLog.DELETE
+    """
+    if entity not in SYNC_ENTITIES:
+        raise ValueError(f"Entidad no sincronizable: {entity}")
+    keys = list(keys)
+    if not keys:
+        return
+
+    # Reserva un rango de versiones del centro; su fila queda bloqueada hasta el commit
+    tenant_id = default_tenant_id()
+    last = db.session.execute(
+        update(sync_version)
+        .where(sync_version.c.tenant_id == tenant_id)
+        .values(version=sync_version.c.version + len(keys))
+        .returning(sync_version.c.version)
+    ).scalar_one()
+    first = last - len(keys) + 1
+    db.session.execute(insert(ChangeLog), [
+        {'tenant_id': tenant_id, 'version': first + offset, 'entity': entity,
+         'entity_key': _encode_key(key), 'op': op}
+        for offset, key in enumerate(keys)
+    ])
+
+def record_change(entity: str, key: Any, op: str = ChangeLog.UPSERT):
+    """Registra un cambio en el change log dentro de la transacción actual"""
+    record_changes(entity, [key], op)
+
+def record_link_deletes(entity: str, column: str, value: int):
+    """
+    Registra como borradas las filas de una tabla de relación que van a
+    desaparecer al borrar la entidad padre (p. ej. las asignaciones de un paciente)
+    """
+    table, key_columns = SYNC_ENTITIES[entity]
+    keys = db.session.execute(
+        select(*(table.c[name] for name in key_columns)).where(table.c[column] == value)
+    ).all()
+    record_changes(entity, [tuple(key) for key in keys], ChangeLog.DELETE)
+
+
+@read_only
+def get_current_version() -> int:
+    """Última versión confirmada del change log del centro en curso"""
+    return db.session.execute(
+        select(sync_version.c.version).where(sync_version.c.tenant_id == default_tenant_id())
+    ).scalar() or 0
+
+def _sync_columns(entity: str) -> list:
+    """Columnas que se envían de una entidad: todas menos tenant_id"""
+    table = SYNC_ENTITIES[entity][0]
+    return [column for column in table.columns if column.key != 'tenant_id']
+
+def _serialize_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _current_rows(entity: str, keys: List[Any]) -> Tuple[List[str], Dict[Any, list]]:
+    """
+    Carga el estado actual de las filas cambiadas de una entidad, en formato
+    compacto (lista de valores en el orden de las columnas)
+    """
+    table, key_columns = SYNC_ENTITIES[entity]
+    # Las claves salen del change log ya filtrado por centro
+    columns = _sync_columns(entity)
+    fields = [column.key for column in columns]
+    if not keys:
+        return fields, {}
+    if len(key_columns) == 1:
+        condition = table.c[key_columns[0]].in_(keys)
+    else:
+        condition = tuple_(*(table.c[name] for name in key_columns)).in_(keys)
+
+    rows = {}
+    for row in db.session.execute(select(*columns).where(condition)):
+        key = tuple(row._mapping[name] for name in key_columns)
+        rows[key if len(key) > 1 else key[0]] = [_serialize_value(value) for value in row]
+    return fields, rows
+
+@read_only
+def get_changes(since: int, limit: int = DEFAULT_SYNC_LIMIT) -> Dict[str, Any]:
+    """
+    Cambios posteriores a una versión: una entrada por fila cambiada (la
+    última operación), con el estado actual o una lápida si se borró.
+    El coste depende del número de cambios, no del tamaño de las tablas
+
+    Returns:
+        {'version': versión a usar como since en la siguiente petición,
+         'has_more': si quedan cambios por descargar,
+         'changes': {entidad: {'fields': [...], 'rows': [[...]], 'deleted': [clave, ...]}}}
+
+    Raises:
+        ValueError: Si since o limit no son válidos
+        SyncVersionError: Si since es posterior a la versión actual
+    """
+    if since < 0:
+        raise ValueError("since debe ser mayor o igual que 0")
+    if limit < 1 or limit > MAX_SYNC_LIMIT:
+        raise ValueError(f"limit debe estar entre 1 y {MAX_SYNC_LIMIT}")
+
+    # La versión actual se lee antes que el log: todo lo que sea <= head ya
+    # está confirmado, así que no se salta ningún cambio en curso
+    tenant_id = default_tenant_id()
+    head = get_current_version()
+    if since > head:
+        raise SyncVersionError("Versión desconocida, se requiere una sincronización completa")
+
+    latest = (
+        select(func.max(ChangeLog.version).label('version'))
+        .where(ChangeLog.tenant_id == tenant_id, ChangeLog.version > since, ChangeLog.version <= head)
+        .group_by(ChangeLog.entity, ChangeLog.entity_key)
+        .order_by(func.max(ChangeLog.version))
+        .limit(limit + 1)
+        .subquery()
+    )
+    # Las versiones son por centro: la consulta externa va sobre la tabla y
+    # busca por la clave primaria (tenant_id, version)
+    log = ChangeLog.__table__
+    entries = db.session.execute(
+        select(log.c.version, log.c.entity, log.c.entity_key, log.c.op)
+        .join(latest, log.c.version == latest.c.version)
+        .where(log.c.tenant_id == tenant_id)
+        .order_by(log.c.version)
+    ).all()
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    version = entries[-1].version if has_more else head
+
+    upserts: Dict[str, List[Any]] = {}
+    deleted: Dict[str, List[Any]] = {}
+    for entry in entries:
+        key = _decode_key(entry.entity, entry.entity_key)
+        target = upserts if entry.op == ChangeLog.UPSERT else deleted
+        target.setdefault(entry.entity, []).append(key)
+
+    changes = {}
+    for entity in SYNC_ENTITIES:
+        keys = upserts.get(entity, [])
+        tombstones = list(deleted.get(entity, []))
+        if not keys and not tombstones:
+            continue
+        fields, rows = _current_rows(entity, keys)
+        # Una fila registrada como cambiada que ya no existe también es una lápida
+        tombstones.extend(key for key in keys if key not in rows)
+        changes[entity] = {
+            'fields': fields,
+            'rows': [rows[key] for key in keys if key in rows],
+            'deleted': [list(key) if isinstance(key, tuple) else key for key in tombstones]
+        }
+
+    return {'version': version, 'has_more': has_more, 'changes': changes}
+
+
+def _columnar(entity: str, rows) -> Dict[str, Any]:
+    """
+    Filas de una entidad en columnas: {'count', 'columns': {campo: [valores]},
+    'dictionaries': {campo: [valores distintos]}}. Las columnas con
+    diccionario guardan en cada posición el índice de su valor en él
+    """
+    fields = [column.key for column in _sync_columns(entity)]
+    values = list(zip(*rows)) if rows else [() for _ in fields]
+    encoded = SNAPSHOT_DICTIONARY_COLUMNS.get(entity, ())
+    columns = {}
+    dictionaries = {}
+    for field, column in zip(fields, values):
+        if field in encoded:
+            positions: Dict[Any, int] = {}
+            columns[field] = [positions.setdefault(value, len(positions)) for value in column]
+            dictionaries[field] = list(positions)
+        else:
+            columns[field] = [_serialize_value(value) for value in column]
+    return {'count': len(rows), 'columns': columns, 'dictionaries': dictionaries}
+
+@read_only
+def snapshot_state(user_id: int) -> ResourceState:
+    """
+    Estado de la foto de un cuidador para GET condicional. La versión es la
+    de su centro: los cambios de otros centros no invalidan su ETag
+    """
+    return ResourceState((user_id, get_current_version()))
+
+@read_only
+def get_roster_snapshot(user_id: int) -> Dict[str, Any]:
+    """
+    Foto del trabajo de un cuidador para la carga inicial de una tablet:
+    sus pacientes asignados, los tratamientos de esos pacientes con
+    medicinas activas y esas medicinas, en tres consultas.
+    Cada entidad va en columnas (ver _columnar) con los mismos campos que
+    /api/sync, y 'version' es el since de la primera sincronización
+
+    Returns:
+        {'format': SNAPSHOT_FORMAT, 'version': int, 'user_id': int,
+         'patients': {...}, 'medicines': {...}, 'patient_medicines': {...}}
+    """
+    # La versión se lee antes que los datos: lo que cambie mientras tanto
+    # vuelve a llegar en la primera sincronización
+    version = get_current_version()
+
+    assignments = User.user_patient_assignment
+    assigned = select(assignments.c.patient_id).where(assignments.c.user_id == user_id)
+    treatments = select(patient_medicines.c.medicine_id).where(
+        patient_medicines.c.patient_id.in_(assigned)
+    )
+
+    # Atributos del modelo y no columnas de la tabla: así se aplica el filtro por centro
+    patients = db.session.execute(
+        select(*(getattr(Patient, column.key) for column in _sync_columns('patients')))
+        .where(Patient.id.in_(assigned))
+        .order_by(Patient.id)
+    ).all()
+    medicines = db.session.execute(
+        select(*(getattr(Medicine, column.key) for column in _sync_columns('medicines')))
+        .where(Medicine.id.in_(treatments), Medicine.is_active.is_(True))
+        .order_by(Medicine.id)
+    ).all()
+    doses = db.session.execute(
+        select(*_sync_columns('patient_medicines'))
+        .join(Medicine, Medicine.id == patient_medicines.c.medicine_id)
+        .where(patient_medicines.c.patient_id.in_(assigned), Medicine.is_active.is_(True))
+        .order_by(patient_medicines.c.patient_id, patient_medicines.c.medicine_id)
+    ).all()
+
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'user_id': user_id,
+        'patients': _columnar('patients', patients),
+        'medicines': _columnar('medicines', medicines),
+        'patient_medicines': _columnar('patient_medicines', doses),
+    }
@@ -1,38 +1,107 @@
 from app.models.user import User, db
 from datetime import datetime
 from flask import current_app
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import load_only
+from app.models.patients import Patient
+from app.services.patients_service import tenant_assignments
+from app.utils.conditional import ResourceState
+from app.utils.db_routing import read_only
+from app.utils.loaders import load_entity
 
-def get_all_users():
+def _users_query(fields=None):
+    """Query base de usuarios; si se indican campos solo se cargan esas columnas"""
+    query = User.query
+    if fields:
+        query = query.options(load_only(*(getattr(User, field) for field in fields)))
+    return query
+
+@read_only
+def get_all_users(fields=None):
     """Obtener todos los usuarios"""
-    return User.query.all()
+    return _users_query(fields).all()
 
 def get_user_by_id(user_id):
-    """Obtener usuario por ID"""
-    return User.query.get(user_id)
+    """Obtener usuario por ID (una sola lectura por petición)"""
+    return load_entity(User, user_id)
 
 def get_user_by_username(username):
     """Obtener usuario por username"""
     return User.query.filter_by(username=username.lower()).first()
 
+def get_user_by_login(identifier):
+    """
+    Usuario por username o email, sin distinguir mayúsculas (se guardan en
+    minúsculas). UNION ALL de dos igualdades: cada rama es una búsqueda en
+    su índice único, mientras que el OR entre dos columnas puede acabar
+    recorriendo la tabla
+    """
+    identifier = identifier.strip().lower()
+    statement = union_all(
+        select(User).where(User.username == identifier),
+        select(User).where(User.email == identifier)
+    ).limit(1)
+    return db.session.execute(select(User).from_statement(statement)).scalars().first()
+
 def get_user_by_email(email):
     """Obtener usuario por email"""
     return User.query.filter_by(email=email.lower()).first()
 
+@read_only
 def get_active_users():
     """Obtener usuarios activos"""
     return User.query.filter_by(is_active=True).all()
 
-def get_users_paginated(page=1, per_page=10):
+@read_only
+def get_users_paginated(page=1, per_page=10, fields=None):
     """Obtener usuarios paginados"""
-    return User.query.paginate(
+    return _users_query(fields).paginate(
         page=page,
         per_page=per_page,
         error_out=False
     )
 
+def _working_hours_bucket():
+    # in_working_hours depende de la hora actual: el estado cambia cada minuto
+    return datetime.now().strftime('%Y%m%d%H%M')
+
+@read_only
+def users_state():
+    """
+    Estado de la lista de usuarios para GET condicional. Incluye asignaciones
+    y pacientes porque to_dict(include_sensitive=True) lista los pacientes
+    """
+    assignments = User.user_patient_assignment
+    row = db.session.execute(select(
+        select(func.count(User.id)).scalar_subquery(),
+        select(func.max(User.updated_at)).scalar_subquery(),
+        tenant_assignments(func.count()).scalar_subquery(),
+        tenant_assignments(func.max(assignments.c.assigned_at)).scalar_subquery(),
+        select(func.max(Patient.updated_at)).scalar_subquery(),
+    )).one()
+    # Sin Last-Modified: la respuesta depende también de la hora actual
+    return ResourceState(tuple(row) + (_working_hours_bucket(),))
+
+@read_only
+def user_state(user_id):
+    """Estado de un usuario y sus pacientes para GET condicional; None si no existe"""
+    assignments = User.user_patient_assignment
+    assigned = assignments.c.user_id == user_id
+    row = db.session.execute(select(
+        User.updated_at,
+        tenant_assignments(func.count()).where(assigned).scalar_subquery(),
+        tenant_assignments(func.max(assignments.c.assigned_at)).where(assigned).scalar_subquery(),
+        select(func.max(Patient.updated_at))
+            .join(assignments, assignments.c.patient_id == Patient.id)
+            .where(assigned).scalar_subquery(),
+    ).where(User.id == user_id)).first()
+    if row is None:
+        return None
+    return ResourceState((user_id,) + tuple(row) + (_working_hours_bucket(),))
+
 def user_exists(user_id):
     """Verificar si existe un usuario"""
-    return User.query.get(user_id) is not None
+    return load_entity(User, user_id) is not None
 
 def delete_user(user_id):
     """Eliminar usuario (soft delete - desactivar)"""
@@ -0,0 +1,69 @@
+"""
+Compresión de respuestas grandes según Accept-Encoding
+
+Se usa zstd si el cliente lo acepta y el paquete zstandard está instalado
+(es opcional). Si no, se usa gzip de la stdlib. Solo la usan los endpoints
+con cuerpos grandes (p. ej. /api/sync/snapshot); el resto va sin comprimir.
+"""
+import gzip
+from typing import Optional
+
+from flask import current_app, request
+
+try:
+    import zstandard
+except ImportError:  # zstandard es opcional, se usa gzip
+    zstandard = None
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def available_encodings():
+    """Codificaciones soportadas, por orden de preferencia del servidor"""
+    return (['zstd'] if zstandard is not None else []) + ['gzip']
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """
+    Codificación para la cabecera Accept-Encoding ya parseada
+    (request.accept_encodings), o None si el cliente no acepta ninguna
+    """
+    for encoding in available_encodings():
+        if accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == 'gzip':
+        # mtime=0: el mismo cuerpo da los mismos bytes
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Codificación no soportada: {encoding}")
+
+
+def decompress(data: bytes, encoding: Optional[str]) -> bytes:
+    """Inversa de compress (clientes de prueba y benchmarks)"""
+    if not encoding or encoding == 'identity':
+        return data
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    raise ValueError(f"Codificación no soportada: {encoding}")
+
+
+def compressed_json(obj):
+    """
+    Respuesta JSON de la app comprimida con la mejor codificación que acepte
+    el cliente de la petición actual
+    """
+    response = current_app.json.response(obj)
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is not None:
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
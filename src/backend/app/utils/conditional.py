@@ -0,0 +1,151 @@
+"""
+GET condicional (ETag / Last-Modified)
+
+Las rutas de lectura calculan un "estado" del recurso con una única consulta
+agregada (p. ej. count + max(updated_at)). Si coincide con la ETag o la fecha
+que envía el cliente se responde 304 sin cargar ni serializar nada.
+
+Las colecciones solo llevan ETag: borrar una fila no mueve max(updated_at),
+así que una fecha validaría una lista ya obsoleta; el recuento de la ETag sí
+cambia. Last-Modified queda para las entidades sueltas.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, NamedTuple, Optional, Tuple
+
+from flask import current_app, make_response, request
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+from app.utils.compression import choose_encoding
+
+
+class ResourceState(NamedTuple):
+    """
+    Estado de un recurso para los validadores HTTP
+
+    Args:
+        parts: Valores que cambian cuando cambia la representación
+        last_modified: Fecha de la última modificación (None si no se envía
+            Last-Modified, p. ej. si la respuesta depende de la hora actual)
+    """
+    parts: Tuple[Any, ...]
+    last_modified: Optional[datetime] = None
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Estado de una colección a partir de una fila agregada (count,
+        max(updated_at), ...). Sin Last-Modified: los borrados no lo mueven
+        """
+        return cls(tuple(row))
+
+
+def compute_etag(path: str, args, state: ResourceState) -> str:
+    """
+    ETag de un estado. Incluye la ruta y los parámetros (paginación,
+    ?fields=...) porque cambian la representación
+
+    Args:
+        path: Ruta de la petición
+        args: Pares (parámetro, valor) de la query string
+        state: Estado del recurso
+    """
+    raw = repr((path, sorted(args), state.parts))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def make_etag(state: ResourceState) -> str:
+    """ETag del estado para la petición Flask actual"""
+    return compute_etag(request.path, request.args.items(multi=True), state)
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    ETag de la representación con content-coding: cada codificación es un
+    cuerpo distinto y no debe validar una copia en caché con otra
+    """
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Las fechas de la BD son UTC sin zona; If-Modified-Since llega con zona
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def check_not_modified(if_none_match: Optional[str], if_modified_since: Optional[str],
+                       etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Comprueba las cabeceras de validación. If-None-Match tiene prioridad
+    sobre If-Modified-Since (RFC 9110)
+    """
+    if if_none_match:
+        return parse_etags(if_none_match).contains_weak(etag)
+    if last_modified is not None and if_modified_since:
+        since = parse_date(if_modified_since)
+        return since is not None and _as_utc(last_modified) <= since
+    return False
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    """Comprueba los validadores de la petición Flask actual"""
+    return check_not_modified(
+        request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since'),
+        etag, last_modified
+    )
+
+
+def conditional(state_func, compressed=False):
+    """
+    Decorador de GET condicional
+
+    state_func recibe los mismos argumentos de la vista y devuelve un
+    ResourceState, o None si no aplica (p. ej. el recurso no existe; la vista
+    se ejecuta y responde 404). Va debajo de @jwt_required() para que la
+    autenticación se compruebe antes de consultar el estado.
+    compressed=True en las vistas que responden con compressed_json: la ETag
+    lleva la codificación que se negocia con Accept-Encoding.
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            state = state_func(**kwargs)
+            if state is None:
+                return view(*args, **kwargs)
+
+            etag = make_etag(state)
+            if compressed:
+                etag = encoded_etag(etag, choose_encoding(request.accept_encodings))
+            if is_not_modified(etag, state.last_modified):
+                response = current_app.response_class(status=304)
+                _set_validators(response, etag, state.last_modified)
+                if compressed:
+                    response.vary.add('Accept-Encoding')
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag, state.last_modified)
+            return response
+        return decorated
+    return decorator
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    """
+    Cabeceras ETag / Last-Modified. La ETag es débil: la representación es
+    equivalente, no idéntica byte a byte (p. ej. con o sin orjson)
+    """
+    headers = {'ETag': quote_etag(etag, weak=True)}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(_as_utc(last_modified))
+    return headers
+
+
+def _set_validators(response, etag, last_modified):
+    response.headers.update(validator_headers(etag, last_modified))
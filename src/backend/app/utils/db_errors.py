@@ -0,0 +1,68 @@
+"""
+Traducción de errores de integridad de la base de datos
+
+Los servicios insertan o actualizan confiando en los índices únicos (sin
+un SELECT previo que además compite con otras transacciones) y, si la
+base de datos rechaza la fila, averiguan aquí qué columnas chocaron para
+devolver el error adecuado.
+"""
+import re
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import Column, Table, UniqueConstraint
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import visitors
+
+# SQLite: 'UNIQUE constraint failed: users.username' o, con un índice sobre
+# una expresión, "UNIQUE constraint failed: index 'ix_users_username_lower'"
+_SQLITE_COLUMNS = re.compile(r'UNIQUE constraint failed: ((?:\w+\.\w+(?:, )?)+)')
+_SQLITE_INDEX = re.compile(r"UNIQUE constraint failed: index '(\w+)'")
+# Postgres sin diag (p. ej. otro driver): 'Key (username)=(ana) already exists.'
+_POSTGRES_KEY = re.compile(r'Key \((.+?)\)=\(')
+
+
+def _columns(expressions) -> List[str]:
+    return [element.key for expression in expressions
+            for element in visitors.iterate(expression) if isinstance(element, Column)]
+
+
+def unique_constraints(table: Table) -> Dict[str, List[str]]:
+    """Nombre de cada índice o restricción única de la tabla -> sus columnas"""
+    constraints = {index.name: _columns(index.expressions) for index in table.indexes if index.unique}
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint) and constraint.name:
+            constraints[constraint.name] = [column.key for column in constraint.columns]
+    return constraints
+
+
+def unique_violation(error: IntegrityError, table: Table) -> Optional[Set[str]]:
+    """
+    Columnas del índice único de `table` que violó `error`, o None si el
+    error es de otra restricción (NOT NULL, clave ajena...) o de otra tabla
+    """
+    orig = getattr(error, 'orig', error)
+    message = str(orig)
+
+    # psycopg2 da el nombre de la restricción en diag; asyncpg, como atributo
+    diag = getattr(orig, 'diag', None)
+    name = getattr(diag, 'constraint_name', None) or getattr(orig, 'constraint_name', None)
+    if name is None:
+        match = _SQLITE_INDEX.search(message)
+        name = match.group(1) if match else None
+    if name is not None:
+        columns = unique_constraints(table).get(name)
+        return set(columns) if columns else None
+
+    match = _SQLITE_COLUMNS.search(message)
+    if match:
+        pairs = [item.split('.', 1) for item in match.group(1).split(', ')]
+        if all(table_name == table.name for table_name, _ in pairs):
+            return {column for _, column in pairs}
+        return None
+
+    match = _POSTGRES_KEY.search(message)
+    if match and 'unique' in message.lower():
+        names = {column.key for column in table.columns}
+        found = {name.strip() for name in match.group(1).split(',')}
+        return found if found <= names else None
+    return None
@@ -0,0 +1,239 @@
+"""
+Lecturas en réplicas
+
+Con DATABASE_READ_URLS (URLs separadas por comas) cada réplica se registra
+como un bind de Flask-SQLAlchemy ('replica_0', 'replica_1', ...) y las
+funciones de servicio marcadas con @read_only leen de una de ellas, por
+turnos. Todo lo demás va al primario, y también:
+
+- Una transacción que ya escribió (flush o INSERT/UPDATE/DELETE) sigue en
+  el primario hasta que termina.
+- Leer lo propio escrito: tras un commit con escrituras, las lecturas del
+  mismo usuario (o IP) van al primario durante DATABASE_READ_STICKY_SECONDS,
+  el margen para el retraso de la replicación. Se recuerda en la memoria
+  del proceso.
+- Una réplica que da un error de conexión queda fuera durante
+  DATABASE_READ_EJECT_SECONDS; la función que falló se repite en el primario.
+
+Sin DATABASE_READ_URLS @read_only no hace nada.
+"""
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+
+from flask import current_app, g, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.utils.ratelimit import request_identity
+from app.utils.session_options import expire_on_commit, transaction_engine
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+# Bind de la réplica elegida para la función @read_only en curso. Es una
+# ContextVar: los hilos que arrancan con contextvars.copy_context() la heredan
+_read_replica: ContextVar[Optional[str]] = ContextVar('read_replica', default=None)
+
+
+def current_replica() -> Optional[str]:
+    """Bind de la réplica de la que se está leyendo, o None si es el primario"""
+    return _read_replica.get()
+
+
+class ReplicaRouter:
+    """Réplicas de una app, las expulsadas y los usuarios fijados al primario"""
+
+    def __init__(self, keys: List[str], sticky_seconds: float, eject_seconds: float):
+        self.keys = keys
+        self.sticky_seconds = sticky_seconds
+        self.eject_seconds = eject_seconds
+        self._turns = itertools.cycle(keys)
+        self._ejected: Dict[str, float] = {}
+        self._sticky: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def choose(self, identity: Optional[str] = None, preferred: Optional[str] = None) -> Optional[str]:
+        """
+        Réplica sana para leer (`preferred` si lo está; si no, la siguiente
+        por turnos), o None si toca leer del primario
+        """
+        now = time.monotonic()
+        with self._lock:
+            if identity is not None and self._sticky.get(identity, 0) > now:
+                return None
+            if preferred is not None and self._ejected.get(preferred, 0) <= now:
+                return preferred
+            for _ in self.keys:
+                key = next(self._turns)
+                if self._ejected.get(key, 0) <= now:
+                    self._ejected.pop(key, None)
+                    return key
+        return None
+
+    def eject(self, key: str):
+        with self._lock:
+            self._ejected[key] = time.monotonic() + self.eject_seconds
+
+    def is_ejected(self, key: str) -> bool:
+        return self._ejected.get(key, 0) > time.monotonic()
+
+    def mark_write(self, identity: str):
+        """Fija al primario las lecturas de `identity` durante sticky_seconds"""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._sticky) > 10_000:
+                self._sticky = {k: until for k, until in self._sticky.items() if until > now}
+            self._sticky[identity] = now + self.sticky_seconds
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'replicas': list(self.keys),
+            'ejected': [key for key, until in self._ejected.items() if until > now],
+            'sticky': sum(1 for until in self._sticky.values() if until > now),
+        }
+
+
+class RoutingSession(Session):
+    """
+    Sesión que envía al bind de la réplica elegida las lecturas hechas
+    dentro de una función @read_only, mientras la transacción no escriba.
+    También aplica las opciones de app/utils/session_options.py
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self.expire_on_commit = expire_on_commit()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        key = _read_replica.get()
+        if (
+            key is not None
+            and bind is None
+            and not self._flushing
+            and not self.info.get('wrote')
+            and not (self._new or self._deleted)
+            and not getattr(clause, 'is_dml', False)
+        ):
+            engine = self._db.engines.get(key)
+            if engine is not None:
+                return transaction_engine(engine)
+        return transaction_engine(super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs))
+
+
+def _get_router() -> Optional[ReplicaRouter]:
+    return current_app.extensions.get('replica_router') if has_app_context() else None
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_writer(session):
+    if not session.info.get('wrote') or not has_request_context():
+        return
+    router = _get_router()
+    if router is not None:
+        router.mark_write(request_identity())
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _clear_write_mark(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('wrote', None)
+
+
+def read_only(f):
+    """
+    La función solo lee: sus consultas pueden ir a una réplica. Si la
+    réplica falla se expulsa y la función se repite en el primario
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        # Las llamadas anidadas usan la réplica de la más externa
+        if _read_replica.get() is not None:
+            return f(*args, **kwargs)
+        router = _get_router()
+        if router is None:
+            return f(*args, **kwargs)
+        if has_request_context():
+            # Todas las lecturas de una petición van a la misma réplica: la
+            # ETag y el cuerpo salen de la misma copia de los datos
+            key = g.read_replica = router.choose(request_identity(), g.get('read_replica'))
+        else:
+            key = router.choose()
+        if key is None:
+            return f(*args, **kwargs)
+
+        token = _read_replica.set(key)
+        try:
+            return f(*args, **kwargs)
+        except DBAPIError:
+            if not router.is_ejected(key):
+                raise
+            from app.extensions import db
+            # Sin escrituras en la transacción: deshacerla no pierde nada
+            db.session.rollback()
+        finally:
+            _read_replica.reset(token)
+        return f(*args, **kwargs)
+    return decorated
+
+
+def replica_binds(urls: List[str]) -> Dict[str, str]:
+    """Binds de Flask-SQLAlchemy para las URLs de las réplicas"""
+    return {f'{REPLICA_BIND_PREFIX}{i}': url for i, url in enumerate(urls)}
+
+
+def configure_read_replicas(app):
+    """Añade las réplicas a SQLALCHEMY_BINDS. Debe ir antes de db.init_app"""
+    urls = app.config['DATABASE_READ_URLS']
+    if not urls:
+        return
+    binds = replica_binds(urls)
+    app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}), **binds}
+    app.extensions['replica_router'] = ReplicaRouter(
+        list(binds),
+        sticky_seconds=app.config['DATABASE_READ_STICKY_SECONDS'],
+        eject_seconds=app.config['DATABASE_READ_EJECT_SECONDS']
+    )
+
+
+def setup_replica_health(app, db):
+    """
+    Expulsa una réplica cuando su engine da un error de conexión. Debe ir
+    después de db.init_app, que crea los engines
+    """
+    router = app.extensions.get('replica_router')
+    if router is None:
+        return
+    with app.app_context():
+        engines = db.engines
+
+    for key in router.keys:
+        def eject_on_error(context, key=key):
+            # OperationalError: conexión rechazada o perdida, base de datos no
+            # disponible... Un error de la consulta (ProgrammingError,
+            # IntegrityError) no dice nada de la salud de la réplica
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+                router.eject(key)
+                logger.warning("Réplica %s expulsada durante %ss: %s",
+                               key, router.eject_seconds, context.original_exception)
+
+        event.listen(engines[key], 'handle_error', eject_on_error)
+
@@ -0,0 +1,367 @@
+"""
+Caché de entidades por clave primaria (usuarios y pacientes)
+
+load_entity() (app/utils/loaders.py) consulta, antes que la base de datos:
+
+1. Una LRU en la memoria del proceso (ENTITY_CACHE_SIZE entradas, con
+   ENTITY_CACHE_TTL segundos de vida)
+2. Opcionalmente, un segundo nivel compartido entre procesos: una clase
+   EntityCacheBackend configurada con ENTITY_CACHE_BACKEND=paquete.modulo:Clase
+   (p. ej. sobre Redis), con ENTITY_CACHE_SHARED_TTL segundos de vida
+
+Se guardan los valores de las columnas, no la instancia: en un acierto se
+construye la instancia y se añade a la sesión como ya cargada, sin SELECT.
+
+Invalidación: los eventos de la sesión apuntan las entidades modificadas o
+borradas (flush) y los UPDATE/DELETE masivos sobre sus tablas, y al hacer
+commit se borran de los dos niveles (un UPDATE masivo sin claves conocidas
+vacía la tabla entera). Con varios procesos la LRU de los demás no se entera:
+por eso su vida es corta. No se rellena la caché:
+- dentro de una transacción que ya escribió (lee lo suyo de la base de datos)
+- con lecturas de una réplica, que pueden ir por detrás del primario
+- si hubo una invalidación mientras se leía de la base de datos
+"""
+import importlib
+import itertools
+from abc import ABC, abstractmethod
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import attributes, make_transient_to_detached
+
+from app.utils.db_routing import RoutingSession, current_replica
+from app.utils.tenancy import current_tenant_id
+
+logger = logging.getLogger(__name__)
+
+# Marca de "toda la tabla" en las invalidaciones pendientes
+_ALL = object()
+
+
+class EntityCacheBackend(ABC):
+    """
+    Interfaz del segundo nivel compartido. Los valores son diccionarios
+    {columna: valor} con tipos de Python (fechas, horas...): la
+    serialización (p. ej. pickle) es cosa de la implementación
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        ...
+
+    @abstractmethod
+    def delete(self, keys: Iterable[str]):
+        ...
+
+    @abstractmethod
+    def clear(self, prefix: str):
+        """Borra todas las claves que empiezan por `prefix`"""
+
+
+class InMemoryBackend(EntityCacheBackend):
+    """
+    Segundo nivel en la memoria del proceso: sustituto local de un almacén
+    compartido, para desarrollo y benchmarks
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, tuple] = {}
+
+    def get(self, key):
+        entry = self._values.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return dict(entry[0])
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._values[key] = (dict(value), time.monotonic() + ttl)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+    def clear(self, prefix):
+        with self._lock:
+            for key in [key for key in self._values if key.startswith(prefix)]:
+                del self._values[key]
+
+
+def load_backend(path: Optional[str]) -> Optional[EntityCacheBackend]:
+    """
+    Instancia el segundo nivel configurado ('paquete.modulo:Clase'), o None
+
+    Raises:
+        TypeError: Si la clase no es un EntityCacheBackend completo
+    """
+    if not path:
+        return None
+    module_name, _, class_name = path.partition(':')
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(backend_class, type) and issubclass(backend_class, EntityCacheBackend)):
+        raise TypeError(f"ENTITY_CACHE_BACKEND: {path} no es un EntityCacheBackend")
+    return backend_class()
+
+
+class TierStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else None}
+
+
+class EntityCache:
+    """Los dos niveles de una app y sus métricas"""
+
+    def __init__(self, models, size: int, ttl: float,
+                 backend: Optional[EntityCacheBackend] = None, shared_ttl: float = 60):
+        self.models = {model.__tablename__: model for model in models}
+        self.size = size
+        self.ttl = ttl
+        self.backend = backend
+        self.shared_ttl = shared_ttl
+        self._local: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # Sube con cada invalidación: una lectura de la BD que empezó antes
+        # puede traer datos ya cambiados y no se guarda
+        self._generation = itertools.count()
+        self.generation = next(self._generation)
+        self.local_stats = TierStats()
+        self.shared_stats = TierStats()
+        self.shared_errors = 0
+        self.invalidations = 0
+
+    def handles(self, model) -> bool:
+        return self.models.get(getattr(model, '__tablename__', None)) is model
+
+    @staticmethod
+    def key(table: str, entity_id) -> str:
+        return f'entity:{table}:{entity_id}'
+
+    def get(self, table: str, entity_id) -> Optional[Dict[str, Any]]:
+        key = self.key(table, entity_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[1] > now:
+                self._local.move_to_end(key)
+                self.local_stats.hits += 1
+                return entry[0]
+            self.local_stats.misses += 1
+        if self.backend is None:
+            return None
+
+        generation = self.generation
+        try:
+            values = self.backend.get(key)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning("Caché de entidades compartida no disponible: %s", e)
+            return None
+        if values is None:
+            self.shared_stats.misses += 1
+            return None
+        self.shared_stats.hits += 1
+        self._put_local(key, values, generation)
+        return values
+
+    def put(self, table: str, entity_id, values: Dict[str, Any], generation: int):
+        key = self.key(table, entity_id)
+        if not self._put_local(key, values, generation) or self.backend is None:
+            return
+        try:
+            self.backend.set(key, values, self.shared_ttl)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning("Caché de entidades compartida no disponible: %s", e)
+
+    def _put_local(self, key, values, generation) -> bool:
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._local[key] = (values, time.monotonic() + self.ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.size:
+                self._local.popitem(last=False)
+        return True
+
+    def invalidate(self, entries):
+        """Borra de los dos niveles las entradas (tabla, id o _ALL)"""
+        if not entries:
+            return
+        keys, prefixes = [], []
+        for table, entity_id in entries:
+            if entity_id is _ALL:
+                prefixes.append(self.key(table, ''))
+            else:
+                keys.append(self.key(table, entity_id))
+        with self._lock:
+            self.generation = next(self._generation)
+            self.invalidations += len(entries)
+            for key in keys:
+                self._local.pop(key, None)
+            for prefix in prefixes:
+                for key in [key for key in self._local if key.startswith(prefix)]:
+                    del self._local[key]
+        if self.backend is None:
+            return
+        try:
+            if keys:
+                self.backend.delete(keys)
+            for prefix in prefixes:
+                self.backend.clear(prefix)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning("No se pudo invalidar la caché de entidades compartida: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            'local': {**self.local_stats.as_dict(), 'size': len(self._local)},
+            'shared': self.shared_stats.as_dict() if self.backend is not None else None,
+            'shared_errors': self.shared_errors,
+            'invalidations': self.invalidations,
+        }
+
+
+def get_cache() -> Optional[EntityCache]:
+    return current_app.extensions.get('entity_cache') if has_app_context() else None
+
+
+def _count(field: str):
+    """Aciertos y fallos por petición, para el log de peticiones"""
+    if has_request_context():
+        fields = g.setdefault('log_fields', {})
+        fields[field] = fields.get(field, 0) + 1
+
+
+def _column_values(entity) -> Optional[Dict[str, Any]]:
+    state = inspect(entity)
+    columns = state.mapper.column_attrs.keys()
+    if any(key not in state.dict for key in columns):
+        return None
+    return {key: state.dict[key] for key in columns}
+
+
+def _attach(session, model, values):
+    """Instancia persistente con los valores de la caché, sin SELECT"""
+    entity = inspect(model).class_manager.new_instance()
+    for key, value in values.items():
+        attributes.set_committed_value(entity, key, value)
+    make_transient_to_detached(entity)
+    session.add(entity)
+    return entity
+
+
+def get_entity(model, entity_id):
+    """
+    db.session.get() con la caché de entidades delante, si la app la tiene
+    y el modelo está en ella
+    """
+    from app.extensions import db
+
+    cache = get_cache()
+    session = db.session()
+    if cache is None or not cache.handles(model) or session.info.get('wrote'):
+        return session.get(model, entity_id)
+
+    mapper = inspect(model)
+    try:
+        entity_id = mapper.primary_key[0].type.python_type(entity_id)
+    except (TypeError, ValueError):
+        return session.get(model, entity_id)
+
+    identity = session.identity_map.get(mapper.identity_key_from_primary_key((entity_id,)))
+    if identity is not None:
+        return identity
+
+    table = model.__tablename__
+    values = cache.get(table, entity_id)
+    tenant_id = current_tenant_id()
+    # Una entrada de otro centro es invisible: la BD (filtrada) dirá que no existe
+    if values is not None and (tenant_id is None or values.get('tenant_id') == tenant_id):
+        _count('entity_cache_hits')
+        return _attach(session, model, values)
+
+    _count('entity_cache_misses')
+    generation = cache.generation
+    entity = session.get(model, entity_id)
+    if entity is not None and current_replica() is None and not session.info.get('wrote'):
+        values = _column_values(entity)
+        if values is not None:
+            cache.put(table, entity_id, values, generation)
+    return entity
+
+
+def _pending(session) -> set:
+    return session.info.setdefault('entity_cache_pending', set())
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _track_flush(session, flush_context):
+    cache = get_cache()
+    if cache is None:
+        return
+    # En after_flush dirty y deleted siguen con el estado de antes del flush
+    for entity in itertools.chain(session.dirty, session.deleted):
+        if cache.handles(type(entity)):
+            identity = inspect(entity).identity
+            if identity is not None:
+                _pending(session).add((entity.__tablename__, identity[0]))
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _track_bulk(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    cache = get_cache()
+    table = getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None)
+    if cache is None or table not in cache.models:
+        return
+    pending = _pending(orm_execute_state.session)
+    params = orm_execute_state.parameters
+    # UPDATE por clave primaria en executemany ([{'id': 1, ...}, ...])
+    if isinstance(params, list) and params and all('id' in row for row in params):
+        pending.update((table, row['id']) for row in params)
+    else:
+        pending.add((table, _ALL))
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _invalidate_on_commit(session):
+    pending = session.info.pop('entity_cache_pending', None)
+    cache = get_cache()
+    if pending and cache is not None:
+        cache.invalidate(pending)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_pending(session):
+    session.info.pop('entity_cache_pending', None)
+
+
+def setup_entity_cache(app, models):
+    """Crea la caché de entidades de la app para los modelos indicados"""
+    if not app.config['ENTITY_CACHE_ENABLED']:
+        return
+    app.extensions['entity_cache'] = EntityCache(
+        models,
+        size=app.config['ENTITY_CACHE_SIZE'],
+        ttl=app.config['ENTITY_CACHE_TTL'],
+        backend=load_backend(app.config['ENTITY_CACHE_BACKEND']),
+        shared_ttl=app.config['ENTITY_CACHE_SHARED_TTL'],
+    )
@@ -0,0 +1,207 @@
+"""
+Descarte de carga adaptativo
+
+Antes de verificar el token o tocar la base de datos, cada petición mira
+tres señales de saturación y, si alguna pasa su umbral, se responde 503
+con Retry-After:
+
+- Espera en la cola del proxy: ahora - X-Request-Start (cabecera que
+  añaden nginx y los balanceadores, 't=<epoch>' en s, ms o µs). Una petición
+  que ya esperó más de LOAD_SHED_QUEUE_WAIT_MS se descarta siempre.
+- Peticiones en curso en el proceso por encima de LOAD_SHED_MAX_INFLIGHT.
+- Espera para obtener una conexión del pool (media móvil que decae con el
+  tiempo) por encima de LOAD_SHED_POOL_WAIT_MS.
+
+En las dos últimas se descarta una fracción de las peticiones que crece con
+el exceso sobre el umbral (todas al doble), así las que entran siguen
+midiendo el pool y la media baja en cuanto se recupera. Un umbral a 0
+desactiva esa señal.
+"""
+import math
+import random
+import threading
+import time
+from typing import Optional
+
+from flask import current_app, g, has_app_context, jsonify, request
+from sqlalchemy import event
+
+from app.extensions import db
+
+REQUEST_START_HEADER = 'X-Request-Start'
+
+OVERLOADED_MESSAGE = 'Servidor saturado, inténtalo más tarde'
+
+# Marca de una petición contada en curso: en el environ de Flask, o en el
+# scope ASGI si la cuenta el middleware de app/asgi.py
+COUNTED_KEY = 'load_shed.counted'
+
+# Vida media (s) de la media de espera del pool: sin muestras nuevas su
+# peso se reduce a la mitad cada POOL_WAIT_HALF_LIFE segundos
+POOL_WAIT_HALF_LIFE = 5.0
+
+_session_events_registered = False
+
+
+class DecayingAverage:
+    """Media móvil exponencial cuyo valor también decae con el tiempo"""
+
+    def __init__(self, half_life: float, alpha: float = 0.2):
+        self.half_life = half_life
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._value = 0.0
+        self._updated = time.monotonic()
+
+    def _decayed(self, now):
+        return self._value * 0.5 ** ((now - self._updated) / self.half_life)
+
+    def add(self, sample: float):
+        with self._lock:
+            now = time.monotonic()
+            self._value = self._decayed(now) * (1 - self.alpha) + sample * self.alpha
+            self._updated = now
+
+    @property
+    def value(self) -> float:
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+
+class LoadShedder:
+    """Señales de saturación de un proceso y decisión de descarte"""
+
+    def __init__(self, queue_wait_ms: float, max_inflight: int, pool_wait_ms: float, retry_after: int):
+        self.queue_wait_ms = queue_wait_ms
+        self.max_inflight = max_inflight
+        self.pool_wait_ms = pool_wait_ms
+        self.retry_after = retry_after
+        self.pool_wait = DecayingAverage(POOL_WAIT_HALF_LIFE)
+        self.inflight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> int:
+        with self._lock:
+            self.inflight += 1
+            return self.inflight
+
+    def leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def reason(self, inflight: int, queue_wait_ms: Optional[float]) -> Optional[str]:
+        """Motivo para descartar la petición, o None si se atiende"""
+        if self.queue_wait_ms and queue_wait_ms is not None and queue_wait_ms > self.queue_wait_ms:
+            reason = 'queue_wait'
+        elif random.random() < shed_probability(inflight, self.max_inflight):
+            reason = 'inflight'
+        elif random.random() < shed_probability(self.pool_wait.value * 1000, self.pool_wait_ms):
+            reason = 'pool_wait'
+        else:
+            return None
+        with self._lock:
+            self.shed += 1
+        return reason
+
+    def stats(self) -> dict:
+        return {
+            'inflight': self.inflight,
+            'pool_wait_ms': round(self.pool_wait.value * 1000, 2),
+            'shed': self.shed
+        }
+
+
+def shed_probability(value: float, threshold: float) -> float:
+    """0 hasta el umbral, creciendo linealmente hasta 1 al doble del umbral"""
+    if not threshold or value <= threshold:
+        return 0.0
+    return min(1.0, (value - threshold) / threshold)
+
+
+def parse_request_start(value: Optional[str], now: float) -> Optional[float]:
+    """Milisegundos desde X-Request-Start ('t=<epoch>' en s, ms o µs)"""
+    if not value:
+        return None
+    try:
+        started = float(value.strip().removeprefix('t='))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1_000_000
+    elif started > 1e11:
+        started /= 1000
+    return max(0.0, (now - started) * 1000)
+
+
+def _get_shedder() -> Optional[LoadShedder]:
+    return current_app.extensions.get('load_shedder') if has_app_context() else None
+
+
+def _register_session_events():
+    """
+    Mide la espera del pool: desde la primera sentencia de una transacción
+    hasta que la sesión obtiene su conexión (after_begin)
+    """
+    global _session_events_registered
+    if _session_events_registered:
+        return
+    _session_events_registered = True
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def mark_acquire_start(orm_execute_state):
+        orm_execute_state.session.info.setdefault('acquire_started', time.perf_counter())
+
+    @event.listens_for(db.session, 'after_begin')
+    def record_pool_wait(session, transaction, connection):
+        started = session.info.pop('acquire_started', None)
+        shedder = _get_shedder()
+        if started is not None and shedder is not None:
+            shedder.pool_wait.add(time.perf_counter() - started)
+
+    @event.listens_for(db.session, 'after_transaction_end')
+    def clear_acquire_start(session, transaction):
+        session.info.pop('acquire_started', None)
+
+
+def setup_load_shedding(app):
+    """
+    Registra el descarte de carga. Debe ir antes de la verificación del
+    JWT: una petición descartada no debe costar nada más. En modo ASGI lo
+    aplica el middleware de app/asgi.py con el mismo LoadShedder, antes de
+    llegar a Flask
+    """
+    if not app.config['LOAD_SHED_ENABLED']:
+        return
+    shedder = LoadShedder(
+        queue_wait_ms=app.config['LOAD_SHED_QUEUE_WAIT_MS'],
+        max_inflight=app.config['LOAD_SHED_MAX_INFLIGHT'],
+        pool_wait_ms=app.config['LOAD_SHED_POOL_WAIT_MS'],
+        retry_after=app.config['LOAD_SHED_RETRY_AFTER']
+    )
+    app.extensions['load_shedder'] = shedder
+    _register_session_events()
+
+    @app.before_request
+    def check_load():
+        if request.environ.get('asgi.scope', {}).get(COUNTED_KEY):
+            return None
+        request.environ[COUNTED_KEY] = True
+        inflight = shedder.enter()
+        if request.method == 'OPTIONS':
+            return None
+        queue_wait = parse_request_start(request.headers.get(REQUEST_START_HEADER), time.time())
+        reason = shedder.reason(inflight, queue_wait)
+        if reason is None:
+            return None
+        # Sin log propio: el 503 ya queda en el log de peticiones con su motivo
+        g.setdefault('log_fields', {})['shed_reason'] = reason
+        response = jsonify({'error': OVERLOADED_MESSAGE})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(math.ceil(shedder.retry_after))
+        return response
+
+    @app.teardown_request
+    def release_load(exc):
+        if request.environ.pop(COUNTED_KEY, False):
+            shedder.leave()
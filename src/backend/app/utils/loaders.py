@@ -0,0 +1,44 @@
+"""
+Cargador de entidades con ámbito de petición
+"""
+from flask import g, has_app_context
+
+from app.extensions import db
+from app.utils.entity_cache import get_entity
+
+_MISSING = object()
+
+
+def load_entity(model_class, entity_id):
+    """
+    Obtiene una entidad por clave primaria como mucho una vez por petición.
+
+    El identity map de la sesión guarda referencias débiles, así que una
+    comprobación como patient_exists() no evita que la siguiente lectura
+    vuelva a la base de datos. Aquí se guarda una referencia fuerte en
+    flask.g y también se recuerdan los IDs que no existen. Entre peticiones
+    la caché de entidades (app/utils/entity_cache.py) evita el SELECT
+    """
+    if not has_app_context():
+        return db.session.get(model_class, entity_id)
+
+    cache = g.setdefault('_entity_loader_cache', {})
+    key = (model_class, entity_id)
+    entity = cache.get(key, _MISSING)
+    if entity is _MISSING:
+        entity = get_entity(model_class, entity_id)
+        cache[key] = entity
+    return entity
+
+
+def resolve_entity(model_class, entity_or_id):
+    """Acepta una instancia ya cargada o su ID y devuelve la instancia"""
+    if isinstance(entity_or_id, model_class):
+        return entity_or_id
+    return load_entity(model_class, entity_or_id)
+
+
+def forget_entity(model_class, entity_id):
+    """Olvida una entidad de la petición actual (por ejemplo tras borrarla)"""
+    if has_app_context():
+        g.get('_entity_loader_cache', {}).pop((model_class, entity_id), None)
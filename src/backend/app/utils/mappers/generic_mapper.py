@@ -1,15 +1,29 @@
-from typing import Any, Dict, List, Optional, Type, Union
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple, Type, Union
 from sqlalchemy.ext.declarative import DeclarativeMeta
 from sqlalchemy.inspection import inspect
 from datetime import datetime
 
+
+class ModelMetadata(NamedTuple):
+    """Metadatos precalculados de un modelo SQLAlchemy"""
+    columns: Tuple[str, ...]
+    column_set: FrozenSet[str]
+    setters: Dict[str, Any]
+
+
+_EMPTY_METADATA = ModelMetadata((), frozenset(), {})
+
+
 class GenericMapper:
     """
     Mapper genérico universal para modelos SQLAlchemy
     Permite mapear entre modelos, diccionarios y realizar operaciones CRUD
     """
         
-    DEFAULT_EXCLUDE_FIELDS = ['id', 'created_at', 'updated_at']
+    # tenant_id lo fija el centro en curso (app/utils/tenancy.py), nunca el cliente
+    DEFAULT_EXCLUDE_FIELDS = frozenset(['id', 'created_at', 'updated_at', 'tenant_id'])
+    
+    _metadata_cache: Dict[type, ModelMetadata] = {}
     
     @classmethod
     def map_to_model(cls, source: Union[Dict, Any], target: Any, 
@@ -27,15 +41,14 @@ class GenericMapper:
         Returns:
             El modelo target actualizado
         """
-        if exclude_fields is None:
-            exclude_fields = cls.DEFAULT_EXCLUDE_FIELDS.copy()
+        exclude_fields = cls._get_exclude_set(exclude_fields)
                 
-        valid_columns = cls._get_model_columns(target)
+        metadata = cls._get_metadata(target)
                 
         if isinstance(source, dict):
-            return cls._map_dict_to_model(source, target, valid_columns, exclude_fields, include_none)
+            return cls._map_dict_to_model(source, target, metadata, exclude_fields, include_none)
                 
-        return cls._map_model_to_model(source, target, valid_columns, exclude_fields, include_none)
+        return cls._map_model_to_model(source, target, metadata, exclude_fields, include_none)
     
     @classmethod
     def map_to_dict(cls, model: Any, exclude_fields: Optional[List[str]] = None,
@@ -51,8 +64,7 @@ class GenericMapper:
         Returns:
             Diccionario con los datos del modelo
         """
-        if exclude_fields is None:
-            exclude_fields = []
+        exclude_fields = frozenset(exclude_fields or ())
         
         result = {}
                 
@@ -89,9 +101,6 @@ class GenericMapper:
         Returns:
             Nueva instancia del modelo
         """
-        if exclude_fields is None:
-            exclude_fields = cls.DEFAULT_EXCLUDE_FIELDS.copy()
-                
         new_instance = model_class()
                 
         return cls.map_to_model(data, new_instance, exclude_fields)
@@ -112,11 +121,65 @@ class GenericMapper:
         Returns:
             Modelo actualizado
         """
-        if exclude_fields is None:
-            exclude_fields = cls.DEFAULT_EXCLUDE_FIELDS.copy()
-        
         return cls.map_to_model(data, model, exclude_fields, include_none=not partial)
     
+    @classmethod
+    def create_many(cls, model_class: Type, data: Iterable[Dict],
+                    exclude_fields: Optional[Iterable[str]] = None) -> List[Any]:
+        """
+        Crea varias instancias del modelo en una sola pasada
+        
+        Args:
+            model_class: Clase del modelo a crear
+            data: Lista de diccionarios con los datos de cada instancia
+            exclude_fields: Campos a excluir
+        
+        Returns:
+            Lista de nuevas instancias (sin añadir a la sesión)
+        """
+        exclude_fields = cls._get_exclude_set(exclude_fields)
+        metadata = cls._get_metadata(model_class)
+        
+        return [
+            cls._map_dict_to_model(item, model_class(), metadata, exclude_fields, False)
+            for item in data
+        ]
+    
+    @classmethod
+    def update_many(cls, models: Iterable[Any], data: Union[Dict, Iterable[Dict]],
+                    exclude_fields: Optional[Iterable[str]] = None,
+                    partial: bool = True) -> List[Any]:
+        """
+        Actualiza varios modelos del mismo tipo en una sola pasada
+        
+        Args:
+            models: Modelos a actualizar
+            data: Un diccionario que se aplica a todos los modelos, o una
+                lista de diccionarios emparejada por posición con los modelos
+            exclude_fields: Campos a excluir
+            partial: Si es actualización parcial (no incluye None)
+        
+        Returns:
+            Lista de modelos actualizados
+        """
+        models = list(models)
+        if not models:
+            return models
+        
+        exclude_fields = cls._get_exclude_set(exclude_fields)
+        metadata = cls._get_metadata(models[0])
+        
+        if isinstance(data, dict):
+            data = [data] * len(models)
+        else:
+            data = list(data)
+            if len(data) != len(models):
+                raise ValueError("El número de modelos y de diccionarios no coincide")
+        
+        for model, item in zip(models, data):
+            cls._map_dict_to_model(item, model, metadata, exclude_fields, not partial)
+        return models
+    
     @classmethod
     def clone_model(cls, source: Any, exclude_fields: Optional[List[str]] = None) -> Any:
         """
@@ -129,10 +192,7 @@ class GenericMapper:
         Returns:
             Nueva instancia del modelo clonado
         """
-        if exclude_fields is None:
-            exclude_fields = cls.DEFAULT_EXCLUDE_FIELDS.copy()
-        else:
-            exclude_fields = cls.DEFAULT_EXCLUDE_FIELDS + exclude_fields
+        exclude_fields = cls.DEFAULT_EXCLUDE_FIELDS.union(exclude_fields or ())
         
         model_class = type(source)
         return cls.create_model(model_class, source, exclude_fields)
@@ -153,8 +213,7 @@ class GenericMapper:
         Returns:
             Modelo primary actualizado con datos merged
         """
-        if exclude_fields is None:
-            exclude_fields = cls.DEFAULT_EXCLUDE_FIELDS.copy()
+        exclude_fields = cls._get_exclude_set(exclude_fields)
         
         valid_columns = cls._get_model_columns(primary)
         
@@ -173,11 +232,54 @@ class GenericMapper:
         return primary
         
     @classmethod
-    def _get_model_columns(cls, model: Any) -> List[str]:
+    def writable_columns(cls, model: Any,
+                         exclude_fields: Optional[Iterable[str]] = None) -> FrozenSet[str]:
+        """
+        Columnas del modelo que se pueden asignar desde datos externos
+        
+        Args:
+            model: Clase o instancia del modelo
+            exclude_fields: Campos a excluir (por defecto DEFAULT_EXCLUDE_FIELDS)
+        
+        Returns:
+            frozenset con los nombres de columna asignables
+        """
+        return cls._get_metadata(model).column_set - cls._get_exclude_set(exclude_fields)
+    
+    @classmethod
+    def _get_metadata(cls, model: Any) -> ModelMetadata:
+        """
+        Obtiene (y cachea por clase) las columnas y setters de un modelo.
+        Acepta tanto la clase del modelo como una instancia
+        """
+        model_class = model if isinstance(model, type) else type(model)
+        metadata = cls._metadata_cache.get(model_class)
+        if metadata is None:
+            if not hasattr(model_class, '__table__'):
+                return _EMPTY_METADATA
+            columns = tuple(model_class.__table__.columns.keys())
+            setters = {
+                column: getattr(model_class, column).__set__
+                for column in columns
+                if hasattr(getattr(model_class, column, None), '__set__')
+            }
+            metadata = ModelMetadata(columns, frozenset(columns), setters)
+            cls._metadata_cache[model_class] = metadata
+        return metadata
+    
+    @classmethod
+    def _get_exclude_set(cls, exclude_fields: Optional[Iterable[str]]) -> FrozenSet[str]:
+        """Normaliza los campos a excluir a un frozenset"""
+        if exclude_fields is None:
+            return cls.DEFAULT_EXCLUDE_FIELDS
+        if isinstance(exclude_fields, frozenset):
+            return exclude_fields
+        return frozenset(exclude_fields)
+    
+    @classmethod
+    def _get_model_columns(cls, model: Any) -> Tuple[str, ...]:
         """Obtiene las columnas de un modelo SQLAlchemy"""
-        if hasattr(model, '__table__'):
-            return list(model.__table__.columns.keys())
-        return []
+        return cls._get_metadata(model).columns
     
     @classmethod
     def _get_model_relationships(cls, model: Any) -> List[str]:
@@ -188,24 +290,26 @@ class GenericMapper:
     
     @classmethod
     def _map_dict_to_model(cls, source_dict: Dict, target: Any, 
-                          valid_columns: List[str], exclude_fields: List[str],
+                          metadata: ModelMetadata, exclude_fields: FrozenSet[str],
                           include_none: bool) -> Any:
         """Mapea un diccionario a un modelo"""
+        setters = metadata.setters
         for key, value in source_dict.items():
-            if key in valid_columns and key not in exclude_fields:
+            setter = setters.get(key)
+            if setter is not None and key not in exclude_fields:
                 if include_none or value is not None:
-                    setattr(target, key, value)
+                    setter(target, value)
         return target
     
     @classmethod
     def _map_model_to_model(cls, source: Any, target: Any, 
-                           valid_columns: List[str], exclude_fields: List[str],
+                           metadata: ModelMetadata, exclude_fields: FrozenSet[str],
                            include_none: bool) -> Any:
         """Mapea un modelo a otro modelo"""
-        for column in valid_columns:
+        for column, setter in metadata.setters.items():
             if column not in exclude_fields:
                 if hasattr(source, column):
                     value = getattr(source, column, None)
                     if include_none or value is not None:
-                        setattr(target, column, value)
+                        setter(target, value)
         return target
\ No newline at end of file
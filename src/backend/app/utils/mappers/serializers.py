@@ -1,11 +1,211 @@
-def serialize_patient(patient):
-    return {
-        'id': patient.id,
-        'name': patient.name,
-        'email': patient.email,
-        'phone': patient.phone,
-        'created_at': patient.created_at.isoformat() if patient.created_at else None
+from operator import attrgetter
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Date, DateTime, Time, select
+from sqlalchemy.orm import load_only
+
+from app.models.medicine import Medicine
+from app.models.patients import Patient
+from app.models.user import User
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional, se usa json de la stdlib
+    orjson = None
+
+
+class ModelSerializer:
+    """
+    Serializador precompilado para un modelo SQLAlchemy
+
+    Las columnas, el getter y las columnas temporales se calculan una sola vez
+    a partir de __table__.columns, en lugar de introspeccionar el modelo en
+    cada llamada como hace GenericMapper.map_to_dict
+    """
+
+    def __init__(self, model_class, exclude_fields=None, computed=None, include_fields=None):
+        """
+        Args:
+            model_class: Clase del modelo a serializar
+            exclude_fields: Columnas que no se incluyen en la salida
+            computed: Dict campo -> (función(obj), columnas de las que depende)
+                para campos calculados. La función recibe la instancia o la
+                fila (Row) de SQL
+            include_fields: Subconjunto ordenado de columnas a serializar
+        """
+        exclude_fields = frozenset(exclude_fields or ())
+        table_columns = model_class.__table__.columns
+        if include_fields is None:
+            include_fields = table_columns.keys()
+
+        self.model_class = model_class
+        self.columns = tuple(
+            table_columns[field] for field in include_fields
+            if field not in exclude_fields
+        )
+        self.fields = tuple(column.key for column in self.columns)
+        self.temporal_fields = tuple(
+            column.key for column in self.columns
+            if isinstance(column.type, (DateTime, Date, Time))
+        )
+        self.computed_spec = dict(computed or {})
+        self.computed = tuple(
+            (field, func) for field, (func, _) in self.computed_spec.items()
+        )
+        # Columnas que solo se cargan porque las necesita un campo calculado
+        self.dependency_columns = tuple(
+            table_columns[dep]
+            for dep in dict.fromkeys(
+                dep for _, deps in self.computed_spec.values() for dep in deps
+            )
+            if dep not in self.fields
+        )
+        self.load_fields = self.fields + tuple(column.key for column in self.dependency_columns)
+        # Atributos del modelo, no columnas de la tabla: así el SELECT pasa
+        # por el ORM y se le aplica el filtro por centro
+        self._select_columns = tuple(getattr(model_class, field) for field in self.load_fields)
+        self._exclude_fields = exclude_fields
+        self._getter = attrgetter(*self.fields) if len(self.fields) > 1 else None
+        self._projections = {}
+
+    def project(self, fields):
+        """
+        Devuelve un serializador limitado a los campos pedidos (?fields=).
+        Los serializadores proyectados se cachean por conjunto de campos
+
+        Raises:
+            ValueError: Si se pide un campo que no existe o está excluido
+        """
+        if not fields:
+            return self
+        if isinstance(fields, str):
+            fields = fields.split(',')
+        requested = tuple(dict.fromkeys(f.strip() for f in fields if f and f.strip()))
+        if not requested:
+            return self
+
+        key = frozenset(requested)
+        projection = self._projections.get(key)
+        if projection is not None:
+            return projection
+
+        unknown = [
+            field for field in requested
+            if field not in self.fields and field not in self.computed_spec
+        ]
+        if unknown:
+            raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+
+        projection = ModelSerializer(
+            self.model_class,
+            exclude_fields=self._exclude_fields,
+            computed={
+                field: self.computed_spec[field]
+                for field in requested if field in self.computed_spec
+            },
+            include_fields=[field for field in requested if field in self.fields]
+        )
+        self._projections[key] = projection
+        return projection
+
+    def select(self, *extra_columns):
+        """
+        Devuelve un SELECT con las columnas serializables, las dependencias
+        de los campos calculados y las columnas extra, en ese orden
+        """
+        return select(*self._select_columns, *extra_columns)
+
+    def load_only(self):
+        """Opción load_only para cargar solo las columnas necesarias en el ORM"""
+        return load_only(*(getattr(self.model_class, field) for field in self.load_fields))
+
+    def to_dict(self, obj):
+        """Serializa una instancia del modelo"""
+        if self._getter is None:
+            values = tuple(getattr(obj, field) for field in self.fields)
+        else:
+            values = self._getter(obj)
+        data = self._build(values)
+        for field, func in self.computed:
+            data[field] = func(obj)
+        return data
+
+    def from_row(self, row):
+        """
+        Serializa una fila obtenida con select(), sin hidratar el modelo.
+        Las columnas extra al final de la fila se ignoran
+        """
+        data = self._build(row)
+        for field, func in self.computed:
+            data[field] = func(row)
+        return data
+
+    def many(self, objs):
+        """Serializa una lista de instancias"""
+        return [self.to_dict(obj) for obj in objs]
+
+    def from_rows(self, rows):
+        """Serializa una lista de filas"""
+        return [self.from_row(row) for row in rows]
+
+    def _build(self, values):
+        data = dict(zip(self.fields, values))
+        for field in self.temporal_fields:
+            value = data[field]
+            if value is not None:
+                data[field] = value.isoformat()
+        return data
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de Flask que usa orjson si está instalado y,
+    si no, el encoder de la stdlib de DefaultJSONProvider
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent') or 'cls' in kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._orjson_dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        compact = not ((self.compact is None and self._app.debug) or self.compact is False)
+        if orjson is None or not compact:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self._orjson_dumps(obj) + b'\n', mimetype=self.mimetype
+        )
+
+    def _orjson_dumps(self, obj):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+
+# tenant_id no sale en las respuestas: cada usuario solo ve su centro
+patient_serializer = ModelSerializer(Patient, exclude_fields=['tenant_id'])
+
+medicine_serializer = ModelSerializer(Medicine, exclude_fields=['tenant_id'])
+
+user_serializer = ModelSerializer(
+    User,
+    exclude_fields=['password_hash', 'tenant_id'],
+    computed={
+        'full_name': (User.get_full_name, ('first_name', 'last_name', 'username')),
+        'in_working_hours': (
+            User.is_in_working_hours,
+            ('work_days', 'work_start_time', 'work_end_time', 'is_available')
+        ),
     }
+)
+
+
+def serialize_patient(patient):
+    return patient_serializer.to_dict(patient)
 
 def serialize_patients(patients):
-    return [serialize_patient(patient) for patient in patients]
\ No newline at end of file
+    return patient_serializer.many(patients)
+
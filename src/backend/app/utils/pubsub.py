@@ -0,0 +1,222 @@
+"""
+Pub/sub de eventos para el canal SSE
+
+Cada suscripción pertenece a un usuario; los eventos llevan su audiencia
+(IDs de usuario) y solo se entregan a esas suscripciones. Las suscripciones
+sin usuario (admins) reciben todo. Los eventos llevan además el centro donde
+se publicaron y solo llegan a las suscripciones de ese centro.
+
+El backend por defecto reparte los eventos dentro del proceso. Para varios
+workers se implementa un PubSubBackend cuyo publish() envía el evento a un
+bus compartido y cuyo listener llama a deliver() en cada worker al recibirlo:
+
+    class MiBackend(PubSubBackend):
+        def publish(self, event):
+            bus.send(event.to_json())
+        # hilo del listener: self.deliver(Event.from_json(mensaje))
+
+y se configura con EVENTS_BACKEND=paquete.modulo:MiBackend
+"""
+import asyncio
+import importlib
+from abc import ABC, abstractmethod
+import itertools
+import json
+import queue
+import threading
+from typing import Any, Dict, FrozenSet, NamedTuple, Optional
+
+DEFAULT_QUEUE_SIZE = 100
+
+
+class Event(NamedTuple):
+    """
+    Evento publicado
+
+    Args:
+        id: Identificador incremental (id: de SSE)
+        type: Tipo de evento (event: de SSE)
+        data: Datos serializables a JSON
+        user_ids: Audiencia; None para todos los usuarios
+        tenant_id: Centro donde se publicó; None para todos los centros
+    """
+    id: int
+    type: str
+    data: Dict[str, Any]
+    user_ids: Optional[FrozenSet[int]] = None
+    tenant_id: Optional[int] = None
+
+    def to_json(self) -> str:
+        user_ids = sorted(self.user_ids) if self.user_ids is not None else None
+        return json.dumps({'id': self.id, 'type': self.type, 'data': self.data,
+                           'user_ids': user_ids, 'tenant_id': self.tenant_id})
+
+    @classmethod
+    def from_json(cls, raw: str) -> 'Event':
+        payload = json.loads(raw)
+        user_ids = payload.get('user_ids')
+        return cls(payload['id'], payload['type'], payload['data'],
+                   frozenset(user_ids) if user_ids is not None else None,
+                   payload.get('tenant_id'))
+
+
+class Subscription(ABC):
+    """
+    Suscripción de un usuario (None = todos los eventos) en un centro (None =
+    todos los centros). Si el cliente no consume y la cola se llena se
+    descartan eventos y se marca overflowed para que el stream pida al
+    cliente una resincronización
+    """
+
+    def __init__(self, backend: 'PubSubBackend', user_id: Optional[int],
+                 tenant_id: Optional[int] = None):
+        self.backend = backend
+        self.user_id = user_id
+        self.tenant_id = tenant_id
+        self.overflowed = False
+
+    def accepts(self, event: Event) -> bool:
+        """Si el evento es del centro de la suscripción"""
+        return self.tenant_id is None or event.tenant_id is None or event.tenant_id == self.tenant_id
+
+    @abstractmethod
+    def deliver(self, event: Event):
+        ...
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ThreadSubscription(Subscription):
+    """Suscripción para hilos WSGI (cola bloqueante)"""
+
+    def __init__(self, backend, user_id, tenant_id=None, maxsize=DEFAULT_QUEUE_SIZE):
+        super().__init__(backend, user_id, tenant_id)
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """Siguiente evento, o None si no llega ninguno en timeout segundos"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """
+    Suscripción para el modo ASGI. deliver() puede llamarse desde cualquier
+    hilo (p. ej. una vista Flask); el evento se encola en el event loop
+    """
+
+    def __init__(self, backend, user_id, tenant_id=None, loop=None, maxsize=DEFAULT_QUEUE_SIZE):
+        super().__init__(backend, user_id, tenant_id)
+        self._loop = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """Siguiente evento, o None si no llega ninguno en timeout segundos"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PubSubBackend(ABC):
+    """
+    Interfaz del backend. Mantiene el registro local de suscripciones
+    indexado por usuario; las subclases solo definen publish()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_user: Dict[Optional[int], set] = {}
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    @abstractmethod
+    def publish(self, event: Event):
+        ...
+
+    def subscribe(self, user_id: Optional[int], tenant_id: Optional[int] = None,
+                  asynchronous: bool = False) -> Subscription:
+        """
+        Crea una suscripción para un usuario (None = todos los eventos) que
+        solo recibe los eventos de su centro (None = todos los centros)
+        """
+        subscription = (AsyncSubscription if asynchronous else ThreadSubscription)(
+            self, user_id, tenant_id)
+        with self._lock:
+            self._by_user.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._by_user.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._by_user[subscription.user_id]
+
+    def deliver(self, event: Event):
+        """Entrega un evento a las suscripciones locales de su audiencia y centro"""
+        with self._lock:
+            if event.user_ids is None:
+                targets = [s for subscriptions in self._by_user.values() for s in subscriptions]
+            else:
+                targets = list(self._by_user.get(None, ()))
+                for user_id in event.user_ids:
+                    targets.extend(self._by_user.get(user_id, ()))
+        for subscription in targets:
+            if subscription.accepts(event):
+                subscription.deliver(event)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._by_user.values())
+
+
+class InProcessBackend(PubSubBackend):
+    """Backend de un solo proceso: publicar es entregar localmente"""
+
+    def publish(self, event: Event):
+        self.deliver(event)
+
+
+def load_backend(path: Optional[str]) -> PubSubBackend:
+    """
+    Instancia el backend configurado ('paquete.modulo:Clase');
+    InProcessBackend si no se indica ninguno
+
+    Raises:
+        TypeError: Si la clase no es un PubSubBackend completo
+    """
+    if not path:
+        return InProcessBackend()
+    module_name, _, class_name = path.partition(':')
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(backend_class, type) and issubclass(backend_class, PubSubBackend)):
+        raise TypeError(f"EVENTS_BACKEND: {path} no es un PubSubBackend")
+    return backend_class()
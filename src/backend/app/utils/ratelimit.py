@@ -0,0 +1,234 @@
+"""
+Límite de peticiones por usuario y ruta (token bucket)
+
+Cada clave (identidad del JWT, o la IP en las rutas sin token, más el
+endpoint) tiene un cubo de `capacity` fichas que se rellena a
+capacity/period fichas por segundo; cada petición consume una. Sin fichas
+se responde 429 con Retry-After.
+
+Presupuestos ('peticiones/segundos'):
+- RATE_LIMIT_DEFAULT para todas las rutas, p. ej. '120/60'
+- @rate_limit('30/60') en las rutas caras
+- RATE_LIMIT_BUDGETS para sobrescribirlos por endpoint sin tocar código
+
+El almacén por defecto vive en la memoria del proceso, así que cada worker
+cuenta por separado. Para compartir los cubos se implementa un
+RateLimitStore cuyo consume() sea atómico en el almacén compartido (p. ej.
+un script Lua en Redis con la misma cuenta que refill()):
+
+    class MiStore(RateLimitStore):
+        def consume(self, key, capacity, rate, now):
+            ...
+
+y se configura con RATE_LIMIT_STORE=paquete.modulo:MiStore
+"""
+import importlib
+import math
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+# Con más cubos que este número se descartan los que ya se habrían llenado
+DEFAULT_MAX_KEYS = 100_000
+
+RATE_LIMITED_MESSAGE = 'Demasiadas peticiones, inténtalo más tarde'
+
+# Marca en el scope ASGI de una petición que ya pasó el límite en el
+# middleware (la app Flask la ve en environ['asgi.scope'])
+CHECKED_KEY = 'rate_limit.checked'
+
+
+class Budget(NamedTuple):
+    """Presupuesto de un cubo: `capacity` peticiones cada `period` segundos"""
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        """Fichas por segundo"""
+        return self.capacity / self.period
+
+
+def parse_budget(value) -> Budget:
+    """
+    Presupuesto a partir de 'peticiones/segundos' (p. ej. '30/60')
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    if isinstance(value, Budget):
+        return value
+    capacity, sep, period = str(value).partition('/')
+    try:
+        budget = Budget(int(capacity), float(period) if sep else 1.0)
+    except ValueError:
+        raise ValueError(f"Presupuesto no válido: '{value}' (se espera 'peticiones/segundos')")
+    if budget.capacity < 1 or budget.period <= 0:
+        raise ValueError(f"Presupuesto no válido: '{value}'")
+    return budget
+
+
+def refill(tokens: float, updated: float, capacity: int, rate: float, now: float) -> float:
+    """Fichas de un cubo tras rellenarlo desde `updated` hasta `now`"""
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+class RateLimitStore(ABC):
+    """Interfaz del almacén de cubos"""
+
+    @abstractmethod
+    def consume(self, key: str, capacity: int, rate: float, now: float) -> float:
+        """
+        Consume una ficha del cubo `key` (que empieza lleno)
+
+        Returns:
+            0 si la petición entra; si no, segundos hasta que haya una ficha
+        """
+
+
+class InMemoryStore(RateLimitStore):
+    """Cubos en un diccionario del proceso"""
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, List[float]] = {}
+
+    def consume(self, key, capacity, rate, now):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                # [fichas, última actualización, segundos en llenarse desde vacío]
+                bucket = self._buckets[key] = [float(capacity), now, capacity / rate]
+            tokens = refill(bucket[0], bucket[1], capacity, rate, now)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / rate
+
+    def _prune(self, now):
+        # Un cubo sin uso durante lo que tarda en llenarse ya está lleno:
+        # borrarlo es equivalente a conservarlo. Si no hay ninguno así se
+        # descartan los más antiguos
+        full = [key for key, (_, updated, fill) in self._buckets.items() if now - updated >= fill]
+        for key in full or list(self._buckets)[:len(self._buckets) // 2]:
+            del self._buckets[key]
+
+
+def load_store(path: Optional[str]) -> RateLimitStore:
+    """
+    Instancia el almacén configurado ('paquete.modulo:Clase');
+    InMemoryStore si no se indica ninguno
+
+    Raises:
+        TypeError: Si la clase no es un RateLimitStore completo
+    """
+    if not path:
+        return InMemoryStore()
+    module_name, _, class_name = path.partition(':')
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(store_class, type) and issubclass(store_class, RateLimitStore)):
+        raise TypeError(f"RATE_LIMIT_STORE: {path} no es un RateLimitStore")
+    return store_class()
+
+
+def rate_limit(budget):
+    """Presupuesto propio de una ruta cara, p. ej. @rate_limit('30/60')"""
+    parsed = parse_budget(budget)
+
+    def decorator(f):
+        f.rate_limit_budget = parsed
+        return f
+    return decorator
+
+
+def forwarded_addr(forwarded_for: Optional[str], trusted_hops: int, remote_addr: Optional[str]) -> Optional[str]:
+    """
+    IP del cliente detrás de `trusted_hops` proxies de confianza, con la
+    misma regla que ProxyFix(x_for=trusted_hops): la entrada que añadió el
+    primero de ellos en X-Forwarded-For. Si faltan entradas, remote_addr
+    """
+    if trusted_hops and forwarded_for:
+        values = [value.strip() for value in forwarded_for.split(',')]
+        if len(values) >= trusted_hops:
+            return values[-trusted_hops]
+    return remote_addr
+
+
+def request_identity() -> str:
+    """
+    Usuario del JWT ya verificado; la IP en las rutas sin token (la de
+    X-Forwarded-For con PROXY_FIX_X_FOR, que aplica ProxyFix en create_app)
+    """
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        identity = None
+    return f'user:{identity}' if identity is not None else f'ip:{request.remote_addr}'
+
+
+def get_budget(app, endpoint, default: Budget, overrides: Dict[str, Budget]) -> Budget:
+    if endpoint in overrides:
+        return overrides[endpoint]
+    return getattr(app.view_functions.get(endpoint), 'rate_limit_budget', None) or default
+
+
+class RateLimiter:
+    """Presupuestos configurados de una app y su almacén de cubos"""
+
+    def __init__(self, app, store: RateLimitStore, default: Budget, overrides: Dict[str, Budget]):
+        self.app = app
+        self.store = store
+        self.default = default
+        self.overrides = overrides
+
+    def consume(self, identity: str, endpoint: str, now: float) -> float:
+        """
+        Consume una ficha del cubo de la identidad en el endpoint
+
+        Returns:
+            0 si la petición entra; si no, segundos hasta que haya una ficha
+        """
+        budget = get_budget(self.app, endpoint, self.default, self.overrides)
+        return self.store.consume(f'{identity}:{endpoint}', budget.capacity, budget.rate, now)
+
+
+def setup_rate_limiting(app):
+    """
+    Registra el límite de peticiones. Debe ir después de la verificación
+    del JWT para poder usar la identidad como clave. En modo ASGI lo aplica
+    el middleware de app/asgi.py con el mismo RateLimiter, antes de llegar
+    a Flask
+    """
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+    store = load_store(app.config['RATE_LIMIT_STORE'])
+    app.extensions['rate_limit_store'] = store
+    limiter = app.extensions['rate_limiter'] = RateLimiter(
+        app,
+        store,
+        parse_budget(app.config['RATE_LIMIT_DEFAULT']),
+        {endpoint: parse_budget(budget) for endpoint, budget in app.config['RATE_LIMIT_BUDGETS'].items()}
+    )
+
+    @app.before_request
+    def check_rate_limit():
+        if request.method == 'OPTIONS' or request.endpoint is None:
+            return None
+        if request.environ.get('asgi.scope', {}).get(CHECKED_KEY):
+            return None
+        retry_after = limiter.consume(request_identity(), request.endpoint, time.time())
+        if retry_after <= 0:
+            return None
+        response = jsonify({'error': RATE_LIMITED_MESSAGE})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
@@ -0,0 +1,165 @@
+"""
+Logging estructurado y no bloqueante
+
+Todos los loggers escriben en una cola en memoria (QueueHandler); un hilo
+(QueueListener) formatea los registros como JSON y los escribe en stdout,
+así la E/S del log no ocurre en el hilo que atiende la petición. Si la cola
+se llena los registros se descartan en lugar de bloquear.
+
+Cada petición deja un registro con su request id, ruta, latencia, estado y
+los campos que el código añada en g.log_fields. Las respuestas correctas se
+muestrean (LOG_SAMPLE_RATE); las 4xx y 5xx se registran siempre. LOG_ROUTE_LEVELS fija el nivel mínimo de ese registro
+por ruta ('/api/sync/version') o endpoint ('medicine_bp.get_medicines').
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# Atributos propios de LogRecord: el resto son campos pasados en extra={...}
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+request_logger = logging.getLogger('app.requests')
+
+# Una cola y un listener por proceso aunque se cree la app varias veces
+_listener = None
+_queue_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con el mensaje y los campos de extra"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler que nunca espera: con la cola llena descarta el registro.
+    Añade el request id de la petición en curso a todos los registros
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # El formateo se hace en el hilo del listener: aquí solo se resuelve
+        # el mensaje y la traza, que dependen del estado del hilo actual
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        if 'request_id' not in vars(record) and has_request_context() and 'request_id' in g:
+            record.request_id = g.request_id
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _start_listener(app):
+    """Cola y listener del proceso, enganchados al logger raíz"""
+    global _listener, _queue_handler
+    if _listener is None:
+        log_queue = queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE'])
+        stream = logging.StreamHandler(sys.stdout)
+        if app.config['LOG_FORMAT'] == 'json':
+            stream.setFormatter(JsonFormatter())
+        else:
+            stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        _queue_handler = NonBlockingQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+        logging.getLogger().addHandler(_queue_handler)
+    logging.getLogger().setLevel(app.config['LOG_LEVEL'])
+    return _queue_handler
+
+
+def route_level(route_levels, endpoint, rule):
+    """Nivel mínimo del registro de acceso de una ruta (None: sin ajuste)"""
+    return route_levels.get(endpoint, route_levels.get(rule))
+
+
+def setup_logging(app):
+    """
+    Configura el logging del proceso y registra el log de peticiones de la
+    app. Debe llamarse antes de registrar otros before_request para medir
+    también las peticiones que estos cortan (p. ej. un 401)
+    """
+    _start_listener(app)
+    # Flask añade su propio StreamHandler síncrono a app.logger; todo pasa por la cola
+    app.logger.removeHandler(default_handler)
+
+    sample_rate = app.config['LOG_SAMPLE_RATE']
+    route_levels = {
+        route: logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        for route, level in app.config['LOG_ROUTE_LEVELS'].items()
+    }
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def write_request_log(response):
+        response.headers.setdefault(REQUEST_ID_HEADER, g.get('request_id', ''))
+        started = g.get('request_started')
+        if started is None:
+            return response
+
+        status = response.status_code
+        if status >= 500:
+            level = logging.ERROR
+        elif status >= 400:
+            level = logging.WARNING
+        else:
+            # Las respuestas correctas se muestrean; los errores, siempre
+            if sample_rate < 1 and random.random() >= sample_rate:
+                return response
+            level = logging.INFO
+
+        rule = request.url_rule.rule if request.url_rule else request.path
+        minimum = route_level(route_levels, request.endpoint, rule)
+        if (minimum is not None and level < minimum) or not request_logger.isEnabledFor(level):
+            return response
+
+        request_logger.log(level, '%s %s %s', request.method, rule, status, extra={
+            'request_id': g.request_id,
+            'method': request.method,
+            'route': rule,
+            'path': request.path,
+            'status': status,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            **g.get('log_fields', {}),
+        })
+        return response
@@ -0,0 +1,92 @@
+"""
+Opciones de la sesión de SQLAlchemy
+
+- SQLALCHEMY_EXPIRE_ON_COMMIT (por defecto false): tras un commit las
+  instancias conservan sus valores. Las rutas que escriben y luego
+  serializan el objeto (crear o editar un paciente, activar una medicina,
+  editar el perfil...) no lo vuelven a leer con un SELECT. Las relaciones
+  son lazy='dynamic' (se consultan siempre) y los UPDATE masivos del ORM
+  sincronizan la sesión, así que no quedan valores viejos.
+- DB_READ_ONLY_GET (por defecto true): los GET y HEAD abren transacciones
+  de solo lectura (en PostgreSQL, BEGIN READ ONLY, sin idas y vueltas de
+  más): una escritura por error en un GET falla en lugar de colarse. Los
+  blueprints marcados con snapshot_transactions() usan SERIALIZABLE READ
+  ONLY DEFERRABLE: todas las consultas de la petición ven la misma foto
+  de los datos, sin errores de serialización ni coste de SSI.
+
+SQLite no tiene transacciones de solo lectura: ahí solo cuenta lo primero.
+"""
+import threading
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy.engine import Engine
+
+READ_ONLY = 'read_only'
+SNAPSHOT = 'snapshot'
+
+# Opciones de conexión de cada modo (solo PostgreSQL)
+TRANSACTION_OPTIONS = {
+    READ_ONLY: {'postgresql_readonly': True},
+    SNAPSHOT: {'isolation_level': 'SERIALIZABLE', 'postgresql_readonly': True, 'postgresql_deferrable': True},
+}
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+_snapshot_blueprints = set()
+# Modo de la petición en curso. Es una ContextVar, como la réplica elegida:
+# los hilos del panel (contextvars.copy_context()) lo heredan
+_transaction_mode: ContextVar[Optional[str]] = ContextVar('transaction_mode', default=None)
+_engines: Dict[Tuple[Engine, str], Engine] = {}
+_lock = threading.Lock()
+
+
+def snapshot_transactions(blueprint):
+    """Los GET del blueprint leen de una foto consistente (modo SNAPSHOT)"""
+    _snapshot_blueprints.add(blueprint.name)
+    return blueprint
+
+
+def expire_on_commit() -> bool:
+    """Valor de expire_on_commit para una sesión nueva"""
+    return current_app.config.get('SQLALCHEMY_EXPIRE_ON_COMMIT', True) if has_app_context() else True
+
+
+def transaction_engine(engine: Engine) -> Engine:
+    """
+    Engine con las opciones del modo de transacción de la petición en curso.
+    Las conexiones se marcan al sacarlas del pool y se restauran al
+    devolverlas
+    """
+    mode = _transaction_mode.get()
+    if mode is None or engine.dialect.name != 'postgresql':
+        return engine
+    key = (engine, mode)
+    option_engine = _engines.get(key)
+    if option_engine is None:
+        with _lock:
+            option_engine = _engines.setdefault(key, engine.execution_options(**TRANSACTION_OPTIONS[mode]))
+    return option_engine
+
+
+def _choose_transaction_mode():
+    if request.method in SAFE_METHODS:
+        mode = SNAPSHOT if request.blueprint in _snapshot_blueprints else READ_ONLY
+        g.transaction_mode_token = _transaction_mode.set(mode)
+
+
+def _reset_transaction_mode(exc=None):
+    token = g.pop('transaction_mode_token', None)
+    if token is not None:
+        _transaction_mode.reset(token)
+
+
+def setup_session_options(app):
+    """
+    Transacciones de solo lectura en los GET. Debe ir antes de cualquier
+    before_request que use la base de datos
+    """
+    if app.config['DB_READ_ONLY_GET']:
+        app.before_request(_choose_transaction_mode)
+        app.teardown_request(_reset_transaction_mode)
@@ -0,0 +1,133 @@
+"""
+Datos por centro (tenant)
+
+Usuarios, pacientes, medicinas, trabajos y el change log llevan tenant_id
+(app.models.facility.TenantMixin). En una petición autenticada el centro
+sale del claim 'tenant_id' del JWT, y la sesión añade
+`tenant_id = :centro` a todas las consultas del ORM sobre esos modelos
+(SELECT, UPDATE y DELETE, también en subconsultas y cargas de relaciones),
+así los servicios no tienen que filtrar a mano. Las filas nuevas toman el
+centro en curso.
+
+Fuera de una petición (comandos, migraciones, el worker antes de tomar un
+trabajo) no hay centro y las consultas no se filtran; tenant_scope() fija
+uno explícitamente. Las sentencias Core sobre tablas (Patient.__table__,
+tablas de relación) no se filtran: deben partir de IDs ya filtrados.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from flask import has_request_context, request
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from app.extensions import db
+
+# Centro de los datos existentes antes de la partición y de las filas
+# creadas sin centro en curso
+DEFAULT_TENANT_ID = 1
+
+# Centro que no existe: el de un token cuyo usuario ya no está
+NO_TENANT_ID = 0
+
+TENANT_CLAIM = 'tenant_id'
+
+# ContextVar: los hilos lanzados con contextvars.copy_context() (secciones
+# del panel) consultan en el mismo centro que la petición
+_current_tenant: ContextVar[Optional[int]] = ContextVar('tenant_id', default=None)
+
+_session_events_registered = False
+_tenant_mixin = None
+
+
+def current_tenant_id() -> Optional[int]:
+    """Centro en curso, o None si las consultas no se filtran"""
+    return _current_tenant.get()
+
+
+def default_tenant_id() -> int:
+    """Centro de una fila nueva: el que está en curso o el centro por defecto"""
+    tenant_id = _current_tenant.get()
+    return DEFAULT_TENANT_ID if tenant_id is None else tenant_id
+
+
+@contextmanager
+def tenant_scope(tenant_id: Optional[int]):
+    """Filtra por `tenant_id` las consultas del bloque (None: sin filtro)"""
+    token = _current_tenant.set(tenant_id)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+class TenantSession(Session):
+    """Sesión con el filtro por centro, para el engine async del modo ASGI"""
+
+
+def _scope_to_tenant(orm_execute_state):
+    tenant_id = _current_tenant.get()
+    # Las cargas de relaciones parten de una fila ya filtrada: sus hijas
+    # son del mismo centro y el filtro extra solo confunde al planificador
+    if tenant_id is None or orm_execute_state.is_column_load or orm_execute_state.is_relationship_load:
+        return
+    if orm_execute_state.is_select or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.statement = orm_execute_state.statement.options(with_loader_criteria(
+            _tenant_mixin, lambda cls: cls.tenant_id == tenant_id, include_aliases=True
+        ))
+
+
+def _register_session_events():
+    global _session_events_registered, _tenant_mixin
+    if _session_events_registered:
+        return
+    _session_events_registered = True
+
+    from app.models.facility import TenantMixin
+    _tenant_mixin = TenantMixin
+    event.listen(db.session, 'do_orm_execute', _scope_to_tenant)
+    event.listen(TenantSession, 'do_orm_execute', _scope_to_tenant)
+
+
+def user_tenant_statement(user_id: int):
+    """SELECT del centro de un usuario"""
+    from app.models.user import User
+    return select(User.tenant_id).where(User.id == user_id)
+
+
+def _token_tenant_id() -> Optional[int]:
+    """Centro del JWT ya verificado; None en las rutas sin token"""
+    try:
+        claims = get_jwt()
+    except RuntimeError:
+        return None
+    if not claims:
+        return None
+    if TENANT_CLAIM in claims:
+        return claims[TENANT_CLAIM]
+    # Tokens emitidos antes de la partición: el centro del usuario
+    tenant_id = db.session.execute(user_tenant_statement(int(get_jwt_identity()))).scalar()
+    return NO_TENANT_ID if tenant_id is None else tenant_id
+
+
+def setup_tenancy(app):
+    """
+    Registra el filtro por centro. Debe ir después de la verificación del
+    JWT, de donde sale el centro de la petición
+    """
+    _register_session_events()
+
+    @app.before_request
+    def set_request_tenant():
+        tenant_id = _token_tenant_id()
+        if tenant_id is not None:
+            request.environ['tenancy.token'] = _current_tenant.set(tenant_id)
+
+    @app.teardown_request
+    def reset_request_tenant(exc):
+        # El hilo atiende después otras peticiones: el centro no debe quedarse
+        token = request.environ.pop('tenancy.token', None) if has_request_context() else None
+        if token is not None:
+            _current_tenant.reset(token)
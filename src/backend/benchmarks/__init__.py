@@ -0,0 +1,5 @@
+"""
+Benchmarks del backend. Se ejecutan desde src/backend con:
+
+    python -m benchmarks.<nombre> --help
+"""
@@ -0,0 +1,380 @@
+"""
+Benchmark de la API completa sobre un conjunto de datos sembrado: recorre
+los endpoints de todos los blueprints y, para cada uno, mide la latencia
+(p50/p95/p99), las consultas SQL por petición y los bytes de la respuesta.
+Compara el resultado con una línea base guardada en JSON y termina con
+código 1 si algún endpoint empeora
+
+Las peticiones se lanzan con el cliente de pruebas de Flask (sin red) o
+contra un servidor HTTP real en un hilo. Las líneas base se guardan por
+base de datos y modo, así SQLite y Postgres se comparan cada uno con lo suyo:
+
+    python -m benchmarks.api_benchmark --save-baseline
+    python -m benchmarks.api_benchmark --server http
+    python -m benchmarks.api_benchmark --database-url postgresql://localhost/remote_medic_bench
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+from sqlalchemy import select, text
+
+from benchmarks.common import (
+    BENCH_PASSWORD, QueryRecorder, auth_headers, create_bench_app, percentile, seed_assignments,
+    seed_carers, seed_medicines, seed_patients, seed_treatments, seed_user, start_wsgi
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_baseline.json')
+
+# Margen antes de considerar una regresión: la latencia se compara en p95
+# con un margen relativo y un mínimo absoluto para no saltar por ruido
+LATENCY_TOLERANCE = 0.50
+LATENCY_FLOOR_MS = 5.0
+BYTES_TOLERANCE = 0.10
+
+_registrations = itertools.count()
+
+
+class Endpoint(NamedTuple):
+    """
+    Endpoint a medir. path y body pueden ser funciones (ctx, i) para variar
+    la petición en cada iteración; role es el usuario que la hace
+    """
+    blueprint: str
+    method: str
+    path: Union[str, Callable[[dict, int], str]]
+    body: Any = None
+    role: Optional[str] = 'carer'
+
+    @property
+    def name(self):
+        path = self.path if isinstance(self.path, str) else self.path.__doc__
+        return f'{self.method} {path}'
+
+    def request(self, ctx, i):
+        path = self.path(ctx, i) if callable(self.path) else self.path.format(**ctx)
+        body = self.body(ctx, i) if callable(self.body) else self.body
+        return path, body
+
+
+def _register_body(ctx, i):
+    n = next(_registrations)
+    return {'username': f'nuevo{n}', 'email': f'nuevo{n}@bench.local', 'password': BENCH_PASSWORD}
+
+def _create_medicine_body(ctx, i):
+    return {'name': f'Nueva{next(_registrations)}', 'dosage': '10mg'}
+
+def _assign_path(ctx, i):
+    """/api/patients/<sin asignar>/assign"""
+    return f"/api/patients/{ctx['unassigned'][i % len(ctx['unassigned'])]}/assign"
+
+def _prescribe_path(ctx, i):
+    """/api/medicines/patients/{patient_id}/medicines/<nueva>"""
+    return f"/api/medicines/patients/{ctx['patient_id']}/medicines/{ctx['free_medicines'][i]}"
+
+def _bulk_remove_path(ctx, i):
+    """/api/medicines/patients/<desechable>/medicines/bulk-delete"""
+    return f"/api/medicines/patients/{ctx['disposable_patients'][i]}/medicines/bulk-delete"
+
+def _bulk_remove_body(ctx, i):
+    return {'medicine_ids': ctx['disposable_treatments'][ctx['disposable_patients'][i]]}
+
+def _delete_patient_path(ctx, i):
+    """/api/patients/<desechable>"""
+    return f"/api/patients/{ctx['disposable_patients'][i]}"
+
+def _delete_medicine_path(ctx, i):
+    """/api/medicines/<desechable>"""
+    return f"/api/medicines/{ctx['disposable_medicines'][i]}"
+
+def _job_path(ctx, i):
+    """/api/jobs/<id>"""
+    return f"/api/jobs/{ctx['job_id']}"
+
+
+ENDPOINTS = [
+    Endpoint('auth_bp', 'POST', '/api/auth/login',
+             {'username': 'bench_carer', 'password': BENCH_PASSWORD}, role=None),
+    Endpoint('auth_bp', 'POST', '/api/auth/register', _register_body, role=None),
+    Endpoint('auth_bp', 'GET', '/api/auth/me'),
+    Endpoint('user_bp', 'GET', '/api/users/?page=1&per_page=20', role='admin'),
+    Endpoint('user_bp', 'GET', '/api/users/{carer_id}', role='admin'),
+    Endpoint('user_patients_bp', 'GET', '/api/users/{carer_id}/patients'),
+    Endpoint('carer_bp', 'GET', '/api/carers/{carer_id}/patients'),
+    Endpoint('patient_bp', 'GET', '/api/patients?page=1&per_page=20'),
+    Endpoint('patient_bp', 'GET', '/api/patients/{patient_id}'),
+    Endpoint('patient_bp', 'GET', '/api/patients/unassigned'),
+    Endpoint('patient_bp', 'GET', '/api/patients/{patient_id}/users'),
+    Endpoint('patient_bp', 'GET', '/api/patients/carer/{carer_id}/patients'),
+    Endpoint('patient_bp', 'PUT', '/api/patients/{patient_id}', {'phone': '600000000'}),
+    Endpoint('patient_bp', 'PATCH', '/api/patients',
+             lambda ctx, i: {'ids': [ctx['patient_id']], 'changes': {'phone': '600000001'}}),
+    Endpoint('patient_bp', 'POST', _assign_path, lambda ctx, i: {'user_id': ctx['carer_id']}),
+    Endpoint('patient_bp', 'DELETE', _assign_path),
+    Endpoint('patient_bp', 'POST', '/api/patients/auto-assign', {'dry_run': True}),
+    Endpoint('medicine_bp', 'GET', '/api/medicines?page=1&per_page=20'),
+    Endpoint('medicine_bp', 'GET', '/api/medicines/search?q=Medicina1'),
+    Endpoint('medicine_bp', 'GET', '/api/medicines/{medicine_id}'),
+    Endpoint('medicine_bp', 'POST', '/api/medicines', _create_medicine_body),
+    Endpoint('medicine_bp', 'PUT', '/api/medicines/{medicine_id}', {'dosage': '20mg'}),
+    Endpoint('medicine_bp', 'PUT', '/api/medicines/disable/{medicine_id}'),
+    Endpoint('medicine_bp', 'PUT', '/api/medicines/enable/{medicine_id}'),
+    Endpoint('medicine_bp', 'GET', '/api/medicines/patients/{patient_id}/medicines'),
+    Endpoint('medicine_bp', 'PUT', '/api/medicines/patients/{patient_id}/medicines/{medicine_id}',
+             {'dose_per_take': '2'}),
+    Endpoint('medicine_bp', 'POST', _prescribe_path, {'dose_per_take': '1'}),
+    Endpoint('medicine_bp', 'DELETE', _prescribe_path),
+    Endpoint('medicine_bp', 'POST', '/api/medicines/interactions/check',
+             lambda ctx, i: {'carer_id': ctx['carer_id']}),
+    Endpoint('medicine_bp', 'DELETE', _bulk_remove_path, _bulk_remove_body),
+    Endpoint('medicine_bp', 'DELETE', _delete_medicine_path),
+    Endpoint('patient_bp', 'POST', '/api/patients/bulk-delete',
+             lambda ctx, i: {'ids': [ctx['disposable_patients'][i]]}),
+    Endpoint('patient_bp', 'DELETE', _delete_patient_path),
+    Endpoint('dashboard_bp', 'GET', '/api/dashboard'),
+    Endpoint('sync_bp', 'GET', '/api/sync?since={sync_since}'),
+    Endpoint('sync_bp', 'GET', '/api/sync/version'),
+    Endpoint('sync_bp', 'GET', '/api/sync/snapshot'),
+    Endpoint('jobs_bp', 'POST', '/api/jobs', {'type': 'patients_export'}),
+    Endpoint('jobs_bp', 'GET', '/api/jobs'),
+    Endpoint('jobs_bp', 'GET', _job_path),
+]
+
+
+def seed(args, iterations):
+    """
+    Siembra el conjunto de datos y devuelve el contexto de las peticiones.
+    Los endpoints que borran usan reservas de `iterations` IDs desechables
+    """
+    from app.extensions import db
+    from app.models.patients import patient_medicines
+    from app.models.user import User
+    from app.services.assignment_service import get_assignable_patient_ids
+    from app.services.jobs_service import enqueue_job
+    from app.services.sync_service import get_current_version
+
+    carer = seed_user('bench_carer')
+    seed_user('bench_admin', is_admin=True)
+    seed_carers(args.users)
+    seed_patients(args.patients)
+    seed_medicines(args.medicines + iterations)
+    seed_treatments(args.patients, args.medicines, args.per_patient)
+    # bench_carer es el usuario 1: recibe su parte del reparto
+    seed_assignments(args.patients, args.users + 2)
+    # Como en producción, el planificador cuenta con estadísticas: sin ellas
+    # SQLite elige índices a ciegas (p. ej. el de tenant_id, que no filtra nada)
+    db.session.execute(text('ANALYZE'))
+
+    disposable_patients = list(range(args.patients - iterations + 1, args.patients + 1))
+    assignments = User.user_patient_assignment
+    patient_id = db.session.execute(
+        select(assignments.c.patient_id).where(assignments.c.user_id == carer.id).limit(1)
+    ).scalar()
+    treatments = {}
+    for row in db.session.execute(
+        select(patient_medicines.c.patient_id, patient_medicines.c.medicine_id)
+        .where(patient_medicines.c.patient_id.in_([patient_id] + disposable_patients))
+    ):
+        treatments.setdefault(row.patient_id, []).append(row.medicine_id)
+    current = set(treatments[patient_id])
+
+    return {
+        'carer_id': carer.id,
+        'patient_id': patient_id,
+        'medicine_id': treatments[patient_id][0],
+        'free_medicines': [m for m in range(1, args.medicines + 1) if m not in current][:iterations],
+        'unassigned': [p for p in get_assignable_patient_ids() if p not in set(disposable_patients)],
+        'disposable_patients': disposable_patients,
+        'disposable_treatments': treatments,
+        'disposable_medicines': list(range(args.medicines + 1, args.medicines + iterations + 1)),
+        'job_id': enqueue_job('patients_export', user_id=carer.id).id,
+        'sync_since': max(get_current_version() - 100, 0),
+    }
+
+
+class TestClientTransport:
+    """Peticiones con el cliente de pruebas de Flask"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def __call__(self, method, path, headers, body):
+        response = self.client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, len(response.get_data())
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """Peticiones HTTP contra el servidor de werkzeug en un hilo"""
+
+    def __init__(self, app):
+        self.port, self.close = start_wsgi(app)
+
+    def __call__(self, method, path, headers, body):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            f'http://127.0.0.1:{self.port}{path}', data=data, method=method,
+            headers={**headers, 'Content-Type': 'application/json'} if data else headers
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+
+
+def run_endpoint(endpoint, transport, headers, ctx, recorder, requests, warmup):
+    """Mide un endpoint: latencias, consultas por petición, bytes y códigos de estado"""
+    latencies, queries, sizes, statuses = [], [], [], set()
+    for i in range(warmup + requests):
+        path, body = endpoint.request(ctx, i)
+        recorder.reset()
+        start = time.perf_counter()
+        status, size = transport(endpoint.method, path, headers.get(endpoint.role, {}), body)
+        elapsed = (time.perf_counter() - start) * 1000
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        queries.append(recorder.count)
+        sizes.append(size)
+        statuses.add(status)
+    return {
+        'p50': round(percentile(latencies, 50), 3),
+        'p95': round(percentile(latencies, 95), 3),
+        'p99': round(percentile(latencies, 99), 3),
+        'queries': max(queries),
+        'bytes': max(sizes),
+        'status': sorted(statuses),
+    }
+
+
+def uncovered_routes(app):
+    """Rutas de la app (método, regla) que ningún endpoint del benchmark recorre"""
+    adapter = app.url_map.bind('localhost')
+    covered = set()
+    for endpoint in ENDPOINTS:
+        path = endpoint.path.__doc__ if callable(endpoint.path) else endpoint.path
+        path = re.sub(r'<[^>]+>', '1', path.split('?')[0])
+        path = path.format_map(defaultdict(lambda: 1))
+        rule, _ = adapter.match(path, method=endpoint.method, return_rule=True)
+        covered.add((endpoint.method, rule.rule))
+    return sorted(
+        (method, rule.rule)
+        for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+        if (method, rule.rule) not in covered
+    )
+
+
+def compare(results, baseline):
+    """Regresiones respecto a la línea base: lista de (endpoint, motivo)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['p95'] > previous['p95'] * (1 + LATENCY_TOLERANCE) and \
+                current['p95'] - previous['p95'] > LATENCY_FLOOR_MS:
+            regressions.append((name, f"p95 {previous['p95']:.1f} -> {current['p95']:.1f} ms"))
+        if current['queries'] > previous['queries']:
+            regressions.append((name, f"consultas {previous['queries']} -> {current['queries']}"))
+        if current['bytes'] > previous['bytes'] * (1 + BYTES_TOLERANCE):
+            regressions.append((name, f"bytes {previous['bytes']} -> {current['bytes']}"))
+        if current['status'] != previous['status']:
+            regressions.append((name, f"estado {previous['status']} -> {current['status']}"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100, help='cuidadores')
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--medicines', type=int, default=500)
+    parser.add_argument('--per-patient', type=int, default=4, help='medicinas por paciente')
+    parser.add_argument('--requests', type=int, default=50, help='peticiones por endpoint')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--server', choices=('test-client', 'http'), default='test-client')
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='guardar el resultado como línea base en lugar de comparar')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url, migrate=True)
+
+    from app.extensions import db
+
+    with app.app_context():
+        ctx = seed(args, args.warmup + args.requests)
+        client = app.test_client()
+        headers = {
+            None: {},
+            'carer': auth_headers(client, 'bench_carer'),
+            'admin': auth_headers(client, 'bench_admin'),
+        }
+        engine = db.engine
+        dialect = engine.dialect.name
+
+    transport = (HttpTransport if args.server == 'http' else TestClientTransport)(app)
+    results = {}
+    try:
+        with QueryRecorder(engine) as recorder:
+            for endpoint in ENDPOINTS:
+                results[endpoint.name] = run_endpoint(
+                    endpoint, transport, headers, ctx, recorder, args.requests, args.warmup
+                )
+    finally:
+        transport.close()
+
+    key = f'{dialect}/{args.server}'
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    baseline = baselines.get(key, {}).get('endpoints', {})
+
+    print(f"{key}: {args.patients} pacientes, {args.users} cuidadores, {args.medicines} medicinas, "
+          f"{args.requests} peticiones por endpoint\n")
+    print(f"{'endpoint':<80} {'p50':>8} {'p95':>8} {'p99':>8} {'sql':>4} {'bytes':>9}  estado")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        delta = f"  ({result['p95'] - previous['p95']:+.1f} ms p95)" if previous else ''
+        print(f"{name[:80]:<80} {result['p50']:8.2f} {result['p95']:8.2f} {result['p99']:8.2f} "
+              f"{result['queries']:4d} {result['bytes']:9d}  {','.join(map(str, result['status']))}{delta}")
+
+    missing = uncovered_routes(app)
+    if missing:
+        print('\nRutas sin cubrir: ' + ', '.join(f'{method} {rule}' for method, rule in missing))
+
+    if args.save_baseline:
+        baselines[key] = {
+            'volumes': {name: getattr(args, name) for name in ('users', 'patients', 'medicines', 'per_patient')},
+            'endpoints': results,
+        }
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f'\nLínea base guardada en {args.baseline} ({key})')
+        return
+
+    if not baseline:
+        print(f'\nNo hay línea base para {key}: usa --save-baseline')
+        return
+    regressions = compare(results, baseline)
+    for name, reason in regressions:
+        print(f'REGRESIÓN {name}: {reason}')
+    print(f"\n{len(regressions)} regresiones respecto a la línea base")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
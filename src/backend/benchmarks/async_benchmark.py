@@ -0,0 +1,126 @@
+"""
+Concurrencia del modo síncrono (Flask, 1 worker de 1 hilo) frente al modo
+ASGI (app.asgi, 1 worker de uvicorn) con latencia simulada de base de datos.
+
+La latencia se inyecta en cada cursor.execute de sqlite3, que en el modo
+asíncrono se ejecuta en el hilo de aiosqlite y no bloquea el event loop,
+igual que una espera de red contra Postgres.
+
+Uso:
+    python -m benchmarks.async_benchmark --latency-ms 20 --concurrency 32
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (
+    auth_headers, create_bench_app, free_port, percentile, seed_medicines, seed_patients, seed_user,
+    start_wsgi
+)
+
+ENDPOINTS = [
+    '/api/patients?page=1&per_page=20',
+    '/api/medicines?get_all=true&fields=id,name,dosage',
+    '/api/medicines/search?q=Medicina1',
+]
+
+
+class LatencyCursor(sqlite3.Cursor):
+    latency = 0.0
+
+    def execute(self, *args):
+        time.sleep(LatencyCursor.latency)
+        return super().execute(*args)
+
+
+class LatencyConnection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        return super().cursor(factory or LatencyCursor)
+
+
+def start_asgi(app):
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+    return port, stop
+
+
+def load(port, path, headers, requests, concurrency):
+    """Lanza `requests` peticiones con `concurrency` clientes; devuelve (req/s, latencias ms)"""
+    def one(_):
+        request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', headers=headers)
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return requests / (time.perf_counter() - start), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--medicines', type=int, default=300)
+    args = parser.parse_args()
+
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    flask_app = create_bench_app(database_url)
+
+    from sqlalchemy import event
+
+    from app.asgi import create_asgi_app
+    from app.extensions import db
+
+    with flask_app.app_context():
+        seed_user()
+        seed_patients(args.patients)
+        seed_medicines(args.medicines)
+        headers = auth_headers(flask_app.test_client())
+        # Las conexiones nuevas del engine síncrono usan el cursor con latencia
+        event.listen(db.engine, 'do_connect',
+                     lambda dialect, record, cargs, cparams: cparams.update(factory=LatencyConnection))
+        db.engine.dispose()
+
+    asgi_app = create_asgi_app(flask_app, database_url, engine_options={
+        'connect_args': {'factory': LatencyConnection},
+        'pool_size': args.concurrency,
+    })
+
+    results = []
+    LatencyCursor.latency = args.latency_ms / 1000
+    with contextlib.redirect_stdout(io.StringIO()):
+        for mode, start in (('wsgi', start_wsgi), ('asgi', start_asgi)):
+            port, stop = start(flask_app if mode == 'wsgi' else asgi_app)
+            for path in ENDPOINTS:
+                throughput, latencies = load(port, path, headers, args.requests, args.concurrency)
+                results.append((mode, path, throughput, latencies))
+            stop()
+
+    print(f'latencia simulada {args.latency_ms} ms/consulta, {args.concurrency} clientes, 1 worker')
+    for mode, path, throughput, latencies in results:
+        print(f'{mode:<5} {path:<50} {throughput:8.1f} req/s   '
+              f'p50 {percentile(latencies, 50):8.1f} ms   p95 {percentile(latencies, 95):8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
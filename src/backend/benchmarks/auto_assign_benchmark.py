@@ -0,0 +1,66 @@
+"""
+Mide el motor de asignación automática (app.services.assignment_service):
+solo el reparto en memoria y la operación completa (consultas + INSERT
+masivo + change log) con miles de pacientes
+
+Uso:
+    python -m benchmarks.auto_assign_benchmark --patients 5000 --carers 50
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import create_bench_app, measure, report, seed_carers, seed_patients
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--carers', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.extensions import db
+    from app.models.change_log import ChangeLog
+    from app.models.user import User
+    from app.services.assignment_service import (
+        auto_assign_patients, get_assignable_patient_ids, get_carer_loads,
+        get_eligible_carers, plan_assignments
+    )
+
+    with app.app_context():
+        seed_patients(args.patients)
+        seed_carers(args.carers)
+
+        carers = get_eligible_carers()
+        loads = get_carer_loads(carers)
+        pending = get_assignable_patient_ids()
+        print(f'{len(pending)} pacientes sin asignar, {len(carers)} cuidadores elegibles\n')
+
+        report('reparto en memoria (heap greedy)',
+               measure(lambda: plan_assignments(pending, loads), args.repeat))
+        report('reparto con max_per_carer',
+               measure(lambda: plan_assignments(pending, loads, len(pending) // len(carers)), args.repeat))
+
+        timings = []
+        for _ in range(args.repeat):
+            db.session.execute(User.user_patient_assignment.delete())
+            db.session.execute(ChangeLog.__table__.delete())
+            db.session.commit()
+            start = time.perf_counter()
+            result = auto_assign_patients()
+            timings.append((time.perf_counter() - start) * 1000)
+        report('auto_assign_patients (completo)', timings)
+
+        per_carer = [len(assigned) for assigned in result['assignments'].values()]
+        print(f"\nasignados {result['assigned']}, por cuidador min {min(per_carer)} "
+              f"max {max(per_carer)} media {statistics.mean(per_carer):.1f}")
+        status = 'OK' if statistics.median(timings) < 1000 else 'LENTO'
+        print(f'{status}: mediana {statistics.median(timings):.0f} ms (objetivo < 1000 ms)')
+
+
+if __name__ == '__main__':
+    main()
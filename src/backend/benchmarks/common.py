@@ -0,0 +1,260 @@
+"""
+Utilidades compartidas por los benchmarks
+"""
+import os
+import random
+import re
+import socket
+import statistics
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+
+from sqlalchemy import event
+
+BENCH_PASSWORD = 'BenchPassw0rd'
+
+
+def create_bench_app(database_url='sqlite://', migrate=False):
+    """
+    Crea la app apuntando a la base de datos del benchmark, con el esquema
+    de db.create_all() o, si migrate, el de las migraciones
+    """
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret-key-only-for-local-benchmarks')
+    # El log de peticiones no se mezcla con el informe y los benchmarks
+    # miden la app, no el límite de peticiones ni el descarte de carga
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+    os.environ.setdefault('LOAD_SHED_ENABLED', 'false')
+
+    from app import create_app
+    from app.extensions import db
+    from app.migrations import upgrade
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        if migrate:
+            upgrade()
+        else:
+            db.create_all()
+    return app
+
+
+def seed_user(username='bench_carer', is_admin=False):
+    """Crea un usuario con BENCH_PASSWORD y lo devuelve"""
+    from app.extensions import db
+    from app.models.user import User
+
+    user = User(
+        username=username,
+        email=f'{username}@bench.local',
+        first_name='Bench',
+        last_name='Carer',
+        is_admin=is_admin
+    )
+    user.set_password(BENCH_PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def auth_headers(client, username='bench_carer'):
+    """Hace login con el cliente de pruebas y devuelve la cabecera Authorization"""
+    response = client.post('/api/auth/login', json={
+        'username': username,
+        'password': BENCH_PASSWORD
+    })
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+class QueryRecorder:
+    """
+    Registra las sentencias SQL ejecutadas por un engine, marcando si se
+    ejecutaron antes o después del primer COMMIT
+    """
+
+    _TABLE_RE = re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE)
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.executions = []
+        self.committed = False
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        event.listen(self.engine, 'commit', self._on_commit)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+        event.remove(self.engine, 'commit', self._on_commit)
+
+    def reset(self):
+        self.statements = []
+        self.executions = []
+        self.committed = False
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((self.committed, statement))
+        if not executemany:
+            self.executions.append((statement, parameters))
+
+    def _on_commit(self, conn):
+        self.committed = True
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def selects_by_table(self, after_commit=False):
+        """Cuenta los SELECT por tabla principal, antes o después del COMMIT"""
+        counts = {}
+        for committed, statement in self.statements:
+            if committed != after_commit or not statement.lstrip().upper().startswith('SELECT'):
+                continue
+            match = self._TABLE_RE.search(statement)
+            if match:
+                counts[match.group(1)] = counts.get(match.group(1), 0) + 1
+        return counts
+
+
+def seed_patients(count):
+    """Inserta `count` pacientes con un único INSERT multi-fila"""
+    from app.extensions import db
+    from app.models.patients import Patient
+
+    now = datetime.utcnow()
+    db.session.execute(Patient.__table__.insert(), [
+        {
+            'name': f'Paciente{i}',
+            'surname': f'Apellido{i}',
+            'phone': f'600{i:06d}',
+            'instructions': 'Tomar la medicación después de cada comida. ' * 4,
+            'created_at': now - timedelta(minutes=i),
+            'quit': i % 10 == 0,
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def seed_medicines(count):
+    """Inserta `count` medicinas con un único INSERT multi-fila"""
+    from app.extensions import db
+    from app.models.medicine import Medicine
+
+    now = datetime.utcnow()
+    db.session.execute(Medicine.__table__.insert(), [
+        {
+            'name': f'Medicina{i}',
+            'dosage': f'{(i % 20 + 1) * 5}mg',
+            'description': 'Descripción larga de la medicina. ' * 5,
+            'instructions': 'Tomar con agua. ' * 3,
+            'frequency_hours': 8,
+            'created_at': now,
+            'updated_at': now,
+            'is_active': i % 7 != 0,
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def seed_carers(count):
+    """Inserta `count` cuidadores disponibles todo el día, todos los días"""
+    from app.extensions import db
+    from app.models.user import User
+
+    db.session.execute(User.__table__.insert(), [
+        {
+            'username': f'carer{i}',
+            'email': f'carer{i}@bench.local',
+            'password_hash': 'x',
+            'is_active': True,
+            'is_admin': False,
+            'is_available': True,
+            'work_days': 'mon,tue,wed,thu,fri,sat,sun',
+            'work_start_time': dtime(0, 0),
+            'work_end_time': dtime(23, 59, 59),
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def seed_treatments(patients, medicines, per_patient, seed=2):
+    """Asigna `per_patient` medicinas aleatorias a cada paciente"""
+    from app.extensions import db
+    from app.models.patients import patient_medicines
+
+    rng = random.Random(seed)
+    db.session.execute(patient_medicines.insert(), [
+        {'patient_id': patient_id, 'medicine_id': medicine_id, 'dose_per_take': '1', 'notes': ''}
+        for patient_id in range(1, patients + 1)
+        for medicine_id in rng.sample(range(1, medicines + 1), per_patient)
+    ])
+    db.session.commit()
+
+
+def seed_assignments(patients, carers):
+    """Reparte los pacientes entre los cuidadores (uno por paciente)"""
+    from app.extensions import db
+    from app.models.user import User
+
+    now = datetime.utcnow()
+    db.session.execute(User.user_patient_assignment.insert(), [
+        {'user_id': patient_id % carers + 1, 'patient_id': patient_id,
+         'assigned_at': now - timedelta(minutes=patient_id)}
+        for patient_id in range(1, patients + 1)
+        # Uno de cada veinte queda sin asignar
+        if patient_id % 20
+    ])
+    db.session.commit()
+
+
+def percentile(values, pct):
+    """Percentil `pct` (0-100) por el método nearest-rank"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def measure(func, repeat=5):
+    """Ejecuta `func` `repeat` veces y devuelve los tiempos en ms"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name, timings):
+    """Imprime mejor tiempo y mediana de una serie de mediciones"""
+    print(f'{name:<40} best {min(timings):9.2f} ms   median {statistics.median(timings):9.2f} ms')
+
+
+def free_port():
+    """Puerto TCP libre en localhost"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_wsgi(app):
+    """Sirve la app con el servidor de werkzeug en un hilo; devuelve (puerto, parar)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    port = free_port()
+    server = make_server('127.0.0.1', port, app, threaded=False, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return port, server.shutdown
@@ -0,0 +1,68 @@
+"""
+Auditoría de GET condicional tras borrar: cada lista se pide una vez, se
+borra una de sus filas y se revalida con If-Modified-Since (la fecha de la
+primera respuesta, o la actual si no la envía) y con If-None-Match. Las
+dos revalidaciones deben responder 200: un 304 serviría la lista con la
+fila borrada
+
+Uso:
+    python -m benchmarks.conditional_audit
+"""
+import argparse
+import sys
+import time
+
+from werkzeug.http import http_date
+
+from benchmarks.common import auth_headers, create_bench_app, seed_patients, seed_user
+
+# (lista, método y URL del borrado)
+DELETE_PATHS = [
+    ('/api/patients', 'DELETE', '/api/patients/3'),
+    ('/api/patients/unassigned', 'DELETE', '/api/patients/4'),
+    ('/api/patients', 'DELETE', '/api/patients/1/assign'),
+    ('/api/medicines?get_all=true', 'DELETE', '/api/medicines/3'),
+    ('/api/medicines/search?q=Medicina', 'DELETE', '/api/medicines/4'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.extensions import db
+    from app.models.medicine import Medicine
+
+    with app.app_context():
+        seed_user()
+        seed_patients(10)
+        db.session.add_all(Medicine(name=f'Medicina{i}', dosage='10mg') for i in range(5))
+        db.session.commit()
+
+    client = app.test_client()
+    headers = auth_headers(client)
+    client.post('/api/patients/1/assign', json={'user_id': 1}, headers=headers)
+    failures = 0
+
+    for url, method, delete_url in DELETE_PATHS:
+        first = client.get(url, headers=headers)
+        since = first.headers.get('Last-Modified') or http_date(time.time())
+        deleted = client.open(delete_url, method=method, headers=headers)
+        by_date = client.get(url, headers={**headers, 'If-Modified-Since': since})
+        by_etag = client.get(url, headers={**headers, 'If-None-Match': first.headers.get('ETag', '')})
+        ok = deleted.status_code < 300 and by_date.status_code == 200 and by_etag.status_code == 200
+        failures += not ok
+        print(f"{'OK' if ok else 'FALLO':<6} {url:<36} {method} {delete_url:<24} {deleted.status_code}  "
+              f"If-Modified-Since={by_date.status_code}  If-None-Match={by_etag.status_code}  "
+              f"Last-Modified={first.headers.get('Last-Modified')}")
+
+    if failures:
+        print(f'{failures} listas responden 304 tras un borrado')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Caché de entidades (app/utils/entity_cache.py): repite una mezcla de
+peticiones que cargan usuarios y pacientes por ID y la compara sin caché,
+solo con la LRU del proceso y con la LRU más el segundo nivel compartido.
+Las peticiones son /api/auth/me, GET de un paciente, sus cuidadores y una
+escritura cada --write-every.
+Para cada variante da las consultas por petición, la latencia y la tasa de
+aciertos de cada nivel. El segundo nivel es InMemoryBackend salvo que se
+indique otro. Con SQLite en memoria una consulta cuesta microsegundos: la
+latencia solo mejora de verdad con la base de datos en otra máquina.
+
+Uso:
+    python -m benchmarks.entity_cache_benchmark --requests 2000
+    python -m benchmarks.entity_cache_benchmark --backend paquete.modulo:Clase
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import (
+    QueryRecorder, auth_headers, create_bench_app, percentile, seed_assignments, seed_carers, seed_patients,
+    seed_user
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=20, help='cuidadores')
+    parser.add_argument('--hot', type=int, default=50, help='pacientes distintos consultados')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--write-every', type=int, default=25)
+    parser.add_argument('--backend', default='app.utils.entity_cache:InMemoryBackend')
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.extensions import db
+    from app.utils.entity_cache import EntityCache, load_backend
+    from app.models import Patient, User
+
+    with app.app_context():
+        seed_user('bench_carer')
+        seed_carers(args.users)
+        seed_patients(args.patients)
+        seed_assignments(args.patients, args.users + 1)
+        engine = db.engine
+
+    client = app.test_client()
+    headers = auth_headers(client)
+    hot = list(range(1, args.hot + 1))
+
+    def request(i):
+        patient_id = hot[i % len(hot)]
+        if i % args.write_every == args.write_every - 1:
+            return client.put(f'/api/patients/{patient_id}', json={'phone': f'6{i:08d}'}, headers=headers)
+        path = ('/api/auth/me', f'/api/patients/{patient_id}', f'/api/patients/{patient_id}/users')[i % 3]
+        return client.get(path, headers=headers)
+
+    def make_cache(backend):
+        return EntityCache(
+            [User, Patient], size=app.config['ENTITY_CACHE_SIZE'], ttl=app.config['ENTITY_CACHE_TTL'],
+            backend=backend, shared_ttl=app.config['ENTITY_CACHE_SHARED_TTL']
+        )
+
+    # "Otro proceso": LRU vacía con el mismo segundo nivel que la variante anterior
+    shared = load_backend(args.backend)
+    variants = [
+        ('sin caché', None),
+        ('LRU del proceso', make_cache(None)),
+        ('LRU + compartida', make_cache(shared)),
+        ('otro proceso', make_cache(shared)),
+    ]
+
+    print(f'{args.requests} peticiones sobre {args.hot} pacientes, una escritura cada {args.write_every}\n')
+    print(f"{'variante':<20} {'sql/pet':>8} {'p50 ms':>8} {'p95 ms':>8} {'aciertos LRU':>13} {'aciertos 2º':>12}")
+    for name, cache in variants:
+        if cache is None:
+            app.extensions.pop('entity_cache', None)
+        else:
+            app.extensions['entity_cache'] = cache
+        timings = []
+        with QueryRecorder(engine) as recorder:
+            for i in range(args.requests):
+                start = time.perf_counter()
+                response = request(i)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, (i, response.status_code)
+            queries = recorder.count
+        stats = cache.stats() if cache is not None else {'local': {}, 'shared': None}
+        local = stats['local'].get('hit_ratio')
+        shared = (stats['shared'] or {}).get('hit_ratio')
+        print(f'{name:<20} {queries / args.requests:>8.2f} {statistics.median(timings):>8.2f} '
+              f"{percentile(timings, 95):>8.2f} {'-' if local is None else f'{local:.1%}':>13} "
+              f"{'-' if shared is None else f'{shared:.1%}':>12}")
+
+
+if __name__ == '__main__':
+    main()
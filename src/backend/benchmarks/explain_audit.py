@@ -0,0 +1,190 @@
+"""
+Auditoría de planes de ejecución: ejecuta las operaciones más frecuentes de
+las rutas sobre un conjunto de datos grande, con el esquema creado por las
+migraciones, y pide EXPLAIN de cada sentencia que lanzan. Falla (código 1)
+si alguna recorre entera una tabla grande en lugar de usar un índice
+
+Soporta SQLite (EXPLAIN QUERY PLAN) y Postgres (EXPLAIN FORMAT JSON):
+
+    python -m benchmarks.explain_audit
+    python -m benchmarks.explain_audit --database-url postgresql://.../remote_medic_bench
+"""
+import argparse
+import json
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from benchmarks.common import (
+    QueryRecorder, create_bench_app, seed_assignments, seed_carers, seed_medicines, seed_patients,
+    seed_treatments
+)
+
+# Tablas que crecen con el uso; en las demás (sync_version, reglas) un
+# recorrido completo es lo más barato
+LARGE_TABLES = {
+    'users', 'patients', 'medicines', 'patient_medicines',
+    'user_patient_assignments', 'change_log', 'jobs'
+}
+
+# SQLite: SCAN recorre la tabla o un índice entero; SEARCH sin USING es un
+# MIN()/MAX() sin índice, que también lee todas las filas
+_SQLITE_SCAN_RE = re.compile(r'^(?:SCAN (\w+)|SEARCH (\w+)(?: AS \w+)?$)')
+
+
+def seed_history(count):
+    """Change log de `count` entradas y trabajos ya terminados en la cola"""
+    from app.extensions import db
+    from app.models.change_log import ChangeLog, sync_version
+    from app.models.job import Job
+
+    db.session.execute(ChangeLog.__table__.insert(), [
+        {'version': version, 'entity': 'patients', 'entity_key': str(version % 5000 + 1), 'op': 'u'}
+        for version in range(1, count + 1)
+    ])
+    db.session.execute(sync_version.update().values(version=count))
+    now = datetime.utcnow()
+    db.session.execute(Job.__table__.insert(), [
+        {'type': 'patients_export', 'payload': {}, 'status': Job.SUCCEEDED, 'attempts': 1,
+         'max_attempts': 3, 'run_at': now - timedelta(minutes=i), 'created_by': i % 50 + 1}
+        for i in range(count // 10)
+    ])
+    db.session.commit()
+
+
+def hot_operations(patients, medicines, carers, head):
+    """
+    Operaciones a auditar: (nombre, función). Son las consultas selectivas
+    que se ejecutan en cada petición (estado de los GET condicionales,
+    búsquedas por clave y por relación). Los listados completos, los
+    procesos por lotes y los COUNT() del estado de las colecciones recorren
+    las tablas a propósito y no se incluyen; del estado se audita el MAX()
+    """
+    from app.extensions import db
+    from app.models.medicine import Medicine
+    from app.models.patients import Patient
+    from app.services.assignment_service import get_carer_loads
+    from app.services.events_service import carers_of_medicine, carers_of_patients
+    from app.services.interaction_service import check_patients, get_assignment_context
+    from app.services.jobs_service import claim_next_job, get_jobs
+    from app.services.medicine_service import medicine_state
+    from app.services.patients_service import carer_patients_statement, patient_state
+    from app.services.sync_service import get_changes
+    from app.services.user_service import get_user_by_login, user_state
+    from app.utils.loaders import load_entity
+    from app.utils.mappers.serializers import patient_serializer
+    from sqlalchemy import func, select
+
+    rng = random.Random(4)
+    patient_id = rng.randint(1, patients)
+    medicine_id = rng.randint(1, medicines)
+    carer_id = rng.randint(1, carers)
+    assignments = db.metadata.tables['user_patient_assignments']
+
+    return [
+        ('paciente por ID', lambda: load_entity(Patient, patient_id)),
+        ('estado de un paciente', lambda: patient_state(patient_id)),
+        ('última modificación de pacientes',
+         lambda: db.session.execute(select(func.max(Patient.updated_at))).scalar()),
+        ('última asignación',
+         lambda: db.session.execute(select(func.max(assignments.c.assigned_at))).scalar()),
+        ('última modificación del catálogo',
+         lambda: db.session.execute(select(func.max(Medicine.updated_at))).scalar()),
+        ('estado de una medicina', lambda: medicine_state(medicine_id)),
+        ('estado de un usuario', lambda: user_state(carer_id)),
+        ('login por username', lambda: get_user_by_login(f'Carer{carer_id}')),
+        ('login por email', lambda: get_user_by_login(f'CARER{carer_id}@bench.local')),
+        ('pacientes de un cuidador',
+         lambda: db.session.execute(carer_patients_statement(carer_id, patient_serializer)).all()),
+        ('carga de cuidadores', lambda: get_carer_loads([carer_id, carer_id + 1])),
+        ('cuidadores de un paciente', lambda: carers_of_patients([patient_id])),
+        ('cuidadores de quien toma una medicina', lambda: carers_of_medicine(medicine_id)),
+        ('contexto de asignación de medicina', lambda: get_assignment_context(patient_id, medicine_id)),
+        ('interacciones de los pacientes de un cuidador', lambda: check_patients(carer_id=carer_id)),
+        ('cambios recientes (/api/sync)', lambda: get_changes(head - 100)),
+        ('trabajos de un usuario', lambda: get_jobs(user_id=carer_id)),
+        ('siguiente trabajo de la cola', lambda: claim_next_job('explain-audit')),
+    ]
+
+
+def full_scans(conn, statement, parameters):
+    """Tablas grandes que el plan de la sentencia recorre enteras"""
+    if conn.dialect.name == 'postgresql':
+        plan = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scans, nodes = [], [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in LARGE_TABLES:
+                scans.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', ()))
+        return scans
+
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    scans = []
+    for row in rows:
+        match = _SQLITE_SCAN_RE.match(row[-1])
+        table = match and (match.group(1) or match.group(2))
+        if table in LARGE_TABLES:
+            scans.append(table)
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--medicines', type=int, default=2000)
+    parser.add_argument('--carers', type=int, default=500)
+    parser.add_argument('--history', type=int, default=50000)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url, migrate=True)
+
+    from app.extensions import db
+    from app.utils.tenancy import DEFAULT_TENANT_ID, tenant_scope
+
+    with app.app_context():
+        seed_carers(args.carers)
+        seed_patients(args.patients)
+        seed_medicines(args.medicines)
+        seed_treatments(args.patients, args.medicines, 5)
+        seed_assignments(args.patients, args.carers)
+        seed_history(args.history)
+        # Estadísticas al día, como en una base de datos en uso
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+        operations = hot_operations(args.patients, args.medicines, args.carers, args.history)
+        failures = 0
+        # Como en una petición: las consultas llevan el filtro por centro
+        with QueryRecorder(db.engine) as recorder, tenant_scope(DEFAULT_TENANT_ID):
+            for name, operation in operations:
+                recorder.reset()
+                operation()
+                db.session.rollback()
+                executions = [
+                    (statement, parameters) for statement, parameters in recorder.executions
+                    if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH', '('))
+                ]
+                with db.engine.connect() as conn:
+                    scans = sorted({
+                        table for statement, parameters in executions
+                        for table in full_scans(conn, statement, parameters)
+                    })
+                if scans:
+                    failures += 1
+                    print(f"SEQ SCAN {name}: {', '.join(scans)}")
+                else:
+                    print(f"OK       {name} ({len(executions)} consultas)")
+
+    print(f'\n{len(operations) - failures}/{len(operations)} operaciones sin recorridos completos')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
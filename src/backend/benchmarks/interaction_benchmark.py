@@ -0,0 +1,95 @@
+"""
+Mide la comprobación de interacciones (app.services.interaction_service):
+la consulta previa a una asignación antes (solo la fila existente) y ahora
+(medicina + tratamiento actual + índice en memoria), la compilación del
+índice y la revisión de una planta completa
+
+Uso:
+    python -m benchmarks.interaction_benchmark --patients 2000 --per-patient 8 --rules 20000
+"""
+import argparse
+import random
+import statistics
+
+from benchmarks.common import (
+    create_bench_app, measure, report, seed_medicines, seed_patients, seed_treatments
+)
+
+
+def seed_rules(count, medicines):
+    """Inserta `count` reglas aleatorias entre las medicinas sembradas"""
+    from app.extensions import db
+    from app.models.drug_interaction import DrugInteraction
+    from app.services.interaction_service import normalize_name
+
+    rng = random.Random(1)
+    rules = {}
+    while len(rules) < count:
+        a, b = sorted(normalize_name(f'Medicina{i}') for i in rng.sample(range(medicines), 2))
+        rules[(a, b)] = {
+            'medicine_a': a, 'medicine_b': b, 'kind': 'interaction',
+            'severity': rng.choice(('minor', 'moderate', 'major')), 'description': 'Regla de prueba'
+        }
+    db.session.execute(DrugInteraction.__table__.insert(), list(rules.values()))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--medicines', type=int, default=1000)
+    parser.add_argument('--per-patient', type=int, default=8)
+    parser.add_argument('--rules', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.extensions import db
+    from app.models.patients import patient_medicines
+    from app.services.interaction_service import (
+        build_interaction_index, check_patients, get_assignment_context, get_interaction_index
+    )
+
+    with app.app_context():
+        seed_patients(args.patients)
+        seed_medicines(args.medicines)
+        seed_rules(args.rules, args.medicines)
+        seed_treatments(args.patients, args.medicines, args.per_patient)
+
+        rng = random.Random(3)
+        requests = [
+            (rng.randint(1, args.patients), rng.randint(1, args.medicines)) for _ in range(500)
+        ]
+
+        def before():
+            for patient_id, medicine_id in requests:
+                db.session.query(patient_medicines).filter_by(
+                    patient_id=patient_id, medicine_id=medicine_id
+                ).first()
+
+        index = get_interaction_index()
+
+        def after():
+            for patient_id, medicine_id in requests:
+                medicine, existing, current = get_assignment_context(patient_id, medicine_id)
+                if not existing:
+                    index.check(medicine, current)
+
+        print(f'{len(index)} reglas, {args.patients} pacientes con {args.per_patient} medicinas\n')
+        report('compilar índice', measure(build_interaction_index, args.repeat))
+        before_timings = measure(before, args.repeat)
+        after_timings = measure(after, args.repeat)
+        report(f'{len(requests)} asignaciones: antes', before_timings)
+        report(f'{len(requests)} asignaciones: con comprobación', after_timings)
+        report('revisión de planta completa', measure(check_patients, args.repeat))
+
+        # Coste añadido a cada asignación (una petición completa con commit
+        # y evento ronda varios ms)
+        overhead = (statistics.median(after_timings) - statistics.median(before_timings)) / len(requests)
+        status = 'OK' if overhead < 1 else 'LENTO'
+        print(f'\n{status}: {overhead:.3f} ms añadidos por asignación (objetivo < 1 ms)')
+
+if __name__ == '__main__':
+    main()
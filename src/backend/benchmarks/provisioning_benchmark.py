@@ -0,0 +1,71 @@
+"""
+Alta de usuarios: compara dar de alta la plantilla de un centro con un
+POST /api/auth/register por persona y con un único POST /api/users/bulk.
+Para cada variante da las sentencias SQL (en total y por usuario) y el
+tiempo total. El hash de las contraseñas (scrypt) se mide aparte: es un
+coste fijo por usuario que domina el tiempo con SQLite en memoria; las
+sentencias pesan con la base de datos en otra máquina. SQLite no agrupa los
+INSERT del alta masiva (no tiene insertmanyvalues con RETURNING ordenado);
+PostgreSQL los manda en lotes de hasta 1000 filas.
+
+Uso:
+    python -m benchmarks.provisioning_benchmark --users 200
+"""
+import argparse
+import time
+
+from benchmarks.common import BENCH_PASSWORD, QueryRecorder, auth_headers, create_bench_app, seed_user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.extensions import db
+    from app.models.user import User
+
+    with app.app_context():
+        seed_user('bench_admin', is_admin=True)
+        engine = db.engine
+
+    client = app.test_client()
+    headers = auth_headers(client, 'bench_admin')
+
+    def staff(prefix):
+        return [{'username': f'{prefix}{i:04d}', 'email': f'{prefix}{i:04d}@bench.local',
+                 'password': BENCH_PASSWORD, 'first_name': 'Bench', 'last_name': 'Staff'}
+                for i in range(args.users)]
+
+    def register(users):
+        return [client.post('/api/auth/register', json=user) for user in users]
+
+    def bulk(users):
+        return [client.post('/api/users/bulk', json={'users': users}, headers=headers)]
+
+    start = time.perf_counter()
+    User(username='hash').set_password(BENCH_PASSWORD)
+    hashing = (time.perf_counter() - start) * 1000 * args.users
+
+    print(f'{args.users} usuarios; hash de las contraseñas: {hashing:.0f} ms en total\n')
+    print(f"{'variante':<24} {'sentencias':>10} {'sql/usuario':>12} {'total ms':>10}")
+    variants = [
+        ('registro uno a uno', register, staff('reg')),
+        ('alta masiva', bulk, staff('bulk')),
+        ('alta masiva duplicada', bulk, staff('bulk')),
+    ]
+    for name, provision, users in variants:
+        with QueryRecorder(engine) as recorder:
+            start = time.perf_counter()
+            responses = provision(users)
+            elapsed = (time.perf_counter() - start) * 1000
+        expected = 409 if 'duplicada' in name else 201
+        assert all(response.status_code == expected for response in responses), name
+        print(f'{name:<24} {recorder.count:>10} {recorder.count / args.users:>12.2f} {elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
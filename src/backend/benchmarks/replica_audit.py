@@ -0,0 +1,139 @@
+"""
+Auditoría del enrutado a réplicas de lectura (app/utils/db_routing.py):
+con un primario y una réplica comprueba que los GET leen de la réplica,
+que las escrituras van al primario, que quien acaba de escribir lee del
+primario durante DATABASE_READ_STICKY_SECONDS mientras los demás siguen en
+la réplica, y que una réplica rota se expulsa y se vuelve a probar pasado
+DATABASE_READ_EJECT_SECONDS.
+
+Por defecto usa dos ficheros SQLite temporales: la "réplica" es una copia
+del primario tomada tras sembrar los datos, así que no recibe las
+escrituras posteriores y sirve para ver de qué base sale cada lectura.
+Con Postgres se pasan las dos URLs (la réplica debe replicar del primario)
+y se omite la prueba de la réplica rota.
+
+Uso:
+    python -m benchmarks.replica_audit
+    python -m benchmarks.replica_audit --primary-url postgresql://... --replica-url postgresql://...
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.common import (
+    QueryRecorder, auth_headers, create_bench_app, seed_patients, seed_user
+)
+
+STICKY_SECONDS = 1.0
+EJECT_SECONDS = 1.0
+
+
+def sqlite_path(url):
+    return url.split(':///', 1)[1] if url.startswith('sqlite:///') else None
+
+
+def copy_sqlite(source, target):
+    """Copia consistente de una base SQLite (API de backup)"""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--primary-url')
+    parser.add_argument('--replica-url')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='replica_audit_')
+    primary_url = args.primary_url or f"sqlite:///{os.path.join(tmpdir, 'primary.db')}"
+    replica_url = args.replica_url or f"sqlite:///{os.path.join(tmpdir, 'replica.db')}"
+    os.environ['DATABASE_READ_URLS'] = replica_url
+    os.environ['DATABASE_READ_STICKY_SECONDS'] = str(STICKY_SECONDS)
+    os.environ['DATABASE_READ_EJECT_SECONDS'] = str(EJECT_SECONDS)
+
+    app = create_bench_app(primary_url)
+
+    from app.extensions import db
+
+    with app.app_context():
+        seed_user()
+        seed_user('bench_other')
+        seed_patients(10)
+        primary, replica = db.engine, db.engines['replica_0']
+    replica_file = sqlite_path(replica_url)
+    if sqlite_path(primary_url) and replica_file:
+        copy_sqlite(sqlite_path(primary_url), replica_file)
+    router = app.extensions['replica_router']
+
+    client = app.test_client()
+    carer = auth_headers(client)
+    other = auth_headers(client, 'bench_other')
+    failures = 0
+
+    def check(name, ok, detail=''):
+        nonlocal failures
+        failures += not ok
+        print(f"{'OK' if ok else 'FALLO':<6} {name:<58} {detail}")
+
+    with QueryRecorder(primary) as on_primary, QueryRecorder(replica) as on_replica:
+        def request(method, url, headers, body=None):
+            on_primary.reset()
+            on_replica.reset()
+            response = client.open(url, method=method, json=body, headers=headers)
+            return response, on_primary.count, on_replica.count
+
+        response, p, r = request('GET', '/api/patients', carer)
+        check('GET lee de la réplica', response.status_code == 200 and r > 0 and p == 0,
+              f'primario={p} réplica={r}')
+
+        response, p, r = request('GET', '/api/dashboard', carer)
+        check('Las secciones del panel leen de la réplica', response.status_code == 200 and r > 0 and p == 0,
+              f'primario={p} réplica={r}')
+
+        response, p, r = request('PUT', '/api/patients/1', carer, {'phone': '699999999'})
+        check('La escritura va al primario', response.status_code == 200 and p > 0 and r == 0,
+              f'primario={p} réplica={r}')
+
+        response, p, r = request('GET', '/api/patients?fields=id,phone', carer)
+        phone = next((row['phone'] for row in response.get_json()['patients'] if row['id'] == 1), None)
+        check('Quien escribió lee lo suyo del primario', p > 0 and r == 0 and phone == '699999999',
+              f'primario={p} réplica={r} phone={phone}')
+
+        response, p, r = request('GET', '/api/patients', other)
+        check('Los demás usuarios siguen en la réplica', r > 0 and p == 0, f'primario={p} réplica={r}')
+
+        time.sleep(STICKY_SECONDS + 0.1)
+        response, p, r = request('GET', '/api/patients', carer)
+        check('Pasado el margen vuelve a la réplica', r > 0 and p == 0, f'primario={p} réplica={r}')
+
+        if replica_file:
+            # Réplica rota: la tabla desaparece y las consultas fallan
+            with sqlite3.connect(replica_file) as conn:
+                conn.execute('DROP TABLE patients')
+            response, p, r = request('GET', '/api/patients', other)
+            check('Réplica rota: se expulsa y responde el primario',
+                  response.status_code == 200 and p > 0 and router.is_ejected('replica_0'),
+                  f'status={response.status_code} primario={p} réplica={r}')
+
+            response, p, r = request('GET', '/api/patients', other)
+            check('Réplica expulsada: no se consulta', response.status_code == 200 and r == 0,
+                  f'primario={p} réplica={r}')
+
+            copy_sqlite(sqlite_path(primary_url), replica_file)
+            time.sleep(EJECT_SECONDS + 0.1)
+            response, p, r = request('GET', '/api/patients', other)
+            check('Pasada la expulsión se vuelve a probar', response.status_code == 200 and r > 0 and p == 0,
+                  f'primario={p} réplica={r}')
+        else:
+            print('       Prueba de réplica rota omitida (solo con SQLite)')
+
+    if failures:
+        print(f'{failures} comprobaciones fallidas')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
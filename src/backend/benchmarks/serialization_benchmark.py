@@ -0,0 +1,58 @@
+"""
+Compara la serialización actual (to_dict + jsonify con json de la stdlib)
+con la capa precompilada de app.utils.mappers.serializers
+
+Uso:
+    python -m benchmarks.serialization_benchmark --patients 10000
+"""
+import argparse
+
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.common import create_bench_app, measure, report, seed_patients
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.extensions import db
+    from app.models.patients import Patient
+    from app.utils.mappers import serializers
+    from app.utils.mappers.serializers import FastJSONProvider, patient_serializer
+
+    with app.app_context():
+        seed_patients(args.patients)
+        stdlib_json = DefaultJSONProvider(app)
+        fast_json = FastJSONProvider(app)
+
+        def current_path():
+            db.session.expunge_all()
+            patients = Patient.query.all()
+            return stdlib_json.dumps({'patients': [p.to_dict() for p in patients]})
+
+        def serializer_path():
+            db.session.expunge_all()
+            patients = Patient.query.all()
+            return fast_json.dumps({'patients': patient_serializer.many(patients)})
+
+        def rows_path():
+            rows = db.session.execute(patient_serializer.select()).all()
+            return fast_json.dumps({'patients': patient_serializer.from_rows(rows)})
+
+        assert stdlib_json.loads(current_path()) == stdlib_json.loads(rows_path())
+
+        encoder = 'orjson' if serializers.orjson is not None else 'json (stdlib)'
+        print(f'{args.patients} pacientes, encoder rápido: {encoder}')
+        report('to_dict + json stdlib (actual)', measure(current_path, args.repeat))
+        report('ModelSerializer + FastJSONProvider', measure(serializer_path, args.repeat))
+        report('filas SQL + FastJSONProvider', measure(rows_path, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Opciones de la sesión (app/utils/session_options.py): repite las rutas que
+escriben y luego serializan el objeto con SQLALCHEMY_EXPIRE_ON_COMMIT
+activado (lo que hace SQLAlchemy por defecto) y desactivado. Para cada ruta
+da las sentencias SQL por petición y cuántas son SELECT después del COMMIT:
+las recargas que se ahorran más las consultas propias de la respuesta
+(relaciones dynamic, destinatarios de los eventos), que no cambian. Con la
+base de datos en otra máquina cada sentencia es una ida y vuelta. La entrada `dashboard` es un GET: no cambia
+con expire_on_commit y sirve de control.
+
+Las transacciones de solo lectura de los GET (DB_READ_ONLY_GET) solo se
+aplican en PostgreSQL y no añaden sentencias (el driver manda
+BEGIN READ ONLY en lugar de BEGIN). Para comprobarlo, usa --database-url
+con una base de datos PostgreSQL de pruebas.
+
+Uso:
+    python -m benchmarks.session_benchmark --requests 200
+"""
+import argparse
+import itertools
+import statistics
+import time
+
+from benchmarks.common import (
+    QueryRecorder, auth_headers, create_bench_app, seed_medicines, seed_patients, seed_user
+)
+
+# (nombre, método, ruta(n), cuerpo(n)); n no se repite entre peticiones de una ruta
+ROUTES = [
+    ('editar paciente', 'PUT', lambda n: '/api/patients/1', lambda n: {'phone': f'6{n:08d}'}),
+    ('asignar paciente', 'POST', lambda n: f'/api/patients/{n + 1}/assign', lambda n: {'user_id': 1}),
+    ('editar medicina', 'PUT', lambda n: '/api/medicines/1', lambda n: {'dosage': f'{n % 50}mg'}),
+    ('activar medicina', 'PUT', lambda n: '/api/medicines/enable/1', lambda n: None),
+    ('editar perfil', 'PUT', lambda n: '/api/auth/me', lambda n: {'first_name': f'Bench{n}'}),
+    ('dashboard', 'GET', lambda n: '/api/dashboard', lambda n: None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.extensions import db
+
+    with app.app_context():
+        seed_user()
+        # Pacientes sin asignar de sobra para 'asignar paciente'
+        seed_patients(2 * args.requests + 1)
+        seed_medicines(50)
+        engine = db.engine
+
+    client = app.test_client()
+    headers = auth_headers(client)
+
+    print(f'{args.requests} peticiones por ruta\n')
+    print(f"{'ruta':<18} {'expire_on_commit':>17} {'sql/pet':>8} {'tras commit':>13} {'p50 ms':>8}")
+    for name, method, path, body in ROUTES:
+        counter = itertools.count()
+        for expire in (True, False):
+            app.config['SQLALCHEMY_EXPIRE_ON_COMMIT'] = expire
+            timings = []
+            statements = reloads = 0
+            with QueryRecorder(engine) as recorder:
+                for _ in range(args.requests):
+                    n = next(counter)
+                    recorder.reset()
+                    start = time.perf_counter()
+                    response = client.open(path(n), method=method, json=body(n), headers=headers)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code < 300, (name, response.status_code)
+                    statements += recorder.count
+                    reloads += sum(recorder.selects_by_table(after_commit=True).values())
+            print(f'{name:<18} {str(expire):>17} {statements / args.requests:>8.2f} '
+                  f'{reloads / args.requests:>13.2f} {statistics.median(timings):>8.2f}')
+
+if __name__ == '__main__':
+    main()
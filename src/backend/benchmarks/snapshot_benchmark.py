@@ -0,0 +1,75 @@
+"""
+Carga inicial de una tablet: compara la ruta actual (GET de los pacientes
+del cuidador y un GET de medicinas por paciente) con /api/sync/snapshot sin
+comprimir, con gzip y con zstd (si está instalado zstandard).
+Para cada variante mide las peticiones, los bytes transferidos, el tiempo
+en servidor y el tiempo de descomprimir y parsear el JSON en el cliente.
+En una tablet de gama baja este último es varias veces mayor.
+
+Uso:
+    python -m benchmarks.snapshot_benchmark --patients 5000 --users 50
+"""
+import argparse
+import json
+
+from benchmarks.common import (
+    auth_headers, create_bench_app, measure, seed_assignments, seed_carers, seed_medicines,
+    seed_patients, seed_treatments, seed_user
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=50, help='cuidadores')
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--medicines', type=int, default=500)
+    parser.add_argument('--per-patient', type=int, default=4, help='medicinas por paciente')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.utils.compression import available_encodings, decompress
+
+    with app.app_context():
+        carer = seed_user('bench_carer')
+        seed_carers(args.users)
+        seed_patients(args.patients)
+        seed_medicines(args.medicines)
+        seed_treatments(args.patients, args.medicines, args.per_patient)
+        seed_assignments(args.patients, args.users + 1)
+        carer_id = carer.id
+
+    client = app.test_client()
+    headers = auth_headers(client)
+
+    def current_bootstrap():
+        responses = [client.get(f'/api/users/{carer_id}/patients', headers=headers)]
+        for patient in responses[0].get_json()['patients']:
+            responses.append(client.get(f"/api/medicines/patients/{patient['id']}/medicines", headers=headers))
+        return responses
+
+    def snapshot(encoding):
+        return [client.get('/api/sync/snapshot', headers={**headers, 'Accept-Encoding': encoding})]
+
+    variants = [('actual (JSON por paciente)', current_bootstrap)]
+    variants += [(f'snapshot {encoding}', lambda e=encoding: snapshot(e))
+                 for encoding in ['identity'] + available_encodings()]
+
+    print(f'Cuidador con {args.patients // (args.users + 1)} pacientes aprox., '
+          f'{args.per_patient} medicinas por paciente\n')
+    print(f"{'variante':<28} {'peticiones':>10} {'bytes':>10} {'servidor ms':>12} {'parseo ms':>10}")
+    for name, fetch in variants:
+        server = measure(fetch, args.repeat)
+        responses = fetch()
+        assert all(response.status_code == 200 for response in responses), name
+        bodies = [(response.data, response.headers.get('Content-Encoding')) for response in responses]
+        parse = measure(lambda: [json.loads(decompress(data, encoding)) for data, encoding in bodies],
+                        args.repeat)
+        print(f'{name:<28} {len(responses):>10} {sum(len(data) for data, _ in bodies):>10} '
+              f'{min(server):>12.2f} {min(parse):>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Tiempo de arranque en frío: lanza procesos nuevos de Python y mide cada
+fase del arranque (importar el paquete, importar run.py, que crea la app,
+y la primera petición). Con --profile muestra además los módulos que más
+tardan en importarse (python -X importtime)
+
+Uso:
+    python -m benchmarks.startup_benchmark --runs 10
+    python -m benchmarks.startup_benchmark --profile --top 20
+    python -m benchmarks.startup_benchmark --budget-ms 800   # código 1 si se pasa
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en cada proceso hijo; imprime los tiempos de cada fase en ms
+CHILD_SCRIPT = '''
+import contextlib, io, json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+import run
+run_imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    run.app.test_client().get('/api/patients')
+requested = time.perf_counter()
+print(json.dumps({
+    'import app': (imported - start) * 1000,
+    'import run': (run_imported - imported) * 1000,
+    'primera petición': (requested - run_imported) * 1000,
+    'total': (requested - start) * 1000,
+}))
+'''
+
+
+def child_env(database_url):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = database_url
+    env.setdefault('JWT_SECRET_KEY', 'bench-secret-key-only-for-local-benchmarks')
+    env.setdefault('LOG_LEVEL', 'ERROR')
+    return env
+
+
+def run_child(env, args=()):
+    result = subprocess.run(
+        [sys.executable, *args, '-c', CHILD_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return result
+
+
+def import_profile(env, top):
+    """
+    Módulos ordenados por tiempo acumulado de importación: los de la app y
+    las dependencias de primer nivel que carga
+    """
+    stderr = run_child(env, ['-X', 'importtime']).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        head, cumulative_us, name = line.split('|')
+        own_us = head.split(':')[1]
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if name.startswith(('app', 'run')) or depth <= 1:
+            rows.append((int(cumulative_us) / 1000, int(own_us) / 1000, name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--profile', action='store_true', help='Mostrar el perfil de importación')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, help='Falla si la mediana total lo supera')
+    args = parser.parse_args()
+
+    env = child_env(args.database_url)
+    # El primer proceso compila el bytecode que faltara; no cuenta
+    run_child(env)
+    samples = [json.loads(run_child(env).stdout.strip().splitlines()[-1]) for _ in range(args.runs)]
+
+    print(f"Arranque en frío, {args.runs} procesos ({args.database_url})\n")
+    print(f"{'fase':<20} {'mediana':>9} {'mín':>9} {'máx':>9}")
+    for phase in samples[0]:
+        values = [sample[phase] for sample in samples]
+        print(f"{phase:<20} {statistics.median(values):>9.1f} {min(values):>9.1f} {max(values):>9.1f}")
+
+    if args.profile:
+        print(f"\n{'módulo':<52} {'acumulado':>10} {'propio':>8}")
+        for cumulative, own, name in import_profile(env, args.top):
+            print(f"{name[:52]:<52} {cumulative:>10.1f} {own:>8.1f}")
+
+    total = statistics.median(sample['total'] for sample in samples)
+    if args.budget_ms is not None and total > args.budget_ms:
+        print(f"\nArranque de {total:.1f} ms, por encima del presupuesto de {args.budget_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
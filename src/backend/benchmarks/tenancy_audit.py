@@ -0,0 +1,109 @@
+"""
+Auditoría de aislamiento entre centros: un cuidador de otro centro no debe
+ver ni cambiar los datos del centro 1. Cada ruta se llama con el token del
+centro 2 sobre un paciente del centro 1 y, además del código de respuesta,
+se comprueba que los tratamientos del paciente siguen igual. También se
+comprueba que las ETags de las listas del centro 2 no cambian cuando se
+asignan pacientes en el centro 1
+
+Uso:
+    python -m benchmarks.tenancy_audit
+"""
+import argparse
+import sys
+
+from benchmarks.common import auth_headers, create_bench_app, seed_user
+
+# (método, URL, cuerpo, código esperado). {patient} es el paciente del centro 1,
+# {medicine} una medicina suya y {own_medicine} una del centro 2
+CROSS_TENANT_PATHS = [
+    ('GET', '/api/patients/{patient}', None, 404),
+    ('GET', '/api/patients/{patient}/users', None, 404),
+    ('POST', '/api/medicines/patients/{patient}/medicines/{own_medicine}', {}, 404),
+    ('DELETE', '/api/medicines/patients/{patient}/medicines/{medicine}', None, 404),
+    ('DELETE', '/api/medicines/patients/{patient}/medicines/bulk-delete', {'medicine_ids': ['{medicine}']}, 404),
+    ('PUT', '/api/patients/{patient}', {'phone': '600000000'}, 404),
+]
+
+# Listas del centro 2 cuya ETag no depende de las asignaciones del centro 1
+TENANT_LISTS = ['/api/patients', '/api/patients/unassigned']
+
+
+def _fill(value, ids):
+    if isinstance(value, str):
+        return int(value.format(**ids)) if value.startswith('{') else value.format(**ids)
+    if isinstance(value, dict):
+        return {key: _fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, ids) for item in value]
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from sqlalchemy import select
+
+    from app.extensions import db
+    from app.models.medicine import Medicine
+    from app.models.patients import Patient, patient_medicines
+    from app.services.facility_service import create_facility
+    from app.utils.tenancy import tenant_scope
+
+    with app.app_context():
+        seed_user('carer_a')
+        patient = Patient(name='Paciente', surname='A', phone='1', instructions='-')
+        medicine = Medicine(name='MedicinaA', dosage='10mg')
+        db.session.add_all([patient, medicine])
+        db.session.flush()
+        db.session.execute(patient_medicines.insert().values(patient_id=patient.id, medicine_id=medicine.id))
+        db.session.commit()
+
+        facility = create_facility('Centro B')
+        with tenant_scope(facility.id):
+            seed_user('carer_b')
+            own_medicine = Medicine(name='MedicinaB', dosage='5mg')
+            db.session.add(own_medicine)
+            db.session.commit()
+        ids = {'patient': patient.id, 'medicine': medicine.id, 'own_medicine': own_medicine.id}
+
+        def treatments():
+            return sorted(db.session.execute(
+                select(patient_medicines.c.medicine_id).where(patient_medicines.c.patient_id == patient.id)
+            ).scalars())
+        expected = treatments()
+
+    client = app.test_client()
+    headers = auth_headers(client, 'carer_b')
+    failures = 0
+
+    for method, url, body, status_code in CROSS_TENANT_PATHS:
+        url = url.format(**ids)
+        response = client.open(url, method=method, json=_fill(body, ids), headers=headers)
+        with app.app_context():
+            current = treatments()
+        status = 'OK' if response.status_code == status_code and current == expected else 'FALLO'
+        failures += status != 'OK'
+        print(f'{status:<6} {method:<7} {url:<50} {response.status_code} (esperado {status_code})  '
+              f'tratamientos={current}')
+
+    etags = {url: client.get(url, headers=headers).headers.get('ETag') for url in TENANT_LISTS}
+    headers_a = auth_headers(client, 'carer_a')
+    client.post(f"/api/patients/{ids['patient']}/assign", json={'user_id': 1}, headers=headers_a)
+    for url in TENANT_LISTS:
+        etag = client.get(url, headers=headers).headers.get('ETag')
+        status = 'OK' if etag == etags[url] else 'FALLO'
+        failures += status != 'OK'
+        print(f'{status:<6} GET     {url:<50} ETag tras asignar en el centro 1: {etags[url]} -> {etag}')
+
+    if failures:
+        print(f'{failures} rutas acceden a datos de otro centro')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
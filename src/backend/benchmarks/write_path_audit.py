@@ -0,0 +1,74 @@
+"""
+Auditoría de lecturas en las rutas de escritura: cada ruta debe leer cada
+entidad (pacientes, usuarios, medicinas) como mucho una vez antes de
+escribir. Las recargas tras el COMMIT se informan aparte
+
+Uso:
+    python -m benchmarks.write_path_audit
+"""
+import argparse
+import sys
+
+from benchmarks.common import (
+    QueryRecorder, auth_headers, create_bench_app, seed_patients, seed_user
+)
+
+ENTITY_TABLES = ('patients', 'users', 'medicines')
+
+WRITE_PATHS = [
+    ('PUT', '/api/patients/1', {'phone': '600000000'}),
+    ('POST', '/api/patients/2/assign', {'user_id': 1}),
+    ('DELETE', '/api/patients/2/assign', None),
+    ('PATCH', '/api/patients', {'ids': [3, 4, 5], 'changes': {'quit': True}}),
+    ('PATCH', '/api/patients', {'patients': [{'id': 6, 'phone': '1'}, {'id': 7, 'phone': '2'}]}),
+    ('POST', '/api/patients/bulk-delete', {'ids': [8, 9]}),
+    ('DELETE', '/api/patients/10', None),
+    ('PUT', '/api/medicines/1', {'dosage': '20mg'}),
+    ('PUT', '/api/medicines/enable/1', None),
+    ('PUT', '/api/medicines/disable/1', None),
+    ('POST', '/api/medicines/patients/1/medicines/2', {'dose_per_take': '2'}),
+    ('DELETE', '/api/medicines/patients/1/medicines/2', None),
+    ('DELETE', '/api/medicines/3', None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url)
+
+    from app.extensions import db
+    from app.models.medicine import Medicine
+
+    with app.app_context():
+        seed_user()
+        seed_patients(20)
+        db.session.add_all(Medicine(name=f'Medicina{i}', dosage='10mg') for i in range(5))
+        db.session.commit()
+        engine = db.engine
+
+    client = app.test_client()
+    headers = auth_headers(client)
+    failures = 0
+
+    with QueryRecorder(engine) as recorder:
+        for method, url, body in WRITE_PATHS:
+            recorder.reset()
+            response = client.open(url, method=method, json=body, headers=headers)
+            reads = recorder.selects_by_table()
+            reloads = recorder.selects_by_table(after_commit=True)
+            repeated = {t: n for t, n in reads.items() if t in ENTITY_TABLES and n > 1}
+            status = 'OK' if not repeated and response.status_code < 500 else 'FALLO'
+            failures += status != 'OK'
+            print(f'{status:<6} {method:<7} {url:<45} {response.status_code}  '
+                  f'lecturas={reads}  recargas={reloads}')
+
+    if failures:
+        print(f'{failures} rutas leen la misma entidad más de una vez')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,19 @@
+import os
+
 from app import create_app
-from app.extensions import db
 from flask import Flask
 from flask_cors import CORS
 
 app = create_app()
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:8080"}}, supports_credentials=True)
 
-with app.app_context():
-    db.create_all()
+# El esquema no se toca al arrancar: las migraciones se aplican antes del
+# despliegue con `flask --app run.py db upgrade`
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    if os.getenv("SERVER_MODE") == "asgi":
+        import uvicorn
+        uvicorn.run("app.asgi:app", host="0.0.0.0", port=5000,
+                    workers=int(os.getenv("WEB_CONCURRENCY", 1)))
+    else:
+        app.run(host="0.0.0.0", port=5000, debug=True)
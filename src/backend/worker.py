@@ -0,0 +1,75 @@
+"""
+Worker de trabajos en segundo plano (exportaciones, importaciones,
+reasignaciones masivas)
+
+    python worker.py            # procesa trabajos hasta recibir SIGTERM/SIGINT
+    python worker.py --burst    # procesa los pendientes y termina
+
+Se pueden lanzar varios workers: en Postgres cada uno reserva sus trabajos
+con FOR UPDATE SKIP LOCKED
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from app import create_app
+from app.extensions import db
+from app.services.jobs_service import requeue_stale_jobs, run_next_job
+
+logger = logging.getLogger('worker')
+
+STALE_CHECK_SECONDS = 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker de trabajos en segundo plano')
+    parser.add_argument('--burst', action='store_true',
+                        help='Procesar los trabajos pendientes y terminar')
+    args = parser.parse_args()
+
+    # create_app configura el logging del proceso (LOG_LEVEL, LOG_FORMAT)
+    app = create_app()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    poll_interval = float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        logger.info("Señal %s recibida, terminando tras el trabajo actual", signum)
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info("Worker %s iniciado", worker_id)
+    last_stale_check = 0.0
+    while not stopping.is_set():
+        with app.app_context():
+            if time.monotonic() - last_stale_check > STALE_CHECK_SECONDS:
+                recovered = requeue_stale_jobs()
+                if recovered:
+                    logger.warning("%s trabajos recuperados de workers caídos", recovered)
+                last_stale_check = time.monotonic()
+            
+            try:
+                job = run_next_job(worker_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error en el worker: {str(e)}")
+                job = None
+            
+            if job is not None:
+                logger.info("Trabajo %s (%s): %s", job.id, job.type, job.status)
+        
+        if job is not None:
+            continue
+        if args.burst:
+            break
+        stopping.wait(poll_interval)
+
+
+if __name__ == "__main__":
+    main()